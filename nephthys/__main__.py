@@ -11,16 +11,25 @@ from dotenv import load_dotenv
 from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
 from starlette.applications import Starlette
 
+from nephthys.tasks.backfill_enrichment import backfill_ticket_enrichment
 from nephthys.tasks.close_stale import close_stale_tickets
 from nephthys.tasks.daily_stats import send_daily_stats
 from nephthys.tasks.fulfillment_reminder import send_fulfillment_reminder
 from nephthys.tasks.update_helpers import update_helpers
+from nephthys.utils.ai_result_cache import ai_result_cache
+from nephthys.utils.category_classifier import train_category_classifier
 from nephthys.utils.delete_thread import process_queue
 from nephthys.utils.env import env
+from nephthys.utils.event_dedupe import event_deduplicator
+from nephthys.utils.event_dispatcher import event_dispatcher
+from nephthys.utils.helper_team import refresh_helper_team
+from nephthys.utils.logging import heartbeat_buffer
 from nephthys.utils.logging import parse_level_name
 from nephthys.utils.logging import send_heartbeat
 from nephthys.utils.logging import setup_otel_logging
+from nephthys.utils.open_tickets import open_ticket_index
 from nephthys.utils.slack import app as slack_app
+from nephthys.utils.stats_rollup import populate_ticket_daily_rollup
 from piccolo_conf import DB
 
 load_dotenv()
@@ -46,6 +55,7 @@ matplotlib.use("agg")
 
 @contextlib.asynccontextmanager
 async def main(_app: Starlette):
+    heartbeat_task = asyncio.create_task(heartbeat_buffer.run())
     await send_heartbeat(":neodog_nom_verified: Bot is online!")
 
     async with ClientSession() as session:
@@ -65,6 +75,29 @@ async def main(_app: Starlette):
             timezone="Europe/London",
         )
 
+        scheduler.add_job(
+            train_category_classifier,
+            "cron",
+            hour=3,
+            minute=0,
+            next_run_time=datetime.now(),
+        )
+
+        # Also checks whether degraded mode can be turned off
+        scheduler.add_job(
+            backfill_ticket_enrichment, "interval", minutes=1, max_instances=1
+        )
+
+        # Picks up any ticket changes the index missed (e.g. made by scripts)
+        scheduler.add_job(open_ticket_index.load, "interval", minutes=10)
+
+        scheduler.add_job(ai_result_cache.prune, "cron", hour=3, minute=30)
+        if env.event_dedupe_database:
+            scheduler.add_job(event_deduplicator.prune, "cron", hour=3, minute=45)
+
+        # Catches any join/leave events we missed (e.g. while restarting)
+        scheduler.add_job(refresh_helper_team, "interval", hours=1)
+
         if env.stale_ticket_days:
             scheduler.add_job(
                 close_stale_tickets,
@@ -75,9 +108,12 @@ async def main(_app: Starlette):
             )
         else:
             logging.debug("Stale ticket closing has not been configured")
+        await open_ticket_index.load()
         scheduler.start()
 
         delete_msg_task = asyncio.create_task(process_queue())
+        event_dispatcher_task = asyncio.create_task(event_dispatcher.run())
+        await populate_ticket_daily_rollup()
         await update_helpers()
         handler = None
         if env.slack_app_token:
@@ -93,14 +129,21 @@ async def main(_app: Starlette):
         logging.info(f"Starting Uvicorn on port {env.port}")
 
         yield
-        await DB.close_connection_pool()
-        scheduler.shutdown()
-        delete_msg_task.cancel()
-
         if handler:
             logging.info("Stopping Socket Mode handler")
             await handler.close_async()
 
+        # Slack has already been told we've got these events, so finish
+        # handling them while the database is still available
+        await event_dispatcher.drain()
+        event_dispatcher_task.cancel()
+        scheduler.shutdown()
+        delete_msg_task.cancel()
+        await DB.close_connection_pool()
+        heartbeat_task.cancel()
+        # Let it post any heartbeats that are still waiting
+        await asyncio.gather(heartbeat_task, return_exceptions=True)
+
 
 def start():
     uvicorn.run(
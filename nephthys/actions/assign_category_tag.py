@@ -6,9 +6,10 @@ from slack_bolt.async_app import AsyncAck
 from slack_sdk.web.async_client import AsyncWebClient
 
 from nephthys.database.tables import Ticket
-from nephthys.database.tables import User
 from nephthys.events.message.send_backend_message import backend_message_blocks
 from nephthys.events.message.send_backend_message import backend_message_fallback_text
+from nephthys.utils.ticket_transitions import assign_category_tag
+from nephthys.utils.user_cache import user_cache
 
 
 async def assign_category_tag_callback(
@@ -28,7 +29,7 @@ async def assign_category_tag_callback(
     channel_id = body["channel"]["id"]
     ts = body["message"]["ts"]
 
-    user = await User.objects().where(User.slack_id == user_id).first()
+    user = await user_cache.get(user_id)
     if not user or not user.helper:
         logging.warning(
             f"Unauthorized user attempted to assign category tag user_id={user_id}"
@@ -40,11 +41,11 @@ async def assign_category_tag_callback(
         )
         return
 
-    await Ticket.update(
-        {
-            Ticket.category_tag: tag_id,
-        }
-    ).where(Ticket.ticket_ts == ts)
+    if not await assign_category_tag(ts, tag_id):
+        logging.error(
+            f"Failed to find corresponding ticket to update category tag ticket_ts={ts}"
+        )
+        return
 
     ticket: Ticket | None = (
         await Ticket.objects(Ticket.opened_by, Ticket.reopened_by)
@@ -52,9 +53,7 @@ async def assign_category_tag_callback(
         .first()
     )
     if not ticket:
-        logging.error(
-            f"Failed to find corresponding ticket to update category tag ticket_ts={ts}"
-        )
+        # Deleted in the meantime
         return
 
     other_tickets = await Ticket.count().where(
@@ -5,9 +5,10 @@ from slack_bolt.async_app import AsyncAck
 from slack_sdk.web.async_client import AsyncWebClient
 
 from nephthys.database.tables import CategoryTag
-from nephthys.database.tables import User
 from nephthys.events.app_home_opened import open_app_home
 from nephthys.utils.logging import send_heartbeat
+from nephthys.utils.tag_catalog import category_tag_catalog
+from nephthys.utils.user_cache import user_cache
 from nephthys.views.home import AppHomeView
 from nephthys.views.modals.create_category_tag import get_create_category_tag_modal
 
@@ -19,7 +20,7 @@ async def create_category_tag_btn_callback(
     user_id = body["user"]["id"]
     trigger_id = body["trigger_id"]
 
-    user = await User.objects().where(User.slack_id == user_id).first()
+    user = await user_cache.get(user_id)
     if not user or not user.admin:
         await send_heartbeat(
             f"Attempted to open create category tag modal by non-admin user <@{user_id}>"
@@ -47,7 +48,7 @@ async def create_category_tag_view_callback(
         )
         return
 
-    user = await User.objects().where(User.slack_id == user_id).first()
+    user = await user_cache.get(user_id)
     if not user or not user.admin:
         await ack()
         await send_heartbeat(
@@ -58,6 +59,7 @@ async def create_category_tag_view_callback(
     try:
         tag = CategoryTag(name=name, created_by=user.id)
         await tag.save()
+        category_tag_catalog.invalidate()
     except UniqueViolationError:
         logging.warning(f"Duplicate category tag name: {name}")
         await ack(
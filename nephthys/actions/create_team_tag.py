@@ -2,9 +2,10 @@ from slack_bolt.async_app import AsyncAck
 from slack_sdk.web.async_client import AsyncWebClient
 
 from nephthys.database.tables import TeamTag
-from nephthys.database.tables import User
 from nephthys.events.app_home_opened import open_app_home
 from nephthys.utils.logging import send_heartbeat
+from nephthys.utils.tag_catalog import team_tag_catalog
+from nephthys.utils.user_cache import user_cache
 from nephthys.views.home import AppHomeView
 from nephthys.views.modals.create_team_tag import get_create_team_tag_modal
 
@@ -18,7 +19,7 @@ async def create_team_tag_view_callback(
     await ack()
     user_id = body["user"]["id"]
 
-    user = await User.objects().where(User.slack_id == user_id).first()
+    user = await user_cache.get(user_id)
     if not user or not user.admin:
         await send_heartbeat(f"Attempted to create tag by non-admin user <@{user_id}>")
         return
@@ -26,6 +27,7 @@ async def create_team_tag_view_callback(
     name = body["view"]["state"]["values"]["tag_name"]["tag_name"]["value"]
     tag = TeamTag(name=name)
     await tag.save()
+    team_tag_catalog.invalidate()
 
     await open_app_home(AppHomeView.TEAM_TAGS, client, user_id)
 
@@ -40,7 +42,7 @@ async def create_team_tag_btn_callback(
     user_id = body["user"]["id"]
     trigger_id = body["trigger_id"]
 
-    user = await User.objects().where(User.slack_id == user_id).first()
+    user = await user_cache.get(user_id)
     if not user or not user.admin:
         await send_heartbeat(
             f"Attempted to open create tag modal by non-admin user <@{user_id}>"
@@ -1,5 +1,4 @@
 import logging
-from datetime import datetime
 
 from slack_sdk.errors import SlackApiError
 from slack_sdk.web.async_client import AsyncWebClient
@@ -11,10 +10,13 @@ from nephthys.errors.errors import PermissionDenied
 from nephthys.errors.errors import TicketNotClosedError
 from nephthys.events.message.send_backend_message import send_backend_message
 from nephthys.utils.env import env
+from nephthys.utils.helper_team import is_helper_team_member
 from nephthys.utils.logging import send_heartbeat
-from nephthys.utils.permissions import can_resolve
 from nephthys.utils.slack_user import get_user_profile
+from nephthys.utils.stats_rollup import foreign_key_id
+from nephthys.utils.ticket_methods import delete_message
 from nephthys.utils.ticket_methods import reply_to_ticket
+from nephthys.utils.ticket_transitions import reopen_ticket
 
 
 async def reopen(ticket: Ticket, reopened_by: User, client: AsyncWebClient):
@@ -25,28 +27,15 @@ async def reopen(ticket: Ticket, reopened_by: User, client: AsyncWebClient):
     """
     if ticket.status != TicketStatus.CLOSED:
         raise TicketNotClosedError(ticket.id)
-    if not await can_resolve(reopened_by.slack_id, reopened_by.id, ticket.msg_ts):
+    if not (
+        await is_helper_team_member(reopened_by.slack_id)
+        or foreign_key_id(ticket.opened_by) == reopened_by.id
+    ):
         raise PermissionDenied(
             "Only helpers or the original author can reopen a ticket",
             user_id=reopened_by.id,
         )
 
-    await Ticket.update(
-        {
-            Ticket.status: TicketStatus.OPEN,
-            Ticket.closed_by: None,
-            Ticket.reopened_by: reopened_by,
-            Ticket.reopened_at: datetime.now(),
-            Ticket.closed_at: None,
-        }
-    ).where(Ticket.id == ticket.id)
-
-    await reply_to_ticket(
-        text=env.transcript.ticket_reopen.format(helper_slack_id=reopened_by.slack_id),
-        ticket=ticket,
-        client=env.slack_client,
-    )
-
     if not (author := await User.objects().get(User.id == ticket.opened_by)):
         raise ValueError("Cannot reopen ticket with no recorded author")
     author_profile = await get_user_profile(author.slack_id)
@@ -54,6 +43,8 @@ async def reopen(ticket: Ticket, reopened_by: User, client: AsyncWebClient):
         (Ticket.opened_by == ticket.opened_by) & (Ticket.id != ticket.id)
     )
 
+    # The new backend message is sent first, so that the ticket can be reopened
+    # with its ts in one update
     backend_message = await send_backend_message(
         author_user_id=author.slack_id,
         description=ticket.description,
@@ -70,11 +61,16 @@ async def reopen(ticket: Ticket, reopened_by: User, client: AsyncWebClient):
     if not new_ticket_ts:
         logging.error(f"Invalid Slack message creation response: {backend_message}")
         raise ValueError("Invalid Slack message creation response: no ts")
-    await Ticket.update(
-        {
-            Ticket.ticket_ts: new_ticket_ts,
-        }
-    ).where(Ticket.id == ticket.id)
+    if not await reopen_ticket(ticket.id, reopened_by, new_ticket_ts):
+        # Someone else reopened it in the meantime
+        await delete_message(env.slack_ticket_channel, new_ticket_ts)
+        raise TicketNotClosedError(ticket.id)
+
+    await reply_to_ticket(
+        text=env.transcript.ticket_reopen.format(helper_slack_id=reopened_by.slack_id),
+        ticket=ticket,
+        client=env.slack_client,
+    )
 
     try:
         await env.slack_client.reactions_remove(
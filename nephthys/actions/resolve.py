@@ -9,15 +9,15 @@ from blockkit import Section
 from slack_sdk.errors import SlackApiError
 from slack_sdk.web.async_client import AsyncWebClient
 
-from nephthys.database.enums import TicketStatus
 from nephthys.database.tables import Ticket
-from nephthys.database.tables import User
 from nephthys.utils.delete_thread import add_thread_to_delete_queue
 from nephthys.utils.env import env
+from nephthys.utils.helper_team import is_helper_team_member
 from nephthys.utils.logging import send_heartbeat
-from nephthys.utils.permissions import can_resolve
 from nephthys.utils.ticket_methods import delete_message
 from nephthys.utils.ticket_methods import reply_to_ticket
+from nephthys.utils.ticket_transitions import resolve_ticket
+from nephthys.utils.user_cache import user_cache
 
 THREAD_CREDIT_CUTOFF = timedelta(hours=48)
 
@@ -30,7 +30,7 @@ async def resolve(
     add_reaction: bool = True,
     send_resolved_message: bool = True,
 ):
-    resolving_user = await User.objects().where(User.slack_id == resolver).first()
+    resolving_user = await user_cache.get(resolver)
     if not resolving_user:
         await send_heartbeat(
             f"User {resolver} attempted to resolve ticket with ts {ts} but isn't in the database.",
@@ -38,63 +38,40 @@ async def resolve(
         )
         return
 
-    allowed = await can_resolve(resolving_user.slack_id, resolving_user.id, ts)
-    if not allowed:
-        await send_heartbeat(
-            f"User {resolver} attempted to resolve ticket with ts {ts} without permission.",
-            messages=[f"Ticket TS: {ts}", f"Resolver ID: {resolver}"],
-        )
-        await client.chat_postEphemeral(
-            channel=env.slack_help_channel,
-            thread_ts=ts,
-            user=resolver,
-            text="Only helpers or the original poster can mark this thread as resolved.",
-        )
-        return
-
-    ticket = await Ticket.objects(Ticket.assigned_to).get((Ticket.msg_ts == ts))
-    if not ticket:
-        raise ValueError(f"Failed to find ticket with ts {ts}")
-    if ticket.status == TicketStatus.CLOSED:
-        await client.chat_postEphemeral(
-            channel=env.slack_help_channel,
-            thread_ts=ticket.msg_ts,
-            user=resolver,
-            text="Cannot mark as resolved — this ticket is already resolved!",
-        )
-        return
-
-    now = datetime.now(UTC)
-
-    # If the last message in the thread is recent, credit goes to the last
-    # helper who replied (ticket.assigned_to) rather than whoever clicked
-    # resolve. This prevents rewarding "stealing" active threads, while
-    # still rewarding closing stale, already-answered threads.
-    credit_user = resolving_user
-    if (
-        ticket.assigned_to.id
-        and ticket.last_msg_at is not None
-        and (now - ticket.last_msg_at) <= THREAD_CREDIT_CUTOFF
-    ):
-        credit_user = ticket.assigned_to
-    elif not resolving_user.helper and ticket.assigned_to.id:
-        credit_user = ticket.assigned_to
-
-    await Ticket.update(
-        {
-            Ticket.status: TicketStatus.CLOSED,
-            Ticket.closed_by: credit_user.id,
-            Ticket.closed_at: now,
-        }
-    ).where(Ticket.msg_ts == ts)
-
-    tkt = await Ticket.objects().where(Ticket.msg_ts == ts).first()
-    if not tkt:
-        await send_heartbeat(
-            f"Failed to resolve ticket with ts {ts} by {resolver}. Ticket not found.",
-            messages=[f"Ticket TS: {ts}", f"Resolver ID: {resolver}"],
-        )
+    # Helpers can resolve any ticket, and everyone else only their own
+    is_helper = await is_helper_team_member(resolving_user.slack_id)
+    transition = await resolve_ticket(
+        ts,
+        resolving_user,
+        can_resolve_any=is_helper,
+        credit_cutoff=datetime.now(UTC) - THREAD_CREDIT_CUTOFF,
+    )
+    if not transition:
+        # Work out why it couldn't be resolved
+        ticket = await Ticket.objects().get(Ticket.msg_ts == ts)
+        if not ticket:
+            raise ValueError(f"Failed to find ticket with ts {ts}")
+        if not is_helper and ticket.opened_by != resolving_user.id:
+            await send_heartbeat(
+                f"User {resolver} attempted to resolve ticket with ts {ts} without permission.",
+                messages=[f"Ticket TS: {ts}", f"Resolver ID: {resolver}"],
+            )
+            await client.chat_postEphemeral(
+                channel=env.slack_help_channel,
+                thread_ts=ts,
+                user=resolver,
+                text="Only helpers or the original poster can mark this thread as resolved.",
+            )
+        else:
+            await client.chat_postEphemeral(
+                channel=env.slack_help_channel,
+                thread_ts=ts,
+                user=resolver,
+                text="Cannot mark as resolved — this ticket is already resolved!",
+            )
         return
+    tkt = transition.ticket
+    credit_slack_id = transition.closed_by_slack_id
 
     # Build the "ticket resolved!" message
     text = (
@@ -126,12 +103,12 @@ async def resolve(
             text=text,
             blocks=[Section(text), actions],
         )
-        if resolving_user.helper and credit_user.slack_id != resolving_user.slack_id:
+        if resolving_user.helper and tkt.closed_by != resolving_user.id:
             await client.chat_postEphemeral(
                 channel=env.slack_help_channel,
                 thread_ts=ts,
                 user=resolving_user.slack_id,
-                text=f"by the way! since this is still an active ticket, i've credited this resolve to <@{credit_user.slack_id}>",
+                text=f"by the way! since this is still an active ticket, i've credited this resolve to <@{credit_slack_id}>",
             )
     if add_reaction:
         await client.reactions_add(
@@ -161,5 +138,5 @@ async def resolve(
         )
 
     logging.info(
-        f"Resolved ticket ts={ts} by slack_id={resolving_user.slack_id} credit_to={credit_user.slack_id}"
+        f"Resolved ticket ts={ts} by slack_id={resolving_user.slack_id} credit_to={credit_slack_id}"
     )
@@ -4,10 +4,10 @@ from typing import Dict
 from slack_bolt.async_app import AsyncAck
 from slack_sdk.web.async_client import AsyncWebClient
 
-from nephthys.database.tables import User
 from nephthys.database.tables import UserTagSubscription
 from nephthys.events.app_home_opened import open_app_home
 from nephthys.utils.logging import send_heartbeat
+from nephthys.utils.user_cache import user_cache
 from nephthys.views.home import AppHomeView
 
 
@@ -20,7 +20,7 @@ async def tag_subscribe_callback(
     await ack()
     slack_id = body["user"]["id"]
 
-    user = await User.objects().where(User.slack_id == slack_id).first()
+    user = await user_cache.get(slack_id)
     if not user:
         await send_heartbeat(
             f"Attempted to subscribe to tag by unknown user <@{slack_id}>"
@@ -4,8 +4,8 @@ from datetime import timedelta
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 
-from nephthys.utils.stats import calculate_daily_stats
 from nephthys.utils.stats import calculate_overall_stats
+from nephthys.utils.stats_windows import calculate_multi_window_stats
 
 
 async def stats_v2(req: Request):
@@ -18,15 +18,19 @@ async def stats_v2(req: Request):
 
     now = datetime.now().astimezone()
     one_day_ago = now - timedelta(days=1)
-    current_day_stats = await calculate_daily_stats(one_day_ago, now)
-    prev_day_stats = await calculate_daily_stats(
-        one_day_ago - timedelta(days=1), one_day_ago
-    )
-
     seven_days_ago = now - timedelta(days=7)
-    current_week_stats = await calculate_daily_stats(seven_days_ago, now)
-    prev_week_stats = await calculate_daily_stats(
-        seven_days_ago - timedelta(days=7), seven_days_ago
+    (
+        current_day_stats,
+        prev_day_stats,
+        current_week_stats,
+        prev_week_stats,
+    ) = await calculate_multi_window_stats(
+        [
+            (one_day_ago, now),
+            (one_day_ago - timedelta(days=1), one_day_ago),
+            (seven_days_ago, now),
+            (seven_days_ago - timedelta(days=7), seven_days_ago),
+        ]
     )
 
     return JSONResponse(
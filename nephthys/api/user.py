@@ -2,12 +2,12 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 
 from nephthys.database.tables import Ticket
-from nephthys.database.tables import User
+from nephthys.utils.user_cache import user_cache
 
 
 async def user_stats(req: Request):
     user_id = req.query_params["id"]
-    user = await User.objects().where(User.slack_id == user_id).first()
+    user = await user_cache.get(user_id)
     if not user:
         return JSONResponse({"error": "user_not_found"}, status_code=404)
 
@@ -15,6 +15,14 @@ class UserType(StrEnum):
     OTHER = "OTHER"
 
 
+class CategoryTagSource(StrEnum):
+    """What picked a ticket's category tag"""
+
+    HELPER = "HELPER"
+    AI = "AI"
+    CLASSIFIER = "CLASSIFIER"
+
+
 class FeedbackRating(StrEnum):
     GREAT = "GREAT"
     OKAY = "OKAY"
@@ -26,3 +34,6 @@ FeedbackRatingColumn = create_postgres_enum_type("feedback_rating", FeedbackRati
 # but we have a migration to make them snake_case for consistency and Piccolo compatibility.
 TicketStatusColumn = create_postgres_enum_type("ticket_status", TicketStatus)
 UserTypeColumn = create_postgres_enum_type("user_type", UserType)
+CategoryTagSourceColumn = create_postgres_enum_type(
+    "category_tag_source", CategoryTagSource
+)
@@ -1,5 +1,8 @@
 from piccolo.columns import Boolean
+from piccolo.columns import Date
+from piccolo.columns import DoublePrecision
 from piccolo.columns import ForeignKey
+from piccolo.columns import Integer
 from piccolo.columns import LazyTableReference
 from piccolo.columns import M2M
 from piccolo.columns import OnDelete
@@ -11,6 +14,7 @@ from piccolo.columns import Varchar
 from piccolo.columns.defaults.timestamptz import TimestamptzNow
 from piccolo.table import Table
 
+from nephthys.database.enums import CategoryTagSourceColumn
 from nephthys.database.enums import FeedbackRatingColumn
 from nephthys.database.enums import TicketStatus
 from nephthys.database.enums import TicketStatusColumn
@@ -95,6 +99,14 @@ class Ticket(Table, tablename="Ticket"):
         on_delete=OnDelete.set_null,
         on_update=OnUpdate.cascade,
     )
+    # Null for tickets tagged before this was recorded
+    # Nullable columns default to "", which isn't a valid category_tag_source
+    category_tag_source = CategoryTagSourceColumn(
+        null=True, default=None, db_column_name="categoryTagSource"
+    )
+    # Set for tickets created in degraded mode, until they're given an AI title
+    # and category tag (see `nephthys.tasks.backfill_enrichment`)
+    enrichment_deferred = Boolean(default=False, db_column_name="enrichmentDeferred")
     created_at = Timestamptz(default=TimestamptzNow(), db_column_name="createdAt")
 
 
@@ -177,6 +189,86 @@ class Feedback(Table, tablename="Feedback"):
     created_at = Timestamptz(default=TimestamptzNow(), db_column_name="createdAt")
 
 
+class TicketDailyRollup(Table, tablename="TicketDailyRollup"):
+    """Pre-aggregated ticket statistics for each (UTC) day
+
+    Maintained by `nephthys.utils.stats_rollup` whenever a ticket changes state,
+    so that stats for long time periods don't have to scan the Ticket table.
+
+    The primary key is (day, categoryTagId, closedById), which Piccolo can't
+    represent, so it's only defined in the migration. This also means the table
+    has no `id` column, despite the one Piccolo adds, so select columns
+    explicitly (or use raw queries).
+    """
+
+    day = Date()
+    # These are 0 (rather than null) if the ticket has no category tag/closer,
+    # so that they can be part of the primary key
+    category_tag = Integer(db_column_name="categoryTagId")
+    closed_by = Integer(db_column_name="closedById")
+
+    # Tickets created on this day, and their current statuses
+    opened_count = Integer(default=0, db_column_name="openedCount")
+    opened_open_count = Integer(default=0, db_column_name="openedOpenCount")
+    opened_in_progress_count = Integer(
+        default=0, db_column_name="openedInProgressCount"
+    )
+    opened_closed_count = Integer(default=0, db_column_name="openedClosedCount")
+    # Tickets closed on this day that are still closed
+    closed_count = Integer(default=0, db_column_name="closedCount")
+    # Tickets assigned on this day that are still in progress
+    assigned_in_progress_count = Integer(
+        default=0, db_column_name="assignedInProgressCount"
+    )
+
+    # Time sums for tickets created on this day
+    hang_seconds_sum = DoublePrecision(default=0, db_column_name="hangSecondsSum")
+    hang_count = Integer(default=0, db_column_name="hangCount")
+    hang_unresolved_seconds_sum = DoublePrecision(
+        default=0, db_column_name="hangUnresolvedSecondsSum"
+    )
+    hang_unresolved_count = Integer(default=0, db_column_name="hangUnresolvedCount")
+    resolution_seconds_sum = DoublePrecision(
+        default=0, db_column_name="resolutionSecondsSum"
+    )
+    resolution_count = Integer(default=0, db_column_name="resolutionCount")
+
+
+class AIResultCache(Table, tablename="AIResultCache"):
+    """AI-generated ticket titles and category tags, keyed by a hash of the
+    (normalised) question text. See `nephthys.utils.ai_result_cache`."""
+
+    content_hash = Text(primary_key=True, db_column_name="contentHash")
+    title = Text(null=True)
+    # Not a foreign key, as cached category tags are checked before they're used
+    category_tag = Integer(null=True, db_column_name="categoryTagId")
+    updated_at = Timestamptz(default=TimestamptzNow(), db_column_name="updatedAt")
+
+
+class DeletionQueue(Table, tablename="DeletionQueue"):
+    """Slack messages waiting to be deleted. See `nephthys.utils.delete_thread`."""
+
+    id = Serial(primary_key=True, unique=True)
+    # Unique together with ts (enforced by a unique index in the migration)
+    channel_id = Text(db_column_name="channelId")
+    ts = Text()
+    # The parent message's ts, for thread replies. A parent isn't claimed until
+    # all of its replies have left the queue.
+    thread_ts = Text(null=True, db_column_name="threadTs")
+    attempts = Integer(default=0)
+    # When the message can next be claimed by a worker
+    available_at = Timestamptz(default=TimestamptzNow(), db_column_name="availableAt")
+    created_at = Timestamptz(default=TimestamptzNow(), db_column_name="createdAt")
+
+
+class ProcessedEvent(Table, tablename="ProcessedEvent"):
+    """IDs of Slack events that have already been handled, so that retried
+    deliveries can be ignored. See `nephthys.utils.event_dedupe`."""
+
+    event_id = Text(primary_key=True, db_column_name="eventId")
+    created_at = Timestamptz(default=TimestamptzNow(), db_column_name="createdAt")
+
+
 # All tables must be listed here so that piccolo_app.py can find them.
 # This list is used for generating auto migrations.
 ALL_TABLES = [
@@ -189,4 +281,8 @@ ALL_TABLES = [
     TagsOnTickets,
     UserTagSubscription,
     Feedback,
+    TicketDailyRollup,
+    AIResultCache,
+    DeletionQueue,
+    ProcessedEvent,
 ]
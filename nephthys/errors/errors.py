@@ -8,3 +8,7 @@ class PermissionDenied(Exception):
     def __init__(self, message: str, user_id: int):
         super().__init__(message)
         self.user_id = user_id
+
+
+class AIUnavailableError(Exception):
+    """Raised instead of calling the AI when it's overloaded or unhealthy"""
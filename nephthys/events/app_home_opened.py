@@ -11,6 +11,7 @@ from nephthys.database.tables import User
 from nephthys.utils.env import env
 from nephthys.utils.logging import send_heartbeat
 from nephthys.utils.performance import perf_timer
+from nephthys.utils.user_cache import user_cache
 from nephthys.views.home import AppHomeView
 from nephthys.views.home.assigned import get_assigned_tickets_view
 from nephthys.views.home.category_tags import get_category_tags_view
@@ -32,7 +33,7 @@ DEFAULT_VIEW = AppHomeView.DASHBOARD
 
 async def on_app_home_opened(event: dict[str, Any], client: AsyncWebClient):
     slack_id = event["user"]
-    user = await User.objects().get(User.slack_id == slack_id)
+    user = await user_cache.get(slack_id)
     # Restore the the last view the user had open, if any
     if user and user.app_home_last_view:
         try:
@@ -74,7 +75,7 @@ async def open_app_home(
         await client.views_publish(view=get_loading_view(home_type), user_id=user_id)
 
         # Generate the view (this is when DB queries are made)
-        user = await User.objects().where(User.slack_id == user_id).first()
+        user = await user_cache.get(user_id)
         logging.info(f"Opening {home_type} for {user_id}")
 
         async with perf_timer(
@@ -109,8 +110,11 @@ async def open_app_home(
 
         # Record the user's last-viewed page for future visits
         if user:
+            # Only this column, since the user may have come from the cache
             user.app_home_last_view = home_type.value
-            await user.save()
+            await User.update({User.app_home_last_view: home_type.value}).where(
+                User.id == user.id
+            )
 
     except Exception as e:
         logging.error(f"Error opening app home: {e}")
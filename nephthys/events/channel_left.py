@@ -4,6 +4,8 @@ from slack_sdk.web.async_client import AsyncWebClient
 
 from nephthys.database.tables import User
 from nephthys.utils.env import env
+from nephthys.utils.helper_team import remove_helper_team_member
+from nephthys.utils.user_cache import user_cache
 
 
 async def channel_left(ack: AsyncAck, event: dict, client: AsyncWebClient):
@@ -15,6 +17,9 @@ async def channel_left(ack: AsyncAck, event: dict, client: AsyncWebClient):
         return
 
     await User.update({User.helper: False}).where(User.slack_id == user_id)
+    user_cache.invalidate(user_id)
+    if channel_id == env.slack_bts_channel:
+        remove_helper_team_member(user_id)
 
     try:
         match channel_id:
@@ -1,8 +1,8 @@
 from slack_sdk.web.async_client import AsyncWebClient
 
-from nephthys.database.tables import CategoryTag
 from nephthys.database.tables import User
 from nephthys.utils.env import env
+from nephthys.utils.tag_catalog import category_tag_catalog
 
 
 async def backend_message_blocks(
@@ -13,22 +13,19 @@ async def backend_message_blocks(
     reopened_by: User | None = None,
 ) -> list[dict]:
     thread_url = f"https://hackclub.slack.com/archives/{env.slack_help_channel}/p{msg_ts.replace('.', '')}"
-    if current_category_tag_id is not None:
-        options = [
-            {
-                "text": {
-                    "type": "plain_text",
-                    "text": tag.name,
-                },
-                "value": f"{tag.id}",
-            }
-            for tag in await CategoryTag.objects()
-        ]
-        initial_option = [
-            option
-            for option in options
-            if option["value"] == f"{current_category_tag_id}"
-        ][0]
+    current_category_tag = (
+        await category_tag_catalog.get(current_category_tag_id)
+        if current_category_tag_id is not None
+        else None
+    )
+    if current_category_tag:
+        initial_option = {
+            "text": {
+                "type": "plain_text",
+                "text": current_category_tag.name,
+            },
+            "value": f"{current_category_tag.id}",
+        }
     else:
         initial_option = None
     category_tags_dropdown = {
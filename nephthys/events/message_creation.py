@@ -1,6 +1,6 @@
+import asyncio
 import logging
 import string
-from datetime import datetime
 from typing import Any
 from typing import Dict
 
@@ -9,26 +9,47 @@ from prometheus_client import Histogram
 from slack_sdk.errors import SlackApiError
 from slack_sdk.web.async_client import AsyncWebClient
 
+from nephthys.database.enums import CategoryTagSource
 from nephthys.database.enums import TicketStatus
-from nephthys.database.enums import UserType
 from nephthys.database.tables import BotMessage
 from nephthys.database.tables import CategoryTag
 from nephthys.database.tables import Ticket
 from nephthys.database.tables import User
+from nephthys.errors.errors import AIUnavailableError
 from nephthys.events.message.send_backend_message import backend_message_blocks
 from nephthys.events.message.send_backend_message import backend_message_fallback_text
 from nephthys.events.message.send_backend_message import send_backend_message
 from nephthys.macros import run_macro
+from nephthys.utils import category_classifier
+from nephthys.utils.ai_governor import ai_governor
+from nephthys.utils.ai_result_cache import ai_result_cache
+from nephthys.utils.category_classifier import CLASSIFIER_AGREEMENT
+from nephthys.utils.category_classifier import CLASSIFIER_PREDICTIONS
 from nephthys.utils.env import env
+from nephthys.utils.load_mode import load_monitor
 from nephthys.utils.logging import send_heartbeat
+from nephthys.utils.open_tickets import open_ticket_index
+from nephthys.utils.open_tickets import OpenTicket
 from nephthys.utils.performance import perf_timer
 from nephthys.utils.slack_user import get_user_profile
+from nephthys.utils.stats_rollup import record_ticket_change
+from nephthys.utils.stats_rollup import TicketRollupState
+from nephthys.utils.tag_catalog import category_tag_catalog
 from nephthys.utils.ticket_methods import delete_and_clean_up_ticket
 from nephthys.utils.ticket_methods import ThreadGoneError
+from nephthys.utils.ticket_transitions import record_reply
+from nephthys.utils.ticket_transitions import suggest_category_tag
+from nephthys.utils.user_cache import user_cache
 
 # Message subtypes that should be handled by on_message (messages with no subtype are always handled)
 ALLOWED_SUBTYPES = ["file_share", "me_message", "thread_broadcast"]
 
+# Number of words from the question to use as the ticket title until the AI one is ready
+PLACEHOLDER_TITLE_WORDS = 7
+
+# Keeps references to background enrichment tasks so they don't get garbage collected
+enrichment_tasks: set[asyncio.Task] = set()
+
 TICKET_TITLE_GENERATION_DURATION = Histogram(
     "nephthys_ticket_title_generation_duration_seconds",
     "How long it takes to generate a ticket title using AI",
@@ -64,17 +85,24 @@ async def handle_message_in_thread(event: Dict[str, Any], db_user: User | None):
     - If the message starts with "?" (and is from a helper), run the corresponding macro.
     - Otherwise, update the assigned helper, ticket status, and lastMsg fields.
     """
-    ticket_message = (
-        await Ticket.objects(Ticket.opened_by)
-        .where(Ticket.msg_ts == event["thread_ts"])
-        .first()
-    )
-    if not ticket_message:
-        return
+    thread_ts = event["thread_ts"]
     text: str = event.get("text", "")
     first_word = text.split()[0].lower() if text.strip() else ""
+    is_helper = bool(db_user and db_user.helper)
 
-    if db_user and db_user.helper and first_word.startswith("?"):
+    if db_user and is_helper and first_word.startswith("?"):
+        # Macros need the whole ticket. Open tickets come from the index, which
+        # has everything but the description (only needed for closed tickets).
+        if entry := open_ticket_index.get_by_msg_ts(thread_ts):
+            ticket_message = entry.to_ticket()
+        else:
+            ticket_message = (
+                await Ticket.objects(Ticket.opened_by)
+                .where(Ticket.msg_ts == thread_ts)
+                .first()
+            )
+        if not ticket_message:
+            return
         await run_macro(
             name=first_word.lstrip("?"),
             ticket=ticket_message,
@@ -84,40 +112,8 @@ async def handle_message_in_thread(event: Dict[str, Any], db_user: User | None):
         )
         return
 
-    # Update lastMsg fields in DB
-    is_author = bool(
-        ticket_message.opened_by and event["user"] == ticket_message.opened_by.slack_id
-    )
-    is_helper = bool(db_user and db_user.helper)
-    await Ticket.update(
-        {
-            Ticket.last_msg_at: datetime.now(),
-            Ticket.last_msg_by: (
-                UserType.AUTHOR
-                if is_author
-                else UserType.HELPER
-                if is_helper
-                else UserType.OTHER
-            ),
-        }
-    ).where(Ticket.msg_ts == event["thread_ts"])
-
-    # Ensure the ticket is assigned to the helper who last sent a message
-    if db_user and db_user.helper and ticket_message.status != TicketStatus.CLOSED:
-        logging.info(
-            f"Assigning ticket ticket_id={ticket_message.id} to helper user_id={db_user.id}"
-        )
-        await Ticket.update(
-            {
-                Ticket.assigned_to: db_user.id,
-                Ticket.status: TicketStatus.IN_PROGRESS,
-                Ticket.assigned_at: (
-                    datetime.now()
-                    if not ticket_message.assigned_at
-                    else ticket_message.assigned_at
-                ),
-            }
-        ).where(Ticket.msg_ts == event["thread_ts"])
+    # Also assigns the ticket to the helper who last sent a message
+    await record_reply(thread_ts, db_user, is_helper)
 
 
 async def handle_new_question(
@@ -126,7 +122,8 @@ async def handle_new_question(
     """Handle a new support question posted in the help channel.
 
     Creates a ticket in the database, sends a message in the support thread
-    and in the tickets channel, and generates an AI-powered ticket title.
+    and in the tickets channel. An AI-powered title and category tag are then
+    generated in the background (see `enrich_ticket()`).
 
     Args:
         event (Dict[str, Any]): The Slack event containing the new question.
@@ -135,6 +132,7 @@ async def handle_new_question(
     """
     author_id = event.get("user", "unknown")
     text = event.get("text", "")
+    load_monitor.record_question()
     async with perf_timer("Slack user info fetch"):
         author = await get_user_profile(author_id)
 
@@ -160,6 +158,7 @@ async def handle_new_question(
                     f"Failed to upsert user in DB for slack_id={author_id}"
                 )
             db_user_id = updated_records[0]["id"]
+        user_cache.invalidate(author_id)
 
     async with perf_timer("Sending backend ticket message"):
         ticket_message = await send_backend_message(
@@ -195,39 +194,16 @@ async def handle_new_question(
         )
         return
 
-    async with perf_timer(
-        "AI ticket title generation", TICKET_TITLE_GENERATION_DURATION
-    ):
-        title = await generate_ticket_title(text)
-
-    async with perf_timer(
-        "AI category tag generation", TICKET_CATEGORY_GENERATION_DURATION
-    ):
-        category_tag_id = await generate_category_tag(text)
-
-    if category_tag_id:
-        blocks = await backend_message_blocks(
-            author_user_id=author_id,
-            msg_ts=event["ts"],
-            past_tickets=past_tickets,
-            current_category_tag_id=category_tag_id,
-        )
-
-        await client.chat_update(
-            channel=env.slack_ticket_channel,
-            ts=ticket_message_ts,
-            text=backend_message_fallback_text(author_id, text),
-            blocks=blocks,
-        )
-
     user_facing_message_ts = user_facing_message["ts"]
     if not user_facing_message_ts:
         logging.error(f"User-facing message has no ts: {user_facing_message}")
         return
 
+    # Save the AI calls for when things calm down (see `backfill_ticket_enrichment()`)
+    defer_enrichment = load_monitor.degraded
     async with perf_timer("Creating ticket in DB"):
         ticket = Ticket(
-            title=title,
+            title=placeholder_ticket_title(text),
             description=text,
             status=TicketStatus.OPEN,
             msg_ts=event["ts"],
@@ -236,10 +212,14 @@ async def handle_new_question(
             assigned_at=None,
             closed_at=None,
             reopened_at=None,
+            enrichment_deferred=defer_enrichment,
+        )
+        async with Ticket._meta.db.transaction():
+            await ticket.save()
+            await record_ticket_change(None, TicketRollupState.from_ticket(ticket))
+        open_ticket_index.put(
+            OpenTicket.from_ticket(ticket, opened_by_slack_id=author_id)
         )
-        if category_tag_id:
-            ticket.category_tag = category_tag_id
-        await ticket.save()
 
         bot_msg = BotMessage(
             channel_id=event["channel"],
@@ -248,11 +228,6 @@ async def handle_new_question(
         )
         await bot_msg.save()
 
-        if not category_tag_id:
-            logging.warning(
-                f"Failed to generate category tag for ticket_id={ticket.id}"
-            )
-
     try:
         await client.reactions_add(
             channel=event["channel"], name="thinking_face", timestamp=event["ts"]
@@ -266,6 +241,88 @@ async def handle_new_question(
             f"Top-level message for thread_ts={event['ts']} has been deleted. Cleaning up and deleting ticket_id={ticket.id}"
         )
         await delete_and_clean_up_ticket(ticket)
+        return
+
+    if defer_enrichment:
+        logging.info(f"Deferring AI enrichment ticket_id={ticket.id}")
+        return
+
+    # The AI calls take a while, so they happen after the ticket has been created
+    task = asyncio.create_task(
+        enrich_ticket(ticket, author_id, past_tickets, text, client)
+    )
+    enrichment_tasks.add(task)
+    task.add_done_callback(enrichment_tasks.discard)
+
+
+def placeholder_ticket_title(text: str) -> str:
+    """A title to use until the AI-generated one is ready"""
+    words = text.split()
+    title = " ".join(words[:PLACEHOLDER_TITLE_WORDS])
+    if len(words) > PLACEHOLDER_TITLE_WORDS:
+        title += "..."
+    return title or "New ticket"
+
+
+async def enrich_ticket(
+    ticket: Ticket,
+    author_id: str,
+    past_tickets: int,
+    text: str,
+    client: AsyncWebClient,
+):
+    """Generates a title and category tag for a newly created ticket using AI,
+    and updates the ticket and its backend message with them."""
+
+    async def timed_title() -> str | None:
+        async with perf_timer(
+            "AI ticket title generation", TICKET_TITLE_GENERATION_DURATION
+        ):
+            return await generate_ticket_title(text)
+
+    async def timed_category_tag() -> tuple[int, CategoryTagSource] | None:
+        async with perf_timer(
+            "AI category tag generation", TICKET_CATEGORY_GENERATION_DURATION
+        ):
+            return await generate_category_tag(text)
+
+    try:
+        title, category_tag = await asyncio.gather(timed_title(), timed_category_tag())
+
+        if title:
+            await Ticket.update({Ticket.title: title}).where(Ticket.id == ticket.id)
+            await open_ticket_index.refresh(ticket.id)
+
+        if not category_tag:
+            logging.warning(
+                f"Failed to generate category tag for ticket_id={ticket.id}"
+            )
+            return
+        category_tag_id, category_tag_source = category_tag
+
+        # Don't overwrite a category tag that a helper has picked in the meantime
+        if not await suggest_category_tag(
+            ticket.id, category_tag_id, category_tag_source
+        ):
+            return
+
+        blocks = await backend_message_blocks(
+            author_user_id=author_id,
+            msg_ts=ticket.msg_ts,
+            past_tickets=past_tickets,
+            current_category_tag_id=category_tag_id,
+        )
+        await client.chat_update(
+            channel=env.slack_ticket_channel,
+            ts=ticket.ticket_ts,
+            text=backend_message_fallback_text(author_id, text),
+            blocks=blocks,
+        )
+    except Exception as e:
+        # The ticket still works without a title or category tag
+        logging.error(
+            f"Failed to enrich ticket ticket_id={ticket.id}: {e}", exc_info=True
+        )
 
 
 async def send_user_facing_message(
@@ -344,11 +401,7 @@ async def on_message(event: Dict[str, Any], client: AsyncWebClient):
         return
 
     async with perf_timer("DB user lookup"):
-        db_user = (
-            await User.objects()
-            .where(User.slack_id == event.get("user", "unknown"))
-            .first()
-        )
+        db_user = await user_cache.get(event.get("user", "unknown"))
 
     # Messages sent in a thread with the "send to channel" checkbox checked
     if event.get("subtype") == "thread_broadcast" and not (db_user and db_user.helper):
@@ -361,7 +414,11 @@ async def on_message(event: Dict[str, Any], client: AsyncWebClient):
 
     await handle_new_question(event, client, db_user)
 
-    if env.uptime_url and env.environment == "production":
+    if (
+        env.uptime_url
+        and env.environment == "production"
+        and load_monitor.should_ping_uptime()
+    ):
         async with env.session.get(env.uptime_url) as res:
             if res.status != 200:
                 await send_heartbeat(
@@ -373,50 +430,94 @@ async def on_message(event: Dict[str, Any], client: AsyncWebClient):
                 )
 
 
-async def generate_ticket_title(text: str):
+async def generate_ticket_title(text: str) -> str | None:
+    """Asks the AI for a title for the question, returning None if it couldn't
+    give one (so that the placeholder title is kept)"""
     if not env.ai_client:
-        return "No title available from AI."
+        return None
+
+    # People often post the same question more than once
+    if cached_title := await ai_result_cache.get("title", text):
+        return cached_title
 
     model = "openai/gpt-oss-120b"
     try:
-        response = await env.ai_client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a helpful assistant that helps organise tickets for Hack Club's support team. You're going to take in a message and give it a title."
-                        "You will return no other content. Do NOT use title case but use capital letter at start of sentence + use capital letters for terms/proper nouns."
-                        "Avoid quote marks. Even if it's silly please summarise it. Use no more than 7 words, but as few as possible"
-                        "When mentioning Flavortown, do *NOT* change it to 'flavor town' or 'flavour town'. Hack Club should *NOT* be changed to 'hackclub'."
-                        "Hackatime, Flavortown, and Hack Club should always be capitalized correctly. Same goes for terms like VSCode, PyCharm, API, and GitHub."
-                    ),
-                },
-                {
-                    "role": "user",
-                    "content": f"Here is a message from a user: {text}\n\nPlease give this ticket a title.",
-                },
-            ],
+        response = await ai_governor.call(
+            "ticket_title",
+            env.ai_client.chat.completions.create(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": (
+                            "You are a helpful assistant that helps organise tickets for Hack Club's support team. You're going to take in a message and give it a title."
+                            "You will return no other content. Do NOT use title case but use capital letter at start of sentence + use capital letters for terms/proper nouns."
+                            "Avoid quote marks. Even if it's silly please summarise it. Use no more than 7 words, but as few as possible"
+                            "When mentioning Flavortown, do *NOT* change it to 'flavor town' or 'flavour town'. Hack Club should *NOT* be changed to 'hackclub'."
+                            "Hackatime, Flavortown, and Hack Club should always be capitalized correctly. Same goes for terms like VSCode, PyCharm, API, and GitHub."
+                        ),
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Here is a message from a user: {text}\n\nPlease give this ticket a title.",
+                    },
+                ],
+            ),
         )
-    except OpenAIError as e:
-        await send_heartbeat(f"Failed to get AI response for ticket creation: {e}")
-        return "No title provided by AI."
+    except (OpenAIError, TimeoutError, AIUnavailableError) as e:
+        logging.warning(f"Failed to get AI response for ticket title: {e!r}")
+        return None
 
     if not (len(response.choices) and response.choices[0].message.content):
         await send_heartbeat(f"AI title generation is missing content: {response}")
-        return "No title provided by AI."
+        return None
     title = response.choices[0].message.content.strip()
     # Capitalise first letter
     title = title[0].upper() + title[1:] if len(title) > 1 else title.upper()
+    await ai_result_cache.set("title", text, title)
     return title
 
 
-async def generate_category_tag(text: str) -> int | None:
-    category_tags = await CategoryTag.objects()
+async def generate_category_tag(text: str) -> tuple[int, CategoryTagSource] | None:
+    """Picks a category tag for the question, and returns it along with what
+    picked it (so that the classifier isn't trained on its own predictions)"""
+    category_tags = await category_tag_catalog.all()
 
     if not category_tags:
         return None
 
+    # Try the local classifier first, as it's much quicker than the AI
+    classifier = category_classifier.category_classifier
+    prediction = None
+    if not classifier:
+        CLASSIFIER_PREDICTIONS.labels(result="untrained").inc()
+    elif not (predicted := classifier.predict(text)):
+        # Too little of the text is known to the classifier for it to guess
+        CLASSIFIER_PREDICTIONS.labels(result="unknown_text").inc()
+    else:
+        predicted_tag_id, confidence = predicted
+        if predicted_tag_id in {tag.id for tag in category_tags}:
+            prediction = predicted_tag_id
+            if confidence >= env.category_classifier_threshold:
+                CLASSIFIER_PREDICTIONS.labels(result="hit").inc()
+                return predicted_tag_id, CategoryTagSource.CLASSIFIER
+        CLASSIFIER_PREDICTIONS.labels(result="fallback").inc()
+
+    cached_tag_id = await ai_result_cache.get("category_tag", text)
+    if cached_tag_id in {tag.id for tag in category_tags}:
+        return cached_tag_id, CategoryTagSource.AI
+
+    ai_tag_id = await generate_category_tag_with_ai(text, category_tags)
+    if ai_tag_id:
+        await ai_result_cache.set("category_tag", text, ai_tag_id)
+    if prediction and ai_tag_id:
+        CLASSIFIER_AGREEMENT.labels(agreed=str(prediction == ai_tag_id).lower()).inc()
+    return (ai_tag_id, CategoryTagSource.AI) if ai_tag_id else None
+
+
+async def generate_category_tag_with_ai(
+    text: str, category_tags: list[CategoryTag]
+) -> int | None:
     tag_options = ", ".join([tag.name for tag in category_tags])
     tag_map = {tag.name.lower(): tag for tag in category_tags}
 
@@ -425,25 +526,28 @@ async def generate_category_tag(text: str) -> int | None:
 
     model = "google/gemini-3-flash-preview"
     try:
-        response = await env.ai_client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a helpful assistant that categorizes support tickets! "
-                        f"Choose the best tag from this list: [{tag_options}]. "
-                        "Return ONLY the exact tag name. If none fit, return 'None'."
-                    ),
-                },
-                {
-                    "role": "user",
-                    "content": f"Ticket content: {text}",
-                },
-            ],
+        response = await ai_governor.call(
+            "category_tag",
+            env.ai_client.chat.completions.create(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": (
+                            "You are a helpful assistant that categorizes support tickets! "
+                            f"Choose the best tag from this list: [{tag_options}]. "
+                            "Return ONLY the exact tag name. If none fit, return 'None'."
+                        ),
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Ticket content: {text}",
+                    },
+                ],
+            ),
         )
-    except OpenAIError as e:
-        await send_heartbeat(f"Failed to get AI response for tag generation: {e}")
+    except (OpenAIError, TimeoutError, AIUnavailableError) as e:
+        logging.warning(f"Failed to get AI response for tag generation: {e!r}")
         return None
 
     if not (len(response.choices) and response.choices[0].message.content):
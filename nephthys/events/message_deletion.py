@@ -9,6 +9,7 @@ from nephthys.database.tables import Ticket
 from nephthys.utils.env import env
 from nephthys.utils.logging import send_heartbeat
 from nephthys.utils.ticket_methods import delete_and_clean_up_ticket
+from nephthys.utils.ticket_transitions import delete_ticket
 
 
 async def handle_question_deletion(
@@ -76,7 +77,11 @@ async def on_message_deletion(event: Dict[str, Any], client: AsyncWebClient) ->
     if event.get("subtype") == "message_deleted":
         # This means the message has been completely deleted with out leaving a "tombstone"
         # No thread means no messages to delete, but we should delete any associated ticket from the DB
-        await Ticket.delete().where(Ticket.msg_ts == deleted_msg["ts"])
+        ticket = (
+            await Ticket.objects().where(Ticket.msg_ts == deleted_msg["ts"]).first()
+        )
+        if ticket:
+            await delete_ticket(ticket.id)
     else:
         # A parent message (i.e. top-level message in help channel) has been deleted
         await handle_question_deletion(client, event["channel"], deleted_msg)
@@ -0,0 +1,10 @@
+from typing import Any
+
+from nephthys.utils.slack_user import user_profile_cache
+
+
+async def on_user_change(event: dict[str, Any]):
+    """Keeps cached Slack profiles up to date when a user's profile changes"""
+    user = event.get("user")
+    if user and user.get("id"):
+        user_profile_cache.update(user)
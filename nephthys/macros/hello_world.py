@@ -1,5 +1,6 @@
 from nephthys.macros.types import Macro
 from nephthys.utils.env import env
+from nephthys.utils.slack_user import get_user_profile
 from nephthys.utils.ticket_methods import reply_to_ticket
 
 
@@ -10,12 +11,7 @@ class HelloWorld(Macro):
         """
         A simple hello world macro that does nothing.
         """
-        user_info = await env.slack_client.users_info(user=helper.slack_id)
-        name = (
-            user_info["user"]["profile"].get("display_name")
-            or user_info["user"]["profile"].get("real_name")
-            or user_info["user"]["name"]
-        )
+        name = (await get_user_profile(helper.slack_id)).display_name()
         await reply_to_ticket(
             text=f"hey, {name}! i'm heidi :rac_shy: say hi to orpheus for me would you? :rac_cute:",
             ticket=ticket,
@@ -1,11 +1,9 @@
 from nephthys.database.tables import TagsOnTickets
-from nephthys.database.tables import TeamTag as TeamTagTable
-from nephthys.database.tables import User
-from nephthys.database.tables import UserTagSubscription
 from nephthys.macros.types import Macro
 from nephthys.utils.env import env
-from nephthys.utils.ticket_methods import get_backend_message_link
-from nephthys.utils.ticket_methods import get_question_message_link
+from nephthys.utils.tag_catalog import team_tag_catalog
+from nephthys.utils.tag_notifications import add_ticket_team_tags
+from nephthys.utils.tag_notifications import start_tag_notifications
 
 
 class TeamTag(Macro):
@@ -25,20 +23,16 @@ class TeamTag(Macro):
 
         tag_name = parts[1].strip()
 
-        all_tags = await TeamTagTable.objects()
+        tag = await team_tag_catalog.get_by_name(tag_name)
 
-        tag = next((t for t in all_tags if t.name == tag_name), None)
         if not tag:
-            matches = [t for t in all_tags if t.name.lower() == tag_name.lower()]
-            tag = matches[0] if matches else None
-
-        if not tag:
-            names = ", ".join(f"`{t.name}`" for t in all_tags)
+            similar_tags = await team_tag_catalog.search(tag_name, limit=10)
+            names = ", ".join(f"`{t.name}`" for t in similar_tags)
             await env.slack_client.chat_postEphemeral(
                 channel=env.slack_help_channel,
                 thread_ts=ticket.msg_ts,
                 user=helper.slack_id,
-                text=f"Tag `{tag_name}` not found. Available tags: {names}"
+                text=f"Tag `{tag_name}` not found. Similar tags: {names}"
                 if names
                 else f"Tag `{tag_name}` not found. No tags exist yet.",
             )
@@ -58,23 +52,8 @@ class TeamTag(Macro):
             )
             return
 
-        link = TagsOnTickets(tag=tag.id, ticket=ticket.id)
-        await link.save()
-
-        subscriptions = await UserTagSubscription.objects().where(
-            UserTagSubscription.tag == tag.id
-        )
-        subscriber_ids = [s.user for s in subscriptions if s.user != helper.id]
-
-        if subscriber_ids:
-            subscribers = await User.objects().where(User.id.is_in(subscriber_ids))
-            url = get_question_message_link(ticket)
-            ticket_url = get_backend_message_link(ticket)
-            for user in subscribers:
-                await env.slack_client.chat_postMessage(
-                    channel=user.slack_id,
-                    text=f"New ticket for *{tag.name}*: *{ticket.title}*\n<{url}|ticket> <{ticket_url}|bts ticket>",
-                )
+        await add_ticket_team_tags(ticket.id, [tag.id])
+        start_tag_notifications(ticket, {tag.id: tag.name}, exclude_user_id=helper.id)
 
         await env.slack_client.chat_postEphemeral(
             channel=env.slack_help_channel,
@@ -1,30 +1,9 @@
 import logging
 
-from thefuzz import fuzz
-from thefuzz import process
-
-from nephthys.database.tables import CategoryTag
+from nephthys.utils.tag_catalog import category_tag_catalog
 
 
 async def get_category_tags(payload: dict) -> list[dict[str, dict[str, str] | str]]:
-    tags = await CategoryTag.objects()
-    if not tags:
-        return []
-
-    keyword = payload.get("value")
-    if keyword:
-        tag_names = [tag.name for tag in tags]
-        scores = process.extract(keyword, tag_names, scorer=fuzz.ratio, limit=100)
-        matching_tags = [tags[tag_names.index(score[0])] for score in scores]
-    else:
-        matching_tags = tags
-
-    res = [
-        {
-            "text": {"type": "plain_text", "text": f"{tag.name}"},
-            "value": str(tag.id),
-        }
-        for tag in matching_tags
-    ]
+    res = await category_tag_catalog.search_options(payload.get("value"))
     logging.debug(res)
     return res
@@ -0,0 +1,37 @@
+from nephthys.database.raw_migration import raw_migration
+
+ID = "2026-10-18T10:12:41:318204"
+VERSION = "1.33.0"
+DESCRIPTION = "Add TicketDailyRollup table for pre-aggregated ticket stats"
+
+
+async def forwards():
+    # The table gets populated on startup (or with nephthys/scripts/rebuild_stats_rollup.py)
+    return raw_migration(
+        migration_id=ID,
+        app_name="nephthys",
+        description=DESCRIPTION,
+        forwards="""
+CREATE TABLE "TicketDailyRollup" (
+  "day" DATE NOT NULL,
+  "categoryTagId" INTEGER NOT NULL DEFAULT 0,
+  "closedById" INTEGER NOT NULL DEFAULT 0,
+  "openedCount" INTEGER NOT NULL DEFAULT 0,
+  "openedOpenCount" INTEGER NOT NULL DEFAULT 0,
+  "openedInProgressCount" INTEGER NOT NULL DEFAULT 0,
+  "openedClosedCount" INTEGER NOT NULL DEFAULT 0,
+  "closedCount" INTEGER NOT NULL DEFAULT 0,
+  "assignedInProgressCount" INTEGER NOT NULL DEFAULT 0,
+  "hangSecondsSum" DOUBLE PRECISION NOT NULL DEFAULT 0,
+  "hangCount" INTEGER NOT NULL DEFAULT 0,
+  "hangUnresolvedSecondsSum" DOUBLE PRECISION NOT NULL DEFAULT 0,
+  "hangUnresolvedCount" INTEGER NOT NULL DEFAULT 0,
+  "resolutionSecondsSum" DOUBLE PRECISION NOT NULL DEFAULT 0,
+  "resolutionCount" INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY ("day", "categoryTagId", "closedById")
+);
+""",
+        backwards="""
+DROP TABLE IF EXISTS "TicketDailyRollup";
+""",
+    )
@@ -0,0 +1,79 @@
+from piccolo.apps.migrations.auto.migration_manager import MigrationManager
+from piccolo.table import Table
+
+ID = "2026-10-18T11:02:37:540917"
+VERSION = "1.33.0"
+DESCRIPTION = "Add indexes for frequently run Ticket and BotMessage queries"
+
+
+class RawTable(Table):
+    pass
+
+
+# (index name, table, columns)
+INDEXES = [
+    ("Ticket_status_idx", "Ticket", '"status"'),
+    ("Ticket_closedById_closedAt_idx", "Ticket", '"closedById", "closedAt"'),
+    (
+        "Ticket_assignedToId_status_createdAt_idx",
+        "Ticket",
+        '"assignedToId", "status", "createdAt"',
+    ),
+    (
+        "Ticket_status_lastMsgBy_lastMsgAt_idx",
+        "Ticket",
+        '"status", "lastMsgBy", "lastMsgAt"',
+    ),
+    (
+        "Ticket_categoryTagId_status_createdAt_idx",
+        "Ticket",
+        '"categoryTagId", "status", "createdAt"',
+    ),
+    ("Ticket_openedById_idx", "Ticket", '"openedById"'),
+    # Used by the windowed stats queries
+    ("Ticket_createdAt_idx", "Ticket", '"createdAt"'),
+    ("Ticket_closedAt_idx", "Ticket", '"closedAt"'),
+    ("Ticket_assignedAt_idx", "Ticket", '"assignedAt"'),
+    ("BotMessage_ticketId_idx", "BotMessage", '"ticketId"'),
+]
+
+
+async def forwards():
+    # CREATE INDEX CONCURRENTLY avoids locking the tables against writes while
+    # the indexes are built, but it can't be run inside a transaction (or a DO
+    # block), so each index is created with its own statement.
+    manager = MigrationManager(
+        migration_id=ID,
+        app_name="nephthys",
+        description=DESCRIPTION,
+        wrap_in_transaction=False,
+    )
+
+    async def run():
+        for name, table, columns in INDEXES:
+            # A failed concurrent build leaves behind an invalid index, which
+            # IF NOT EXISTS would skip over, so clear those out first
+            await RawTable.raw(f"""
+                DO $$
+                BEGIN
+                    IF EXISTS (
+                        SELECT 1 FROM pg_index
+                        JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+                        WHERE pg_class.relname = '{name}' AND NOT pg_index.indisvalid
+                    ) THEN
+                        DROP INDEX "{name}";
+                    END IF;
+                END$$;
+            """)
+            await RawTable.raw(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" ({columns})'
+            )
+
+    async def run_backwards():
+        for name, _, _ in INDEXES:
+            await RawTable.raw(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+    manager.add_raw(run)
+    manager.add_raw_backwards(run_backwards)
+
+    return manager
@@ -0,0 +1,27 @@
+from nephthys.database.raw_migration import raw_migration
+
+ID = "2026-10-18T12:20:05:164823"
+VERSION = "1.33.0"
+DESCRIPTION = (
+    "Add AIResultCache table for caching AI-generated ticket titles and category tags"
+)
+
+
+async def forwards():
+    return raw_migration(
+        migration_id=ID,
+        app_name="nephthys",
+        description=DESCRIPTION,
+        forwards="""
+CREATE TABLE "AIResultCache" (
+  "contentHash" TEXT NOT NULL PRIMARY KEY,
+  "title" TEXT,
+  "categoryTagId" INTEGER,
+  "updatedAt" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX "AIResultCache_updatedAt_idx" ON "AIResultCache" ("updatedAt");
+""",
+        backwards="""
+DROP TABLE IF EXISTS "AIResultCache";
+""",
+    )
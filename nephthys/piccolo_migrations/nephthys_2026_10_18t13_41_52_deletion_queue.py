@@ -0,0 +1,28 @@
+from nephthys.database.raw_migration import raw_migration
+
+ID = "2026-10-18T13:41:52:508317"
+VERSION = "1.33.0"
+DESCRIPTION = "Add DeletionQueue table for Slack messages waiting to be deleted"
+
+
+async def forwards():
+    return raw_migration(
+        migration_id=ID,
+        app_name="nephthys",
+        description=DESCRIPTION,
+        forwards="""
+CREATE TABLE "DeletionQueue" (
+  "id" SERIAL PRIMARY KEY,
+  "channelId" TEXT NOT NULL,
+  "ts" TEXT NOT NULL,
+  "attempts" INTEGER NOT NULL DEFAULT 0,
+  "availableAt" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  "createdAt" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX "DeletionQueue_channelId_ts_key" ON "DeletionQueue" ("channelId", "ts");
+CREATE INDEX "DeletionQueue_availableAt_idx" ON "DeletionQueue" ("availableAt");
+""",
+        backwards="""
+DROP TABLE IF EXISTS "DeletionQueue";
+""",
+    )
@@ -0,0 +1,23 @@
+from nephthys.database.raw_migration import raw_migration
+
+ID = "2026-10-18T14:26:09:731460"
+VERSION = "1.33.0"
+DESCRIPTION = "Add ProcessedEvent table for ignoring retried Slack events"
+
+
+async def forwards():
+    return raw_migration(
+        migration_id=ID,
+        app_name="nephthys",
+        description=DESCRIPTION,
+        forwards="""
+CREATE TABLE "ProcessedEvent" (
+  "eventId" TEXT NOT NULL PRIMARY KEY,
+  "createdAt" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX "ProcessedEvent_createdAt_idx" ON "ProcessedEvent" ("createdAt");
+""",
+        backwards="""
+DROP TABLE IF EXISTS "ProcessedEvent";
+""",
+    )
@@ -0,0 +1,21 @@
+from nephthys.database.raw_migration import raw_migration
+
+ID = "2026-10-18T16:05:47:218394"
+VERSION = "1.33.0"
+DESCRIPTION = "Add categoryTagSource column to Ticket table"
+
+
+async def forwards():
+    return raw_migration(
+        migration_id=ID,
+        app_name="nephthys",
+        description=DESCRIPTION,
+        forwards="""
+CREATE TYPE category_tag_source AS ENUM ('HELPER', 'AI', 'CLASSIFIER');
+ALTER TABLE "Ticket" ADD COLUMN "categoryTagSource" category_tag_source;
+""",
+        backwards="""
+ALTER TABLE "Ticket" DROP COLUMN IF EXISTS "categoryTagSource";
+DROP TYPE IF EXISTS category_tag_source;
+""",
+    )
@@ -0,0 +1,22 @@
+from nephthys.database.raw_migration import raw_migration
+
+ID = "2026-10-18T16:48:12:640951"
+VERSION = "1.33.0"
+DESCRIPTION = "Add threadTs column to DeletionQueue table"
+
+
+async def forwards():
+    return raw_migration(
+        migration_id=ID,
+        app_name="nephthys",
+        description=DESCRIPTION,
+        forwards="""
+ALTER TABLE "DeletionQueue" ADD COLUMN "threadTs" TEXT;
+CREATE INDEX "DeletionQueue_channelId_threadTs_idx" ON "DeletionQueue" ("channelId", "threadTs")
+  WHERE "threadTs" IS NOT NULL;
+""",
+        backwards="""
+DROP INDEX IF EXISTS "DeletionQueue_channelId_threadTs_idx";
+ALTER TABLE "DeletionQueue" DROP COLUMN IF EXISTS "threadTs";
+""",
+    )
@@ -0,0 +1,22 @@
+from nephthys.database.raw_migration import raw_migration
+
+ID = "2026-10-18T17:22:05:417263"
+VERSION = "1.33.0"
+DESCRIPTION = "Add enrichmentDeferred column to Ticket table"
+
+
+async def forwards():
+    return raw_migration(
+        migration_id=ID,
+        app_name="nephthys",
+        description=DESCRIPTION,
+        forwards="""
+ALTER TABLE "Ticket" ADD COLUMN "enrichmentDeferred" BOOLEAN NOT NULL DEFAULT FALSE;
+CREATE INDEX "Ticket_enrichmentDeferred_createdAt_idx" ON "Ticket" ("createdAt")
+  WHERE "enrichmentDeferred";
+""",
+        backwards="""
+DROP INDEX IF EXISTS "Ticket_enrichmentDeferred_createdAt_idx";
+ALTER TABLE "Ticket" DROP COLUMN IF EXISTS "enrichmentDeferred";
+""",
+    )
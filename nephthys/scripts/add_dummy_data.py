@@ -8,7 +8,9 @@ from random import randint
 from nephthys.database.enums import TicketStatus
 from nephthys.database.tables import Ticket
 from nephthys.database.tables import User
+from nephthys.utils.logging import heartbeat_buffer
 from nephthys.utils.logging import send_heartbeat
+from nephthys.utils.stats_rollup import rebuild_ticket_daily_rollup
 
 
 async def get_default_user() -> User:
@@ -39,7 +41,10 @@ async def create_dummy_records(num_records: int, assigned_to: int | None = None)
             closed_at=datetime.fromtimestamp(timestamp + 110),
         )
         await ticket.save()
+    # Rather than recording each ticket in the rollup as it's created
+    await rebuild_ticket_daily_rollup()
     await send_heartbeat(f"Created {num_records} dummy ticket records.")
+    await heartbeat_buffer.flush()
     logging.info(f"Successfully created {num_records} dummy ticket records.")
 
 
@@ -0,0 +1,91 @@
+import argparse
+import random
+import string
+from dataclasses import dataclass
+from time import perf_counter
+
+from thefuzz import fuzz
+from thefuzz import process
+
+from nephthys.utils.tag_search import TagSearchIndex
+
+WORDS = [
+    "hackatime",
+    "shop",
+    "order",
+    "fulfillment",
+    "project",
+    "ship",
+    "review",
+    "vote",
+    "github",
+    "account",
+    "payout",
+    "hardware",
+    "grant",
+    "event",
+    "website",
+    "slack",
+]
+
+
+@dataclass
+class FakeTag:
+    id: int
+    name: str
+
+
+def fake_tags(count: int) -> list[FakeTag]:
+    rng = random.Random(0)
+    return [
+        FakeTag(
+            id=i,
+            name=" ".join(rng.sample(WORDS, 2))
+            + f" {''.join(rng.choices(string.ascii_lowercase, k=3))}",
+        )
+        for i in range(count)
+    ]
+
+
+def old_search(tags: list[FakeTag], keyword: str) -> list[dict]:
+    """How the tag options handlers used to search tags"""
+    tag_names = [tag.name for tag in tags]
+    scores = process.extract(keyword, tag_names, scorer=fuzz.ratio, limit=100)
+    matching_tags = [tags[tag_names.index(score[0])] for score in scores]
+    return [
+        {"text": {"type": "plain_text", "text": f"{tag.name}"}, "value": str(tag.id)}
+        for tag in matching_tags
+    ]
+
+
+def time_it(name: str, function, repeats: int):
+    start = perf_counter()
+    for _ in range(repeats):
+        function()
+    duration = (perf_counter() - start) / repeats
+    print(f"{name}: {duration * 1000:.2f}ms per search")
+
+
+def main(count: int, repeats: int):
+    tags = fake_tags(count)
+    queries = ["hack", "shop ord", "fulfilment", "gh", "project review"]
+
+    start = perf_counter()
+    index = TagSearchIndex(tags)
+    print(f"Built index for {count} tags in {(perf_counter() - start) * 1000:.2f}ms")
+
+    for query in queries:
+        print(f"Query {query!r}:")
+        time_it("  old search", lambda: old_search(tags, query), repeats)
+        time_it("  index search", lambda: index.search_options(query), repeats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compares the tag search index with the old tag search"
+    )
+    parser.add_argument("--count", type=int, default=3000, help="number of tags")
+    parser.add_argument("--repeats", type=int, default=20, help="searches per query")
+    args = parser.parse_args()
+
+    main(args.count, args.repeats)
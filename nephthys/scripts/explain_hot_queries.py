@@ -0,0 +1,123 @@
+import argparse
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+
+from nephthys.database.enums import TicketStatus
+from nephthys.database.enums import UserType
+from nephthys.database.tables import BotMessage
+from nephthys.database.tables import CategoryTag
+from nephthys.database.tables import Ticket
+from nephthys.database.tables import User
+
+
+async def get_sample_ids() -> tuple[int, int, int]:
+    """Gets a user, category tag and ticket to use in the queries below"""
+    user = await User.select(User.id).first()
+    category_tag = await CategoryTag.select(CategoryTag.id).first()
+    ticket = await BotMessage.select(BotMessage.ticket).first()
+    return (
+        user["id"] if user else 0,
+        category_tag["id"] if category_tag else 0,
+        ticket["ticket"] if ticket else 0,
+    )
+
+
+async def get_hot_queries() -> dict[str, tuple[str, list]]:
+    """The queries the bot runs most often, in the same shape as they're run by the app"""
+    user_id, category_tag_id, ticket_id = await get_sample_ids()
+    now = datetime.now().astimezone()
+    one_day_ago = now - timedelta(days=1)
+    seven_days_ago = now - timedelta(days=7)
+
+    return {
+        "unanswered tickets (get_unanswered_tickets)": (
+            """
+            SELECT * FROM "Ticket"
+            WHERE "status" = {} AND "lastMsgBy" != {}
+            ORDER BY "lastMsgAt" LIMIT 1
+            """,
+            [TicketStatus.OPEN, UserType.HELPER],
+        ),
+        "assigned tickets (App Home)": (
+            """
+            SELECT * FROM "Ticket"
+            WHERE "assignedToId" = {} AND "status" != {}
+            ORDER BY "createdAt" LIMIT 10
+            """,
+            [user_id, TicketStatus.CLOSED],
+        ),
+        "fulfillment reminder": (
+            """
+            SELECT * FROM "Ticket"
+            WHERE "categoryTagId" = {} AND "status" IN ({}, {}) AND "createdAt" >= {}
+            """,
+            [category_tag_id, TicketStatus.OPEN, TicketStatus.IN_PROGRESS, one_day_ago],
+        ),
+        "past ticket count": (
+            """SELECT COUNT(*) FROM "Ticket" WHERE "openedById" = {}""",
+            [user_id],
+        ),
+        "closed ticket count (/api/user)": (
+            """SELECT COUNT(*) FROM "Ticket" WHERE "closedById" = {}""",
+            [user_id],
+        ),
+        "ticket status counts (App Home)": (
+            """SELECT COUNT(*) FROM "Ticket" WHERE "status" = {}""",
+            [TicketStatus.IN_PROGRESS],
+        ),
+        "helpers leaderboard (daily stats)": (
+            """
+            SELECT "closedById", COUNT(*) FROM "Ticket"
+            WHERE "closedAt" >= {} AND "closedAt" < {} AND "closedById" IS NOT NULL
+            GROUP BY "closedById"
+            """,
+            [seven_days_ago, now],
+        ),
+        "windowed tickets (daily stats)": (
+            """
+            SELECT COUNT(*) FROM "Ticket"
+            WHERE ("createdAt" >= {} AND "createdAt" < {})
+                OR ("closedAt" >= {} AND "closedAt" < {})
+                OR ("assignedAt" >= {} AND "assignedAt" < {})
+            """,
+            [one_day_ago, now] * 3,
+        ),
+        "bot messages for a ticket": (
+            """SELECT * FROM "BotMessage" WHERE "ticketId" = {}""",
+            [ticket_id],
+        ),
+    }
+
+
+async def main(disable_seqscan: bool):
+    # Make sure the planner has up-to-date statistics (e.g. after seeding the
+    # database with add_dummy_data.py)
+    await Ticket.raw('ANALYZE "Ticket"')
+    await Ticket.raw('ANALYZE "BotMessage"')
+
+    queries = await get_hot_queries()
+    async with Ticket._meta.db.transaction():
+        if disable_seqscan:
+            await Ticket.raw("SET LOCAL enable_seqscan = off")
+        for name, (sql, args) in queries.items():
+            rows = await Ticket.raw(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", *args)
+            plan = [row["QUERY PLAN"] for row in rows]
+            uses_index = not any("Seq Scan" in line for line in plan)
+            print(f"=== {name} ({'uses indexes' if uses_index else 'SEQ SCAN'})")
+            print("\n".join(plan))
+            print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Runs EXPLAIN ANALYZE on the bot's most frequent queries"
+    )
+    parser.add_argument(
+        "--disable-seqscan",
+        action="store_true",
+        help="discourage sequential scans, to check indexes are usable on small databases",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args.disable_seqscan))
@@ -0,0 +1,14 @@
+import asyncio
+import logging
+
+from nephthys.utils.stats_rollup import rebuild_ticket_daily_rollup
+
+
+async def main():
+    await rebuild_ticket_daily_rollup()
+    logging.info("Successfully rebuilt the ticket daily rollup table.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
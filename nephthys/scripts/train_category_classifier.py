@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+import random
+
+from nephthys.utils.category_classifier import CategoryClassifier
+from nephthys.utils.category_classifier import fetch_training_data
+
+
+async def main(threshold: float, test_fraction: float):
+    texts, labels = await fetch_training_data()
+    samples = list(zip(texts, labels))
+    random.Random(0).shuffle(samples)
+    test_count = int(len(samples) * test_fraction)
+    test, train = samples[:test_count], samples[test_count:]
+    if not test or len({label for _, label in train}) < 2:
+        print(f"Not enough tagged tickets to evaluate the classifier ({len(samples)})")
+        return
+
+    train_texts, train_labels = zip(*train)
+    classifier = CategoryClassifier.train(list(train_texts), list(train_labels))
+
+    correct = confident = confident_correct = 0
+    for text, label in test:
+        if not (prediction := classifier.predict(text)):
+            # Would fall back to the AI
+            continue
+        predicted, confidence = prediction
+        correct += predicted == label
+        if confidence >= threshold:
+            confident += 1
+            confident_correct += predicted == label
+
+    print(f"Trained on {len(train)} tickets, tested on {len(test)}")
+    print(f"Accuracy: {correct / len(test):.1%}")
+    print(
+        f"Above threshold {threshold}: {confident / len(test):.1%} of tickets "
+        f"(would skip the AI), {confident_correct / max(confident, 1):.1%} accurate"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Trains the category classifier on past tickets and reports how accurate it is"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.8,
+        help="confidence threshold to report on (see CATEGORY_CLASSIFIER_THRESHOLD)",
+    )
+    parser.add_argument(
+        "--test-fraction",
+        type=float,
+        default=0.2,
+        help="fraction of tickets to hold out for testing",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args.threshold, args.test_fraction))
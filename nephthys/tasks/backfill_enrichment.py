@@ -0,0 +1,60 @@
+import logging
+from datetime import datetime
+from datetime import timedelta
+
+from nephthys.database.enums import TicketStatus
+from nephthys.database.tables import Ticket
+from nephthys.events.message_creation import enrich_ticket
+from nephthys.utils.env import env
+from nephthys.utils.load_mode import load_monitor
+from nephthys.utils.slack_rate_limit import background_priority
+
+# Tickets older than this are left alone, as helpers will have dealt with them
+BACKFILL_MAX_AGE = timedelta(days=1)
+
+
+@background_priority
+async def backfill_ticket_enrichment():
+    """Generates AI titles and category tags for tickets created while ticket
+    creation was in degraded mode (see `nephthys.utils.load_mode`).
+
+    Those tickets have `enrichment_deferred` set. Each one is only attempted
+    once, so tickets whose enrichment fails aren't retried. This runs every
+    minute, and does nothing while still degraded.
+    """
+    if load_monitor.update():
+        return
+
+    now = datetime.now().astimezone()
+    pending = await Ticket.objects(Ticket.opened_by).where(
+        Ticket.enrichment_deferred.eq(True)
+        & (Ticket.status != TicketStatus.CLOSED)
+        & (Ticket.created_at > now - BACKFILL_MAX_AGE)
+    )
+    if not pending:
+        return
+
+    logging.info(f"Backfilling AI enrichment for tickets count={len(pending)}")
+    for ticket in pending:
+        if load_monitor.update():
+            logging.info("Pausing enrichment backfill, as ticket creation is degraded")
+            return
+        # Claim the ticket, in case another backfill run already got to it
+        claimed = (
+            await Ticket.update({Ticket.enrichment_deferred: False})
+            .where((Ticket.id == ticket.id) & Ticket.enrichment_deferred.eq(True))
+            .returning(Ticket.id)
+        )
+        if not claimed:
+            continue
+        past_tickets = await Ticket.count().where(
+            (Ticket.opened_by == ticket.opened_by.id)
+            & (Ticket.created_at < ticket.created_at)
+        )
+        await enrich_ticket(
+            ticket,
+            ticket.opened_by.slack_id,
+            past_tickets,
+            ticket.description,
+            env.slack_client,
+        )
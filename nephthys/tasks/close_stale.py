@@ -1,92 +1,97 @@
 import asyncio
 import logging
+import time
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
 
+from prometheus_client import Counter
+from prometheus_client import Gauge
+from prometheus_client import Histogram
 from slack_sdk.errors import SlackApiError
 
 from nephthys.actions.resolve import resolve
-from nephthys.database.enums import TicketStatus
-from nephthys.database.tables import Ticket
 from nephthys.database.tables import User
 from nephthys.utils.env import env
 from nephthys.utils.logging import send_heartbeat
-
-
-async def get_is_stale(ts: str, stale_ticket_days: int, max_retries: int = 3) -> bool:
-    for attempt in range(max_retries):
-        try:
-            replies = await env.slack_client.conversations_replies(
-                channel=env.slack_help_channel, ts=ts, limit=1000
+from nephthys.utils.open_tickets import open_ticket_index
+from nephthys.utils.open_tickets import OpenTicket
+from nephthys.utils.slack_rate_limit import background_priority
+from nephthys.utils.ticket_transitions import close_ticket
+
+
+STALE_SCAN_DURATION = Histogram(
+    "nephthys_stale_scan_duration_seconds",
+    "How long it takes to check for (and close) stale tickets",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600),
+)
+STALE_SCAN_CANDIDATES = Gauge(
+    "nephthys_stale_scan_candidates",
+    "Tickets whose last recorded message was past the stale threshold, in the latest scan",
+)
+STALE_SCAN_API_CALLS = Counter(
+    "nephthys_stale_scan_api_calls_total",
+    "conversations.replies calls made while checking for stale tickets, by result",
+    ["result"],
+)
+STALE_TICKETS_CLOSED = Counter(
+    "nephthys_stale_tickets_closed_total",
+    "Tickets closed for being stale",
+)
+
+# Number of tickets checked against Slack at once
+STALE_SCAN_WORKERS = 3
+
+
+async def get_is_stale(ts: str, stale_ticket_days: int) -> bool:
+    cutoff = datetime.now(tz=timezone.utc) - timedelta(days=stale_ticket_days)
+    try:
+        # We only need to know whether there are any messages since the cutoff.
+        # The Slack client paces this call, and retries it if we're rate limited.
+        replies = await env.slack_client.conversations_replies(
+            channel=env.slack_help_channel,
+            ts=ts,
+            oldest=f"{cutoff.timestamp():.6f}",
+            limit=10,
+        )
+    except SlackApiError as e:
+        STALE_SCAN_API_CALLS.labels(result="error").inc()
+        if e.response["error"] == "thread_not_found":
+            logging.warning(
+                f"Thread not found for ticket {ts}. This might be a deleted thread."
             )
-            last_reply = (
-                replies.get("messages", [])[-1] if replies.get("messages") else None
+            await send_heartbeat(f"Thread not found for ticket {ts}.")
+            maintainer_user = (
+                await User.objects()
+                .where(User.slack_id == env.slack_maintainer_id)
+                .first()
             )
-            if not last_reply:
-                logging.error("No replies found - this should never happen")
-                await send_heartbeat(f"No replies found for ticket {ts}")
-                return False
-            return (
-                datetime.now(tz=timezone.utc)
-                - datetime.fromtimestamp(float(last_reply["ts"]), tz=timezone.utc)
-            ) > timedelta(days=stale_ticket_days)
-        except SlackApiError as e:
-            if e.response["error"] == "ratelimited":
-                retry_after = int(e.response.headers.get("Retry-After", 1))
-                # Exponential backoff: wait longer on each retry
-                wait_time = retry_after * (2**attempt)
-                logging.warning(
-                    f"Rate limited while fetching replies for ticket {ts}. "
-                    f"Attempt {attempt + 1}/{max_retries}. Retrying after {wait_time} seconds."
-                )
-                await asyncio.sleep(wait_time)
-                if attempt == max_retries - 1:
-                    logging.error(f"Max retries exceeded for ticket {ts}")
-                    return False
-                continue
-            elif e.response["error"] == "thread_not_found":
-                logging.warning(
-                    f"Thread not found for ticket {ts}. This might be a deleted thread."
-                )
-                await send_heartbeat(f"Thread not found for ticket {ts}.")
-                maintainer_user = (
-                    await User.objects()
-                    .where(User.slack_id == env.slack_maintainer_id)
-                    .first()
-                )
-                if maintainer_user:
-                    await Ticket.update(
-                        {
-                            Ticket.status: TicketStatus.CLOSED,
-                            Ticket.closed_at: datetime.now(),
-                            Ticket.closed_by: maintainer_user.id,
-                        }
-                    ).where(Ticket.msg_ts == ts)
-                else:
-                    await Ticket.update(
-                        {
-                            Ticket.status: TicketStatus.CLOSED,
-                            Ticket.closed_at: datetime.now(),
-                        }
-                    ).where(Ticket.msg_ts == ts)
-                return False
-            else:
-                logging.error(
-                    f"Error fetching replies for ticket {ts}: {e.response['error']}"
-                )
-                await send_heartbeat(
-                    f"Error fetching replies for ticket {ts}: {e.response['error']}"
-                )
-                return False
-    return False
+            await close_ticket(ts, maintainer_user.id if maintainer_user else None)
+        else:
+            logging.error(
+                f"Error fetching replies for ticket {ts}: {e.response['error']}"
+            )
+            await send_heartbeat(
+                f"Error fetching replies for ticket {ts}: {e.response['error']}"
+            )
+        return False
+    STALE_SCAN_API_CALLS.labels(result="success").inc()
+    messages = replies.get("messages", [])
+    return not any(
+        datetime.fromtimestamp(float(message["ts"]), tz=timezone.utc) > cutoff
+        for message in messages
+    )
 
 
+@background_priority
 async def close_stale_tickets():
     """
     Closes tickets that have been inactive for more than the configured number of days,
     based on the timestamp of the last message in the ticket's Slack thread.
 
+    Only tickets whose last recorded message (`last_msg_at`) is older than that
+    are checked against Slack, a few at a time.
+
     Configure via the STALE_TICKET_DAYS environment variable.
     This task is intended to be run periodically (e.g., hourly).
     """
@@ -101,47 +106,52 @@ async def close_stale_tickets():
         f"Closing stale tickets (threshold: {stale_ticket_days} days)..."
     )
 
+    start_time = time.monotonic()
     try:
-        tickets = await Ticket.objects(Ticket.opened_by, Ticket.assigned_to).where(
-            Ticket.status != TicketStatus.CLOSED
-        )
+        # Tickets with a message since the cutoff can't be stale, so only the
+        # rest need checking against Slack (which also sees e.g. bot messages)
+        cutoff = datetime.now().astimezone() - timedelta(days=stale_ticket_days)
+        tickets = await open_ticket_index.stale_candidates(cutoff)
+        STALE_SCAN_CANDIDATES.set(len(tickets))
+        logging.info(f"Checking stale ticket candidates count={len(tickets)}")
+
+        queue: asyncio.Queue[OpenTicket] = asyncio.Queue()
+        for ticket in tickets:
+            queue.put_nowait(ticket)
         stale = 0
 
-        # Process tickets in batches to avoid overwhelming the API
-        batch_size = 10
-        for i in range(0, len(tickets), batch_size):
-            batch = tickets[i : i + batch_size]
-            logging.info(
-                f"Processing stale tickets batch={i // batch_size + 1} batches={(len(tickets) + batch_size - 1) // batch_size}"
-            )
-
-            for ticket in batch:
-                await asyncio.sleep(1.2)  # Rate limiting delay
-
-                if await get_is_stale(ticket.msg_ts, stale_ticket_days):
-                    stale += 1
-                    resolver_user = (
-                        ticket.assigned_to if ticket.assigned_to else ticket.opened_by
-                    )
-                    if not resolver_user:
-                        logging.warning(
-                            f"Skipping stale ticket {ticket.msg_ts}: no assigned or opened user"
-                        )
-                        continue
-                    await resolve(
-                        ticket.msg_ts,
-                        resolver_user.slack_id,
-                        env.slack_client,
-                        stale=True,
+        async def worker():
+            nonlocal stale
+            while not queue.empty():
+                ticket = queue.get_nowait()
+                if not await get_is_stale(ticket.msg_ts, stale_ticket_days):
+                    continue
+                resolver_slack_id = (
+                    ticket.assigned_to_slack_id or ticket.opened_by_slack_id
+                )
+                if not resolver_slack_id:
+                    logging.warning(
+                        f"Skipping stale ticket {ticket.msg_ts}: no assigned or opened user"
                     )
+                    continue
+                await resolve(
+                    ticket.msg_ts,
+                    resolver_slack_id,
+                    env.slack_client,
+                    stale=True,
+                )
+                stale += 1
+                STALE_TICKETS_CLOSED.inc()
 
-            # Longer delay between batches
-            if i + batch_size < len(tickets):
-                await asyncio.sleep(5)
+        await asyncio.gather(*(worker() for _ in range(STALE_SCAN_WORKERS)))
 
         await send_heartbeat(f"Closed {stale} stale tickets.")
 
-        logging.info(f"Closed stale tickets. count={stale}")
+        logging.info(
+            f"Closed stale tickets. count={stale} candidates={len(tickets)} duration={time.monotonic() - start_time:.1f}s"
+        )
     except Exception as e:
         logging.error(f"Error closing stale tickets: {e}")
         await send_heartbeat(f"Error closing stale tickets: {e}")
+    finally:
+        STALE_SCAN_DURATION.observe(time.monotonic() - start_time)
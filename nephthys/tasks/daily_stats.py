@@ -9,6 +9,7 @@ from nephthys.database.tables import Ticket
 from nephthys.utils.env import env
 from nephthys.utils.logging import send_heartbeat
 from nephthys.utils.old_tickets import get_unanswered_tickets
+from nephthys.utils.slack_rate_limit import background_priority
 from nephthys.utils.stats import calculate_daily_stats
 from nephthys.utils.ticket_methods import get_question_message_link
 from nephthys.views.home.components.ticket_status_pie import (
@@ -62,6 +63,7 @@ async def tickets_awaiting_response_message(tickets: list[Ticket]) -> str:
     return "\n".join(msg_lines)
 
 
+@background_priority
 async def send_daily_stats():
     """
     Calculates and sends statistics for the previous day to a Slack channel.
@@ -3,11 +3,12 @@ from datetime import datetime
 from datetime import timedelta
 
 from nephthys.database.enums import TicketStatus
-from nephthys.database.tables import CategoryTag
 from nephthys.database.tables import TagsOnTickets
 from nephthys.database.tables import Ticket
 from nephthys.utils.env import env
 from nephthys.utils.logging import send_heartbeat
+from nephthys.utils.slack_rate_limit import background_priority
+from nephthys.utils.tag_catalog import category_tag_catalog
 from nephthys.utils.ticket_methods import get_question_message_link
 
 
@@ -16,6 +17,7 @@ def slack_timestamp(dt: datetime, format: str = "date_short") -> str:
     return f"<!date^{int(dt.timestamp())}^{{{format}}}|{fallback}>"
 
 
+@background_priority
 async def send_fulfillment_reminder():
     """
     Checks for 'Shop/fulfillment query' tag and sends a reminder with open tickets for the fulfillment team/amber
@@ -28,11 +30,7 @@ async def send_fulfillment_reminder():
     logging.info("Running fulfillment team reminder task")
 
     try:
-        tag = (
-            await CategoryTag.objects()
-            .where(CategoryTag.name == target_tag_name)
-            .first()
-        )
+        tag = await category_tag_catalog.get_by_name(target_tag_name)
 
         if not tag:
             logging.info(
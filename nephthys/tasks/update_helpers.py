@@ -2,11 +2,13 @@ import logging
 
 from nephthys.database.tables import User
 from nephthys.utils.env import env
+from nephthys.utils.helper_team import refresh_helper_team
+from nephthys.utils.slack_user import get_user_profile
+from nephthys.utils.user_cache import user_cache
 
 
 async def update_helpers():
-    res = await env.slack_client.conversations_members(channel=env.slack_bts_channel)
-    team_ids = res.get("members", [])
+    team_ids = list(await refresh_helper_team())
 
     # Get bot user ID to exclude from helpers
     bot_info = await env.slack_client.auth_test()
@@ -39,16 +41,16 @@ async def update_helpers():
     new_users = []
     for member_id in team_ids:
         if member_id not in existing_user_ids_in_db:
-            user_info = await env.slack_client.users_info(user=member_id)
+            user_profile = await get_user_profile(member_id)
             logging.info(
-                f"Creating new helper user {member_id} with info {user_info.get('name')}"
+                f"Creating new helper user {member_id} with username {user_profile.username()}"
             )
-            logging.info(f"User info for {member_id}: {user_info}")
+            logging.info(f"User info for {member_id}: {user_profile.raw_data}")
             new_users.append(
                 User(
                     slack_id=member_id,
                     helper=True,
-                    username=user_info.get("user", {}).get("name"),
+                    username=user_profile.username(),
                 )
             )
 
@@ -59,6 +61,7 @@ async def update_helpers():
     await User.update({User.admin: True}).where(
         User.slack_id == env.slack_maintainer_id
     )
+    user_cache.clear()
     maintainer = (
         await User.objects().where(User.slack_id == env.slack_maintainer_id).first()
     )
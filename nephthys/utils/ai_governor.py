@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+from collections.abc import Coroutine
+from enum import Enum
+from typing import Any
+from typing import TypeVar
+
+from prometheus_client import Counter
+from prometheus_client import Gauge
+
+from nephthys.errors.errors import AIUnavailableError
+from nephthys.utils.logging import send_heartbeat
+
+T = TypeVar("T")
+
+AI_CALLS = Counter(
+    "nephthys_ai_calls_total",
+    "AI calls, by outcome (success, error, timeout, queue_timeout if there was no free slot in time, or rejected without calling the AI)",
+    ["purpose", "result"],
+)
+AI_CALLS_WAITING = Gauge(
+    "nephthys_ai_calls_waiting",
+    "AI calls waiting for a free slot",
+)
+AI_CALLS_IN_PROGRESS = Gauge(
+    "nephthys_ai_calls_in_progress",
+    "AI calls currently in progress",
+)
+AI_CIRCUIT_OPEN = Gauge(
+    "nephthys_ai_circuit_open",
+    "Whether AI calls are currently being skipped because the AI is unhealthy (1) or not (0)",
+)
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class AIGovernor:
+    """Limits how many AI calls run at once and how long they can take, and
+    stops calling the AI for a while if it keeps failing (a circuit breaker).
+
+    After `failure_threshold` consecutive failures, calls are rejected for
+    `reset_seconds`. Then a single trial call is let through: if it succeeds
+    the AI is used as normal again, otherwise calls are rejected for another
+    `reset_seconds`.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        timeout_seconds: float,
+        failure_threshold: int,
+        reset_seconds: float,
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+
+    def _allow_call(self) -> bool:
+        if self._state == CircuitState.CLOSED:
+            return True
+        if (
+            self._state == CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self.reset_seconds
+        ):
+            # Let this call through to check whether the AI has recovered
+            self._state = CircuitState.HALF_OPEN
+            return True
+        return False
+
+    async def _record_success(self):
+        self._consecutive_failures = 0
+        if self._state != CircuitState.CLOSED:
+            self._state = CircuitState.CLOSED
+            AI_CIRCUIT_OPEN.set(0)
+            await send_heartbeat("AI calls have recovered, no longer skipping them")
+
+    async def _record_failure(self):
+        self._consecutive_failures += 1
+        if self._state == CircuitState.HALF_OPEN or (
+            self._state == CircuitState.CLOSED
+            and self._consecutive_failures >= self.failure_threshold
+        ):
+            was_closed = self._state == CircuitState.CLOSED
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+            AI_CIRCUIT_OPEN.set(1)
+            if was_closed:
+                await send_heartbeat(
+                    f"AI calls failed {self._consecutive_failures} times in a row, skipping them for now"
+                )
+
+    def _abandon_trial(self):
+        """Goes back to open if the trial call ended without reaching the AI, so
+        that the next call becomes the trial instead"""
+        if self._state == CircuitState.HALF_OPEN:
+            self._state = CircuitState.OPEN
+
+    async def call(self, purpose: str, request: Coroutine[Any, Any, T]) -> T:
+        """Runs an AI call, subject to the concurrency limit, deadline and circuit breaker.
+
+        Raises `AIUnavailableError` if the call was skipped, `TimeoutError` if it
+        waited too long for a free slot or took too long itself, or whatever
+        error the AI call raised. Waiting too long for a slot only means we're
+        busy, so unlike the others it doesn't count as the AI failing.
+        """
+        if not self._allow_call():
+            request.close()
+            AI_CALLS.labels(purpose=purpose, result="rejected").inc()
+            raise AIUnavailableError("AI calls are being skipped while it's unhealthy")
+
+        try:
+            AI_CALLS_WAITING.inc()
+            try:
+                async with asyncio.timeout(self.timeout_seconds):
+                    await self._semaphore.acquire()
+            finally:
+                AI_CALLS_WAITING.dec()
+        except TimeoutError:
+            request.close()
+            self._abandon_trial()
+            AI_CALLS.labels(purpose=purpose, result="queue_timeout").inc()
+            logging.warning(
+                f"AI call timed out waiting for a free slot purpose={purpose}"
+            )
+            raise
+        except asyncio.CancelledError:
+            request.close()
+            self._abandon_trial()
+            raise
+
+        try:
+            async with asyncio.timeout(self.timeout_seconds):
+                with AI_CALLS_IN_PROGRESS.track_inprogress():
+                    result = await request
+        except TimeoutError:
+            AI_CALLS.labels(purpose=purpose, result="timeout").inc()
+            logging.warning(f"AI call timed out purpose={purpose}")
+            await self._record_failure()
+            raise
+        except asyncio.CancelledError:
+            # Don't get stuck half-open if the trial call never finishes
+            self._abandon_trial()
+            raise
+        except Exception:
+            # Includes errors that aren't OpenAIErrors (e.g. from parsing the
+            # response), so that a failed trial call still reopens the circuit
+            AI_CALLS.labels(purpose=purpose, result="error").inc()
+            await self._record_failure()
+            raise
+        finally:
+            self._semaphore.release()
+
+        AI_CALLS.labels(purpose=purpose, result="success").inc()
+        await self._record_success()
+        return result
+
+
+ai_governor = AIGovernor(
+    max_concurrency=8, timeout_seconds=10, failure_threshold=5, reset_seconds=60
+)
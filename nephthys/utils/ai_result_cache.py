@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from datetime import timedelta
+from typing import Literal
+from typing import overload
+
+from prometheus_client import Counter
+
+from nephthys.database.tables import AIResultCache
+
+AI_RESULT_CACHE_REQUESTS = Counter(
+    "nephthys_ai_result_cache_requests_total",
+    "Lookups of cached AI results, by kind (title or category_tag) and whether they were found in memory, in the database, not at all, or skipped because the question was too short",
+    ["kind", "result"],
+)
+
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+# Shorter questions (e.g. "help", or image-only posts with no text) are too
+# vague to share a title or category tag with other questions
+MIN_CACHEABLE_LENGTH = 15
+
+AIResultKind = Literal["title", "category_tag"]
+
+
+def content_hash(text: str) -> str | None:
+    """Hashes question text, ignoring case, punctuation and whitespace, so that
+    near-identical questions get the same hash. Returns None if the question
+    is too short to be cached."""
+    normalised = NON_WORD_PATTERN.sub(" ", text.lower()).strip()
+    if len(normalised) < MIN_CACHEABLE_LENGTH:
+        return None
+    return hashlib.sha256(normalised.encode()).hexdigest()
+
+
+class CachedAIResults:
+    """The ticket titles and category tags the AI came up with for recent questions.
+
+    Entries are kept in memory (up to `max_size` of them, for `ttl_seconds`),
+    and in the AIResultCache table so that they survive restarts.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # (kind, content hash) -> (expiry time, value)
+        self._entries: OrderedDict[tuple[str, str], tuple[float, str | int]] = (
+            OrderedDict()
+        )
+
+    def _get_from_memory(self, kind: str, key: str) -> str | int | None:
+        entry = self._entries.get((kind, key))
+        if not entry:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[(kind, key)]
+            return None
+        self._entries.move_to_end((kind, key))
+        return entry[1]
+
+    def _store_in_memory(self, kind: str, key: str, value: str | int):
+        self._entries[(kind, key)] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end((kind, key))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    @overload
+    async def get(self, kind: Literal["title"], text: str) -> str | None: ...
+    @overload
+    async def get(self, kind: Literal["category_tag"], text: str) -> int | None: ...
+
+    async def get(self, kind: AIResultKind, text: str) -> str | int | None:
+        """Gets the cached title (kind="title") or category tag ID
+        (kind="category_tag") for the given question text, if there is one"""
+        key = content_hash(text)
+        if not key:
+            AI_RESULT_CACHE_REQUESTS.labels(kind=kind, result="too_short").inc()
+            return None
+        value = self._get_from_memory(kind, key)
+        if value is not None:
+            AI_RESULT_CACHE_REQUESTS.labels(kind=kind, result="memory").inc()
+            return value
+
+        try:
+            row = (
+                await AIResultCache.select(
+                    AIResultCache.title, AIResultCache.category_tag
+                )
+                .where(
+                    (AIResultCache.content_hash == key)
+                    & (
+                        AIResultCache.updated_at
+                        > datetime.now().astimezone()
+                        - timedelta(seconds=self.ttl_seconds)
+                    )
+                )
+                .first()
+            )
+        except Exception as e:
+            # The cache is only an optimisation, so carry on without it
+            logging.warning(f"Failed to look up cached AI result: {e}")
+            row = None
+        value = row[kind] if row else None
+        if value is None:
+            AI_RESULT_CACHE_REQUESTS.labels(kind=kind, result="miss").inc()
+            return None
+        AI_RESULT_CACHE_REQUESTS.labels(kind=kind, result="database").inc()
+        self._store_in_memory(kind, key, value)
+        return value
+
+    @overload
+    async def set(self, kind: Literal["title"], text: str, value: str): ...
+    @overload
+    async def set(self, kind: Literal["category_tag"], text: str, value: int): ...
+
+    async def set(self, kind: AIResultKind, text: str, value: str | int):
+        key = content_hash(text)
+        if not key:
+            return
+        self._store_in_memory(kind, key, value)
+        value_column = AIResultCache._meta.get_column_by_name(kind)
+        try:
+            await AIResultCache.insert(
+                AIResultCache(
+                    {
+                        AIResultCache.content_hash: key,
+                        AIResultCache.updated_at: datetime.now().astimezone(),
+                        value_column: value,
+                    }
+                )
+            ).on_conflict(
+                target=AIResultCache.content_hash,
+                action="DO UPDATE",
+                values=[value_column, AIResultCache.updated_at],
+            )
+        except Exception as e:
+            logging.warning(f"Failed to store AI result in cache: {e}")
+
+    async def prune(self):
+        """Deletes expired results from the database"""
+        await AIResultCache.delete().where(
+            AIResultCache.updated_at
+            <= datetime.now().astimezone() - timedelta(seconds=self.ttl_seconds)
+        )
+
+
+ai_result_cache = CachedAIResults(max_size=5000, ttl_seconds=7 * 24 * 60 * 60)
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+from prometheus_client import Counter as MetricCounter
+from prometheus_client import Gauge
+
+from nephthys.database.enums import CategoryTagSource
+from nephthys.database.tables import Ticket
+
+CLASSIFIER_PREDICTIONS = MetricCounter(
+    "nephthys_category_classifier_predictions_total",
+    "Category tag predictions, by whether the local classifier was confident enough to be used (hit), fell back to the AI (fallback), didn't know enough of the text to guess (unknown_text), or wasn't trained (untrained)",
+    ["result"],
+)
+CLASSIFIER_AGREEMENT = MetricCounter(
+    "nephthys_category_classifier_agreement_total",
+    "When falling back to the AI, whether the local classifier's best guess matched the AI's category tag",
+    ["agreed"],
+)
+CLASSIFIER_TRAINING_SAMPLES = Gauge(
+    "nephthys_category_classifier_training_samples",
+    "Number of tickets the category classifier was last trained on",
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9'_-]*")
+
+# Tickets needed before the classifier is trusted at all
+MIN_TRAINING_SAMPLES = 50
+MAX_FEATURES = 5000
+# Words/bigrams must appear in at least this many tickets to be used as a feature
+MIN_DOCUMENT_FREQUENCY = 2
+# Text with fewer known features than this gets no prediction, since the
+# confidence would come almost entirely from the bias (i.e. how common each tag is)
+MIN_KNOWN_FEATURES = 2
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits text into lowercase words and word bigrams"""
+    words = TOKEN_PATTERN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+@dataclass
+class CategoryClassifier:
+    """A TF-IDF + multinomial logistic regression classifier for category tags"""
+
+    vocabulary: dict[str, int]
+    idf: np.ndarray
+    # One row per category tag, one column per feature
+    weights: np.ndarray
+    bias: np.ndarray
+    category_tag_ids: list[int]
+
+    def term_counts(self, text: str) -> dict[int, int]:
+        """Counts how many times each feature appears in the text"""
+        counts = {}
+        for token, count in Counter(tokenize(text)).items():
+            column = self.vocabulary.get(token)
+            if column is not None:
+                counts[column] = count
+        return counts
+
+    def vectorize(self, documents: list[dict[int, int]]) -> np.ndarray:
+        """Turns term counts into L2-normalised TF-IDF vectors"""
+        matrix = np.zeros((len(documents), len(self.vocabulary)), dtype=np.float32)
+        for row, counts in enumerate(documents):
+            columns = list(counts)
+            matrix[row, columns] = 1 + np.log(list(counts.values()))
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def probabilities(self, vectors: np.ndarray) -> np.ndarray:
+        logits = vectors @ self.weights.T + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, text: str) -> tuple[int, float] | None:
+        """Returns the most likely category tag ID, and the model's confidence in
+        it, or None if too little of the text is known to make a prediction"""
+        counts = self.term_counts(text)
+        if len(counts) < MIN_KNOWN_FEATURES:
+            return None
+        probabilities = self.probabilities(self.vectorize([counts]))[0]
+        best = int(probabilities.argmax())
+        return self.category_tag_ids[best], float(probabilities[best])
+
+    @classmethod
+    def train(
+        cls,
+        texts: list[str],
+        labels: list[int],
+        epochs: int = 30,
+        batch_size: int = 256,
+        learning_rate: float = 2.0,
+        l2: float = 1e-4,
+    ) -> "CategoryClassifier":
+        document_frequency = Counter()
+        for text in texts:
+            document_frequency.update(set(tokenize(text)))
+        features = [
+            token
+            for token, count in document_frequency.most_common(MAX_FEATURES)
+            if count >= MIN_DOCUMENT_FREQUENCY
+        ]
+        vocabulary = {token: i for i, token in enumerate(features)}
+        idf = np.log(
+            (1 + len(texts))
+            / (1 + np.array([document_frequency[t] for t in features], np.float32))
+        ) + np.float32(1)
+
+        category_tag_ids = sorted(set(labels))
+        classifier = cls(
+            vocabulary=vocabulary,
+            idf=idf.astype(np.float32),
+            weights=np.zeros((len(category_tag_ids), len(features)), np.float32),
+            bias=np.zeros(len(category_tag_ids), np.float32),
+            category_tag_ids=category_tag_ids,
+        )
+        class_index = {tag_id: i for i, tag_id in enumerate(category_tag_ids)}
+        targets = np.array([class_index[label] for label in labels])
+        # Tokenising is the slow part, so only do it once
+        documents = [classifier.term_counts(text) for text in texts]
+
+        rng = np.random.default_rng(0)
+        for _ in range(epochs):
+            order = rng.permutation(len(texts))
+            for start in range(0, len(texts), batch_size):
+                batch = order[start : start + batch_size]
+                vectors = classifier.vectorize([documents[i] for i in batch])
+                gradient = classifier.probabilities(vectors)
+                gradient[np.arange(len(batch)), targets[batch]] -= 1
+                gradient /= len(batch)
+                classifier.weights -= learning_rate * (
+                    gradient.T @ vectors + l2 * classifier.weights
+                )
+                classifier.bias -= learning_rate * gradient.sum(axis=0)
+        return classifier
+
+
+category_classifier: CategoryClassifier | None = None
+
+
+async def fetch_training_data() -> tuple[list[str], list[int]]:
+    """Gets ticket descriptions and their category tags (which helpers may
+    have corrected) to train the classifier on.
+
+    Tags the classifier picked itself are left out, so that its mistakes
+    don't get reinforced.
+    """
+    rows = await Ticket.select(Ticket.description, Ticket.category_tag).where(
+        Ticket.category_tag.is_not_null()
+        & (
+            Ticket.category_tag_source.is_null()
+            | (Ticket.category_tag_source != CategoryTagSource.CLASSIFIER)
+        )
+    )
+    return [row["description"] for row in rows], [row["category_tag"] for row in rows]
+
+
+async def train_category_classifier():
+    """Retrains the classifier from the tickets in the database"""
+    global category_classifier
+    texts, labels = await fetch_training_data()
+    if len(texts) < MIN_TRAINING_SAMPLES or len(set(labels)) < 2:
+        logging.info(
+            f"Not enough tagged tickets to train category classifier samples={len(texts)}"
+        )
+        return
+    # Training is CPU-bound, so keep it off the event loop
+    category_classifier = await asyncio.to_thread(
+        CategoryClassifier.train, texts, labels
+    )
+    CLASSIFIER_TRAINING_SAMPLES.set(len(texts))
+    logging.info(
+        f"Trained category classifier samples={len(texts)} features={len(category_classifier.vocabulary)} tags={len(category_classifier.category_tag_ids)}"
+    )
@@ -1,80 +1,208 @@
 import asyncio
+import logging
 
+from prometheus_client import Counter
+from prometheus_client import Gauge
 from slack_sdk.errors import SlackApiError
-from slack_sdk.web.async_client import AsyncWebClient
 
+from nephthys.database.tables import DeletionQueue
 from nephthys.utils.env import env
 from nephthys.utils.logging import send_heartbeat
+from nephthys.utils.slack_rate_limit import background_priority
+from nephthys.utils.slack_rate_limit import RateLimitedWebClient
 
-client = AsyncWebClient(token=env.slack_bot_token)
+DELETION_QUEUE_DEPTH = Gauge(
+    "nephthys_deletion_queue_depth",
+    "Number of Slack messages waiting to be deleted",
+)
+DELETION_QUEUE_LAG = Gauge(
+    "nephthys_deletion_queue_lag_seconds",
+    "How long the oldest message in the deletion queue has been waiting",
+)
+DELETIONS = Counter(
+    "nephthys_deletions_total",
+    "Slack messages processed by the deletion queue, by result",
+    ["result"],
+)
 
-delete_queue = asyncio.Queue()
+client = RateLimitedWebClient(token=env.slack_bot_token)
 
+DELETION_WORKERS = 3
+CLAIM_BATCH_SIZE = 10
+# How long a claimed message is hidden from other workers. If the worker dies
+# before finishing, the message is picked up again after this.
+CLAIM_LEASE_SECONDS = 300
+# How often idle workers check the queue if they haven't been woken up
+POLL_INTERVAL_SECONDS = 30
+MAX_ATTEMPTS = 5
 
+# Set when messages are queued, so idle workers don't have to wait for the next poll
+messages_queued = asyncio.Event()
+
+
+async def claim_messages() -> list[dict]:
+    """Claims a batch of messages for this worker. SKIP LOCKED lets several
+    workers claim at once without getting the same messages.
+
+    Thread parents aren't claimed while any of their replies are still queued,
+    since Slack can't delete the replies once the parent is gone."""
+    return await DeletionQueue.raw(
+        """
+        UPDATE "DeletionQueue"
+        SET "availableAt" = now() + make_interval(secs => {}),
+            "attempts" = "attempts" + 1
+        WHERE "id" IN (
+            SELECT "id" FROM "DeletionQueue" AS message
+            WHERE "availableAt" <= now()
+                AND NOT EXISTS (
+                    SELECT 1 FROM "DeletionQueue" AS reply
+                    WHERE reply."channelId" = message."channelId"
+                        AND reply."threadTs" = message."ts"
+                )
+            ORDER BY "id"
+            LIMIT {}
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING "id", "channelId", "ts", "attempts"
+        """,
+        CLAIM_LEASE_SECONDS,
+        CLAIM_BATCH_SIZE,
+    )
+
+
+async def update_queue_metrics():
+    stats = (
+        await DeletionQueue.raw(
+            """
+            SELECT COUNT(*) AS depth,
+                EXTRACT(EPOCH FROM now() - MIN("createdAt"))::float8 AS lag
+            FROM "DeletionQueue"
+            """
+        )
+    )[0]
+    DELETION_QUEUE_DEPTH.set(stats["depth"])
+    DELETION_QUEUE_LAG.set(stats["lag"] or 0)
+
+
+async def retry_later(message: dict, error: str):
+    if message["attempts"] >= MAX_ATTEMPTS:
+        DELETIONS.labels(result="failed").inc()
+        await DeletionQueue.delete().where(DeletionQueue.id == message["id"])
+        await send_heartbeat(
+            f"Giving up on deleting message {message['ts']} in channel {message['channelId']}",
+            messages=[f"Error: {error}"],
+        )
+        return
+    DELETIONS.labels(result="retried").inc()
+    # Back off exponentially: 30s, 60s, 120s, ...
+    await DeletionQueue.raw(
+        """
+        UPDATE "DeletionQueue"
+        SET "availableAt" = now() + make_interval(secs => {})
+        WHERE "id" = {}
+        """,
+        30 * 2 ** (message["attempts"] - 1),
+        message["id"],
+    )
+
+
+async def delete_queued_message(message: dict):
+    channel_id, message_ts = message["channelId"], message["ts"]
+    try:
+        await client.chat_delete(
+            channel=channel_id,
+            ts=message_ts,
+            as_user=True,
+            token=env.slack_user_token,
+        )
+        DELETIONS.labels(result="deleted").inc()
+    except SlackApiError as e:
+        if e.response and e.response["error"] == "message_not_found":
+            # Already deleted, so nothing left to do
+            DELETIONS.labels(result="not_found").inc()
+        else:
+            await retry_later(message, e.response["error"])
+            return
+    except Exception as e:
+        logging.error(
+            f"Unexpected error deleting message ts={message_ts} channel={channel_id}: {e}"
+        )
+        await retry_later(message, str(e))
+        return
+    await DeletionQueue.delete().where(DeletionQueue.id == message["id"])
+
+
+async def deletion_worker():
+    while True:
+        try:
+            messages = await claim_messages()
+        except Exception as e:
+            logging.error(f"Failed to claim messages from deletion queue: {e}")
+            messages = []
+        if not messages:
+            messages_queued.clear()
+            try:
+                await update_queue_metrics()
+            except Exception as e:
+                logging.warning(f"Failed to update deletion queue metrics: {e}")
+            try:
+                await asyncio.wait_for(
+                    messages_queued.wait(), timeout=POLL_INTERVAL_SECONDS
+                )
+            except TimeoutError:
+                pass
+            continue
+        for message in messages:
+            await delete_queued_message(message)
+
+
+@background_priority
 async def process_queue():
     """
-    Continuously processes messages from the delete_queue.
-    Retrieves a message (channel_id, message_ts) and attempts to delete it using Slack API.
+    Continuously deletes the messages in the deletion queue, using several workers.
     Uses a user token to delete messages, thus requiring a user token with workspace admin.
-    Handles rate limiting by retrying after the specified delay.
-    Logs errors for other Slack API failures.
+    Deletions are paced by the shared Slack rate limiter at background priority.
+    Failed deletions are retried with backoff, up to MAX_ATTEMPTS times.
     """
-    while True:
-        channel_id, message_ts = await delete_queue.get()
-        try:
-            await client.chat_delete(
-                channel=channel_id,
-                ts=message_ts,
-                as_user=True,
-                token=env.slack_user_token,
-            )
-            await send_heartbeat(
-                f"Successfully deleted message {message_ts} in channel {channel_id}."
-            )
-        except SlackApiError as e:
-            if e.response and e.response["error"] == "ratelimited":
-                retry_after = int(e.response.headers.get("Retry-After", 1))
-                await asyncio.sleep(retry_after)
-                await delete_queue.put((channel_id, message_ts))
-            elif e.response and e.response["error"] == "message_not_found":
-                await send_heartbeat(
-                    f"Message {message_ts} in channel {channel_id} not found. It might have been already deleted."
-                )
-            else:
-                await send_heartbeat(
-                    f"Failed to delete message in channel {channel_id} with ts {message_ts}",
-                    messages=[f"Error: {e.response['error']}"],
-                )
-        except Exception as e:
-            await send_heartbeat(
-                f"An unexpected error occurred while processing delete queue for message {message_ts} in channel {channel_id}",
-                messages=[f"Error: {str(e)}"],
-            )
-            await delete_queue.put((channel_id, message_ts))
-        finally:
-            delete_queue.task_done()
+    await asyncio.gather(*[deletion_worker() for _ in range(DELETION_WORKERS)])
 
-        await asyncio.sleep(0.5)
+
+async def queue_messages(
+    channel_id: str, message_timestamps: list[str], thread_ts: str | None = None
+):
+    """Adds messages to the deletion queue, ignoring any already in it.
+
+    `thread_ts` should be given if the messages are replies in a thread that is
+    also being deleted.
+    """
+    if not message_timestamps:
+        return
+    await DeletionQueue.insert(
+        *[
+            DeletionQueue(channel_id=channel_id, ts=ts, thread_ts=thread_ts)
+            for ts in message_timestamps
+        ]
+    ).on_conflict(
+        target=(DeletionQueue.channel_id, DeletionQueue.ts), action="DO NOTHING"
+    )
+    messages_queued.set()
 
 
 async def add_message_to_delete_queue(channel_id: str, message_ts: str):
     """
-    Adds a message identifier (channel_id, message_ts) to the asynchronous delete queue.
+    Adds a message identifier (channel_id, message_ts) to the deletion queue.
     """
     if not channel_id or not message_ts:
         await send_heartbeat(
             "Attempted to add invalid message to delete queue: channel_id or message_ts is missing."
         )
         return
-    await delete_queue.put((channel_id, message_ts))
-    await send_heartbeat(
-        f"Added message {message_ts} in channel {channel_id} to delete queue."
-    )
+    await queue_messages(channel_id, [message_ts])
 
 
 async def add_thread_to_delete_queue(channel_id: str, thread_ts: str):
     """
-    Adds a thread identifier (channel_id, thread_ts) to the asynchronous delete queue.
+    Adds every message in a thread (channel_id, thread_ts) to the deletion queue.
     This is used to delete entire threads in Slack.
     """
     if not channel_id or not thread_ts:
@@ -82,15 +210,24 @@ async def add_thread_to_delete_queue(channel_id: str, thread_ts: str):
             "Attempted to add invalid thread to delete queue: channel_id or thread_ts is missing."
         )
         return
-    await delete_queue.put((channel_id, thread_ts))
-    messages = await client.conversations_replies(channel=channel_id, ts=thread_ts)
-    msgs = messages.get("messages", [])
-    if not msgs:
-        return
-    for message in msgs:
-        if "ts" in message:
-            await delete_queue.put((channel_id, message["ts"]))
+    reply_timestamps = []
+    cursor = None
+    while True:
+        response = await client.conversations_replies(
+            channel=channel_id, ts=thread_ts, limit=200, cursor=cursor
+        )
+        reply_timestamps.extend(
+            message["ts"]
+            for message in response.get("messages", [])
+            if "ts" in message and message["ts"] != thread_ts
+        )
+        cursor = response.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            break
 
-    await send_heartbeat(
-        f"Added thread {thread_ts} in channel {channel_id} to delete queue."
+    # The parent message won't be claimed until all of the replies are deleted
+    await queue_messages(channel_id, reply_timestamps, thread_ts=thread_ts)
+    await queue_messages(channel_id, [thread_ts])
+    logging.info(
+        f"Queued thread for deletion thread_ts={thread_ts} channel={channel_id} messages={len(reply_timestamps) + 1}"
     )
@@ -5,10 +5,10 @@ from typing import Literal
 from aiohttp import ClientSession
 from dotenv import load_dotenv
 from openai import AsyncOpenAI
-from slack_sdk.web.async_client import AsyncWebClient
 
 from nephthys.transcripts import transcripts
 from nephthys.transcripts.transcript import Transcript
+from nephthys.utils.slack_rate_limit import RateLimitedWebClient
 
 load_dotenv(override=True)
 
@@ -65,6 +65,29 @@ class Environment:
 
         self.port = int(os.environ.get("PORT", 3000))
 
+        # Minimum confidence for the local category classifier's prediction to be
+        # used, rather than asking the AI
+        self.category_classifier_threshold = float(
+            os.environ.get("CATEGORY_CLASSIFIER_THRESHOLD", 0.8)
+        )
+
+        # Number of Slack message events handled at once, and how many can be
+        # waiting before new ones are dropped
+        self.event_workers = int(os.environ.get("EVENT_WORKERS", 8))
+        self.event_queue_size = int(os.environ.get("EVENT_QUEUE_SIZE", 1000))
+
+        # New questions per minute at which ticket creation switches to a
+        # degraded mode that skips AI enrichment until things calm down
+        self.degraded_mode_questions_per_minute = int(
+            os.environ.get("DEGRADED_MODE_QUESTIONS_PER_MINUTE", 30)
+        )
+
+        # Also record handled Slack event IDs in the database, so that retried
+        # events are ignored across restarts and multiple instances
+        self.event_dedupe_database = get_environ_bool(
+            "EVENT_DEDUPE_DATABASE", default=False
+        )
+
         self.slack_heartbeat_channel = os.environ.get("SLACK_HEARTBEAT_CHANNEL")
 
         # Stale ticket auto-close: number of days of inactivity before closing
@@ -111,7 +134,7 @@ class Environment:
             Transcript(),
         )
 
-        self.slack_client = AsyncWebClient(token=self.slack_bot_token)
+        self.slack_client = RateLimitedWebClient(token=self.slack_bot_token)
         self.ai_client = (
             AsyncOpenAI(
                 base_url="https://ai.hackclub.com/proxy/v1",
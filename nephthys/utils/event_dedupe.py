@@ -0,0 +1,90 @@
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from datetime import timedelta
+
+from prometheus_client import Counter
+
+from nephthys.database.tables import ProcessedEvent
+from nephthys.utils.env import env
+
+DUPLICATE_EVENTS = Counter(
+    "nephthys_duplicate_slack_events_total",
+    "Slack events that were ignored because they had already been handled, by whether Slack marked them as a retry",
+    ["retry"],
+)
+
+
+class EventDeduplicator:
+    """Remembers which Slack events have been handled, so that Slack's retries
+    (sent when we take more than 3 seconds to respond) don't get handled twice.
+
+    Event IDs are kept in memory (up to `max_size` of them, for `ttl_seconds`),
+    and also in the ProcessedEvent table if EVENT_DEDUPE_DATABASE is enabled.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # Event ID -> expiry time
+        self._seen: OrderedDict[str, float] = OrderedDict()
+
+    def _claim_in_memory(self, event_id: str) -> bool:
+        now = time.monotonic()
+        expiry = self._seen.get(event_id)
+        if expiry and expiry > now:
+            return False
+        self._seen[event_id] = now + self.ttl_seconds
+        self._seen.move_to_end(event_id)
+        while len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+        return True
+
+    async def _claim_in_database(self, event_id: str) -> bool:
+        try:
+            rows = await ProcessedEvent.raw(
+                """
+                INSERT INTO "ProcessedEvent" ("eventId") VALUES ({})
+                ON CONFLICT ("eventId") DO NOTHING
+                RETURNING "eventId"
+                """,
+                event_id,
+            )
+        except Exception as e:
+            # Better to risk handling an event twice than to not handle it at all
+            logging.warning(
+                f"Failed to record processed event event_id={event_id}: {e}"
+            )
+            return True
+        return bool(rows)
+
+    async def claim(self, event_id: str | None, retry_num: str | None = None) -> bool:
+        """Marks the event as being handled. Returns False if it already has
+        been, in which case it should be ignored.
+
+        Events are claimed before they're handled (rather than after), so that
+        a retry arriving while the original is still being handled is ignored.
+        """
+        if not event_id:
+            return True
+        claimed = self._claim_in_memory(event_id)
+        if claimed and env.event_dedupe_database:
+            claimed = await self._claim_in_database(event_id)
+        if not claimed:
+            DUPLICATE_EVENTS.labels(retry=str(retry_num is not None).lower()).inc()
+            logging.info(
+                f"Ignoring duplicate Slack event event_id={event_id} retry_num={retry_num}"
+            )
+        return claimed
+
+    async def prune(self):
+        """Deletes expired event IDs from the database"""
+        await ProcessedEvent.delete().where(
+            ProcessedEvent.created_at
+            <= datetime.now().astimezone() - timedelta(seconds=self.ttl_seconds)
+        )
+
+
+# Slack gives up retrying after about 5 minutes, but keep IDs for longer to be safe
+event_deduplicator = EventDeduplicator(max_size=10_000, ttl_seconds=60 * 60)
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import field
+
+from prometheus_client import Counter
+from prometheus_client import Gauge
+from prometheus_client import Histogram
+
+from nephthys.utils.env import env
+from nephthys.utils.logging import send_heartbeat
+
+DISPATCHER_EVENTS = Counter(
+    "nephthys_event_dispatcher_events_total",
+    "Slack events submitted to the event dispatcher, by whether they were queued, shed because the queue was full, or rejected because the bot is shutting down",
+    ["result"],
+)
+DISPATCHER_QUEUED = Gauge(
+    "nephthys_event_dispatcher_queued",
+    "Slack events waiting to be handled by the event dispatcher",
+)
+DISPATCHER_BUSY_WORKERS = Gauge(
+    "nephthys_event_dispatcher_busy_workers",
+    "Event dispatcher workers currently handling an event",
+)
+DISPATCHER_WAIT = Histogram(
+    "nephthys_event_dispatcher_wait_seconds",
+    "How long Slack events waited in the event dispatcher's queue before being handled",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60),
+)
+
+# How long to wait for queued events to be handled when shutting down
+DRAIN_TIMEOUT_SECONDS = 20
+
+
+@dataclass
+class Job:
+    handler: Callable[[], Awaitable[None]]
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+def thread_key(event: dict) -> str | None:
+    """The thread an event belongs to, so that events in the same thread can be
+    handled in order. Edits and deletions use the thread of the original message."""
+    message = event.get("message") or event.get("previous_message") or event
+    return (
+        message.get("thread_ts")
+        or event.get("deleted_ts")
+        or message.get("ts")
+        or event.get("ts")
+    )
+
+
+class EventDispatcher:
+    """Handles Slack events in the background with a fixed number of workers.
+
+    Events with the same key (the thread they're in) are handled one at a time,
+    in the order they arrived, while events in different threads are handled in
+    parallel. Once `max_queued` events are waiting, new sheddable ones are shed
+    (dropped and reported) rather than letting the backlog grow without limit.
+    Events that aren't sheddable (new questions, which nothing else would
+    create tickets for) are always queued, even past the limit.
+    """
+
+    def __init__(self, workers: int, max_queued: int):
+        self.workers = workers
+        self.max_queued = max_queued
+        # Key -> jobs waiting for that key, in order. A key is present for as
+        # long as it has jobs queued or one being handled.
+        self._jobs: dict[str, deque[Job]] = {}
+        # Keys with jobs that no worker has picked up yet
+        self._ready: asyncio.Queue[str] = asyncio.Queue()
+        self._queued = 0
+        self._shed_since_heartbeat = 0
+        self._accepting = True
+        # Set whenever there are no jobs queued or being handled
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def queued(self) -> int:
+        """Number of events waiting to be handled"""
+        return self._queued
+
+    def submit(
+        self, key: str, handler: Callable[[], Awaitable[None]], sheddable: bool = True
+    ) -> bool:
+        """Queues `handler` to be run after any earlier jobs with the same key.
+        Returns False if the event was shed because the queue is full, or
+        because the dispatcher is shutting down."""
+        if not self._accepting:
+            DISPATCHER_EVENTS.labels(result="rejected").inc()
+            logging.warning(
+                f"Event dispatcher is shutting down, dropping event key={key}"
+            )
+            return False
+        if sheddable and self._queued >= self.max_queued:
+            DISPATCHER_EVENTS.labels(result="shed").inc()
+            self._shed_since_heartbeat += 1
+            logging.warning(
+                f"Event dispatcher is full, shedding event key={key} queued={self._queued}"
+            )
+            return False
+
+        DISPATCHER_EVENTS.labels(result="queued").inc()
+        self._queued += 1
+        DISPATCHER_QUEUED.set(self._queued)
+        jobs = self._jobs.get(key)
+        if jobs is not None:
+            # A worker already has this key, and will get to this job after the others
+            jobs.append(Job(handler))
+            return True
+        self._jobs[key] = deque([Job(handler)])
+        self._idle.clear()
+        self._ready.put_nowait(key)
+        return True
+
+    async def _run_key(self, key: str):
+        jobs = self._jobs[key]
+        while jobs:
+            job = jobs.popleft()
+            self._queued -= 1
+            DISPATCHER_QUEUED.set(self._queued)
+            DISPATCHER_WAIT.observe(time.monotonic() - job.queued_at)
+            try:
+                await job.handler()
+            except Exception:
+                logging.exception(f"Error handling Slack event key={key}")
+        del self._jobs[key]
+        if not self._jobs:
+            self._idle.set()
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            DISPATCHER_BUSY_WORKERS.inc()
+            try:
+                await self._run_key(key)
+            finally:
+                DISPATCHER_BUSY_WORKERS.dec()
+
+    async def _report_shed_events(self):
+        while True:
+            await asyncio.sleep(60)
+            if self._shed_since_heartbeat:
+                await send_heartbeat(
+                    f":warning: Dropped {self._shed_since_heartbeat} Slack events in the last minute because the event queue was full"
+                )
+                self._shed_since_heartbeat = 0
+
+    async def drain(self, timeout_seconds: float = DRAIN_TIMEOUT_SECONDS):
+        """Stops accepting new events, and waits (up to the timeout) for the
+        queued ones to be handled. Call this before `run()` is cancelled."""
+        self._accepting = False
+        try:
+            async with asyncio.timeout(timeout_seconds):
+                await self._idle.wait()
+        except TimeoutError:
+            logging.warning(
+                f"Gave up waiting for Slack events to be handled queued={self._queued}"
+            )
+
+    async def run(self):
+        """Runs the workers until cancelled"""
+        await asyncio.gather(
+            self._report_shed_events(), *[self._worker() for _ in range(self.workers)]
+        )
+
+
+event_dispatcher = EventDispatcher(
+    workers=env.event_workers, max_queued=env.event_queue_size
+)
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+
+from nephthys.utils.env import env
+
+# Slack IDs of everyone in the BTS channel (i.e. the helper team). Filled by
+# `refresh_helper_team()` and kept up to date by the channel join/leave events.
+helper_team: set[str] = set()
+helper_team_loaded = False
+refresh_lock = asyncio.Lock()
+
+
+async def fetch_bts_channel_members() -> list[str]:
+    """Fetches every member of the BTS channel, across all pages of results"""
+    members = []
+    cursor = None
+    while True:
+        res = await env.slack_client.conversations_members(
+            channel=env.slack_bts_channel, cursor=cursor, limit=1000
+        )
+        members += res.get("members", [])
+        cursor = res.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            return members
+
+
+async def load_helper_team():
+    global helper_team, helper_team_loaded
+    helper_team = set(await fetch_bts_channel_members())
+    helper_team_loaded = True
+    logging.info(f"Loaded helper team members={len(helper_team)}")
+
+
+async def refresh_helper_team() -> set[str]:
+    """Reloads the helper team from Slack, returning the new set of members"""
+    async with refresh_lock:
+        await load_helper_team()
+    return helper_team
+
+
+async def is_helper_team_member(slack_id: str) -> bool:
+    if not helper_team_loaded:
+        async with refresh_lock:
+            # Another request may have loaded it while we were waiting
+            if not helper_team_loaded:
+                await load_helper_team()
+    return slack_id in helper_team
+
+
+def add_helper_team_member(slack_id: str):
+    helper_team.add(slack_id)
+
+
+def remove_helper_team_member(slack_id: str):
+    helper_team.discard(slack_id)
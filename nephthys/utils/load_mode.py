@@ -0,0 +1,115 @@
+import logging
+import time
+from collections import deque
+
+from prometheus_client import Gauge
+
+from nephthys.utils.env import env
+from nephthys.utils.event_dispatcher import event_dispatcher
+from nephthys.utils.logging import heartbeat_buffer
+
+DEGRADED_MODE = Gauge(
+    "nephthys_degraded_mode",
+    "Whether ticket creation is in degraded mode because of a flood of questions (1) or not (0)",
+)
+
+# Stay degraded for at least this long, so the mode doesn't flap
+MIN_DEGRADED_SECONDS = 120
+# While degraded, the uptime URL is pinged at most this often
+DEGRADED_UPTIME_PING_INTERVAL_SECONDS = 60
+
+
+class LoadMonitor:
+    """Decides whether ticket creation should be degraded, based on how many
+    questions have been asked in the last minute and how many Slack events are
+    waiting to be handled.
+
+    In degraded mode, new tickets don't get AI titles or category tags straight
+    away (see `nephthys.tasks.backfill_enrichment`), and uptime pings are
+    coalesced. The thresholds for leaving degraded mode are lower than the ones
+    for entering it, so that it doesn't flap.
+    """
+
+    def __init__(
+        self,
+        enter_questions_per_minute: int,
+        exit_questions_per_minute: int,
+        enter_queue_depth: int,
+        exit_queue_depth: int,
+    ):
+        self.enter_questions_per_minute = enter_questions_per_minute
+        self.exit_questions_per_minute = exit_questions_per_minute
+        self.enter_queue_depth = enter_queue_depth
+        self.exit_queue_depth = exit_queue_depth
+        self._question_times: deque[float] = deque()
+        self._degraded_since: float | None = None
+        self._last_uptime_ping = 0.0
+
+    def record_question(self):
+        self._question_times.append(time.monotonic())
+        self.update()
+
+    def questions_per_minute(self) -> int:
+        cutoff = time.monotonic() - 60
+        while self._question_times and self._question_times[0] < cutoff:
+            self._question_times.popleft()
+        return len(self._question_times)
+
+    def update(self) -> bool:
+        """Re-evaluates the mode, and returns whether it's degraded"""
+        rate = self.questions_per_minute()
+        depth = event_dispatcher.queued
+        now = time.monotonic()
+        if self._degraded_since is None:
+            if (
+                rate >= self.enter_questions_per_minute
+                or depth >= self.enter_queue_depth
+            ):
+                self._degraded_since = now
+                DEGRADED_MODE.set(1)
+                logging.warning(
+                    f"Entering degraded mode questions_per_minute={rate} queue_depth={depth}"
+                )
+                heartbeat_buffer.add(
+                    f":rotating_light: Lots of questions coming in ({rate} in the last minute), so new tickets won't get AI titles or category tags for now",
+                    [],
+                )
+        elif (
+            now - self._degraded_since >= MIN_DEGRADED_SECONDS
+            and rate < self.exit_questions_per_minute
+            and depth < self.exit_queue_depth
+        ):
+            self._degraded_since = None
+            DEGRADED_MODE.set(0)
+            logging.info(
+                f"Leaving degraded mode questions_per_minute={rate} queue_depth={depth}"
+            )
+            heartbeat_buffer.add(
+                ":white_check_mark: Things have calmed down, so new tickets are back to normal. Tickets from the busy period will get their AI titles and category tags shortly.",
+                [],
+            )
+        return self._degraded_since is not None
+
+    @property
+    def degraded(self) -> bool:
+        return self._degraded_since is not None
+
+    def should_ping_uptime(self) -> bool:
+        """Whether to ping the uptime URL for this question. Every question
+        pings it normally, but while degraded, pings are coalesced."""
+        now = time.monotonic()
+        if (
+            self.degraded
+            and now - self._last_uptime_ping < DEGRADED_UPTIME_PING_INTERVAL_SECONDS
+        ):
+            return False
+        self._last_uptime_ping = now
+        return True
+
+
+load_monitor = LoadMonitor(
+    enter_questions_per_minute=env.degraded_mode_questions_per_minute,
+    exit_questions_per_minute=env.degraded_mode_questions_per_minute // 2,
+    enter_queue_depth=env.event_queue_size // 10,
+    exit_queue_depth=env.event_queue_size // 50,
+)
@@ -1,5 +1,8 @@
+import asyncio
 import logging
 from base64 import b64encode
+from dataclasses import dataclass
+from dataclasses import field
 from os import environ
 from os import uname
 from uuid import uuid4
@@ -10,22 +13,124 @@ from opentelemetry.sdk._logs import LoggerProvider
 from opentelemetry.sdk._logs import LoggingHandler
 from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
 from opentelemetry.sdk.resources import Resource
+from prometheus_client import Counter
 
 from nephthys.utils.env import env
+from nephthys.utils.slack_rate_limit import background_priority
 
 
-async def send_heartbeat(heartbeat: str, messages: list[str] = []):
-    if env.slack_heartbeat_channel:
-        msg = await env.slack_client.chat_postMessage(
-            channel=env.slack_heartbeat_channel, text=heartbeat
-        )
-        if messages:
-            for message in messages:
+HEARTBEATS = Counter(
+    "nephthys_heartbeats_total",
+    "Heartbeats sent to the heartbeat buffer, by whether they were queued, merged into an identical pending heartbeat (coalesced), or dropped because the buffer was full",
+    ["result"],
+)
+
+# Slack truncates messages longer than this
+MAX_HEARTBEAT_MESSAGE_LENGTH = 3500
+
+
+@dataclass
+class PendingHeartbeat:
+    text: str
+    count: int = 1
+    messages: list[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return f"{self.text} (x{self.count})" if self.count > 1 else self.text
+
+
+def truncate(text: str) -> str:
+    if len(text) <= MAX_HEARTBEAT_MESSAGE_LENGTH:
+        return text
+    return text[: MAX_HEARTBEAT_MESSAGE_LENGTH - 20] + "\n...(truncated)"
+
+
+class HeartbeatBuffer:
+    """Collects heartbeats so that they can be posted to Slack in the background.
+
+    Identical heartbeats are merged (with a count), and everything collected
+    during a flush interval is posted as one message, with any extra details
+    in a thread reply. Once `max_pending` different heartbeats are waiting,
+    new ones are dropped and counted instead.
+    """
+
+    def __init__(self, max_pending: int, flush_interval_seconds: float):
+        self.max_pending = max_pending
+        self.flush_interval_seconds = flush_interval_seconds
+        self._pending: dict[str, PendingHeartbeat] = {}
+        self._dropped = 0
+        self._added = asyncio.Event()
+
+    def add(self, heartbeat: str, messages: list[str]):
+        pending = self._pending.get(heartbeat)
+        if pending:
+            pending.count += 1
+            HEARTBEATS.labels(result="coalesced").inc()
+        elif len(self._pending) >= self.max_pending:
+            self._dropped += 1
+            HEARTBEATS.labels(result="dropped").inc()
+            return
+        else:
+            pending = self._pending[heartbeat] = PendingHeartbeat(heartbeat)
+            HEARTBEATS.labels(result="queued").inc()
+        # Repeats usually have the same details, so only keep new ones
+        pending.messages.extend(m for m in messages if m not in pending.messages)
+        self._added.set()
+
+    async def flush(self):
+        """Posts everything that's pending"""
+        pending = list(self._pending.values())
+        dropped = self._dropped
+        self._pending = {}
+        self._dropped = 0
+        self._added.clear()
+        if not pending or not env.slack_heartbeat_channel:
+            return
+
+        lines = [heartbeat.summary() for heartbeat in pending]
+        if dropped:
+            lines.append(f"({dropped} more heartbeats were dropped)")
+        if len(pending) == 1:
+            details = pending[0].messages
+        else:
+            details = [
+                f"*{heartbeat.text}*\n" + "\n".join(heartbeat.messages)
+                for heartbeat in pending
+                if heartbeat.messages
+            ]
+        try:
+            msg = await env.slack_client.chat_postMessage(
+                channel=env.slack_heartbeat_channel, text=truncate("\n".join(lines))
+            )
+            if details:
                 await env.slack_client.chat_postMessage(
                     channel=env.slack_heartbeat_channel,
-                    text=message,
+                    text=truncate("\n\n".join(details)),
                     thread_ts=msg["ts"],
                 )
+        except Exception as e:
+            logging.warning(f"Failed to send heartbeats count={len(pending)}: {e}")
+
+    @background_priority
+    async def run(self):
+        """Flushes the buffer at most once per interval until cancelled, then
+        flushes whatever is left"""
+        try:
+            while True:
+                await self._added.wait()
+                await self.flush()
+                await asyncio.sleep(self.flush_interval_seconds)
+        finally:
+            await self.flush()
+
+
+heartbeat_buffer = HeartbeatBuffer(max_pending=100, flush_interval_seconds=10)
+
+
+async def send_heartbeat(heartbeat: str, messages: list[str] = []):
+    """Queues a heartbeat to be posted by `heartbeat_buffer`. This returns
+    straight away, without waiting for anything to be sent to Slack."""
+    heartbeat_buffer.add(heartbeat, messages)
 
 
 def parse_level_name(level_name: str | int) -> int:
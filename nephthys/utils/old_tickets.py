@@ -5,7 +5,9 @@ from nephthys.database.enums import UserType
 from nephthys.database.tables import Ticket
 
 
-async def get_unanswered_tickets(since: datetime | None = None) -> list[Ticket]:
+async def get_unanswered_tickets(
+    since: datetime | None = None, limit: int | None = None
+) -> list[Ticket]:
     """
     Finds tickets that have been awaiting a response from a helper for a while.
 
@@ -23,5 +25,7 @@ async def get_unanswered_tickets(since: datetime | None = None) -> list[Ticket]:
 
     if since:
         query = query.where(Ticket.last_msg_at < since)
+    if limit:
+        query = query.limit(limit)
 
     return await query
@@ -0,0 +1,331 @@
+import asyncio
+import logging
+import sys
+from datetime import datetime
+
+from prometheus_client import Counter
+from prometheus_client import Gauge
+
+from nephthys.database.enums import TicketStatus
+from nephthys.database.enums import UserType
+from nephthys.database.tables import Ticket
+from nephthys.database.tables import User
+from nephthys.utils.stats_rollup import foreign_key_id
+from nephthys.utils.stats_rollup import TicketRollupState
+
+OPEN_TICKET_INDEX_LOOKUPS = Counter(
+    "nephthys_open_ticket_index_lookups_total",
+    "Lookups in the in-memory open ticket index, by whether the ticket was found",
+    ["result"],
+)
+OPEN_TICKET_INDEX_SIZE = Gauge(
+    "nephthys_open_ticket_index_size",
+    "Number of tickets in the in-memory open ticket index",
+)
+OPEN_TICKET_INDEX_BYTES = Gauge(
+    "nephthys_open_ticket_index_bytes",
+    "Approximate memory used by the in-memory open ticket index (as of the last full load)",
+)
+
+OPEN_TICKET_COLUMNS = (
+    Ticket.id,
+    Ticket.title,
+    Ticket.msg_ts,
+    Ticket.ticket_ts,
+    Ticket.status,
+    Ticket.opened_by,
+    Ticket.opened_by.slack_id,
+    Ticket.assigned_to,
+    Ticket.assigned_to.slack_id,
+    Ticket.category_tag,
+    Ticket.created_at,
+    Ticket.assigned_at,
+    Ticket.closed_at,
+    Ticket.closed_by,
+    Ticket.last_msg_at,
+    Ticket.last_msg_by,
+)
+
+
+class OpenTicket:
+    """The parts of a non-closed ticket needed to handle thread replies and
+    scan for stale tickets without going to the database"""
+
+    __slots__ = (
+        "id",
+        "title",
+        "msg_ts",
+        "ticket_ts",
+        "status",
+        "opened_by_id",
+        "opened_by_slack_id",
+        "assigned_to_id",
+        "assigned_to_slack_id",
+        "category_tag_id",
+        "created_at",
+        "assigned_at",
+        "closed_at",
+        "closed_by_id",
+        "last_msg_at",
+        "last_msg_by",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        title: str,
+        msg_ts: str,
+        ticket_ts: str,
+        status: TicketStatus,
+        opened_by_id: int,
+        opened_by_slack_id: str | None,
+        assigned_to_id: int | None,
+        assigned_to_slack_id: str | None,
+        category_tag_id: int | None,
+        created_at: datetime,
+        assigned_at: datetime | None,
+        closed_at: datetime | None,
+        closed_by_id: int | None,
+        last_msg_at: datetime | None,
+        last_msg_by: UserType,
+    ):
+        self.id = id
+        self.title = title
+        self.msg_ts = msg_ts
+        self.ticket_ts = ticket_ts
+        self.status = status
+        self.opened_by_id = opened_by_id
+        self.opened_by_slack_id = opened_by_slack_id
+        self.assigned_to_id = assigned_to_id
+        self.assigned_to_slack_id = assigned_to_slack_id
+        self.category_tag_id = category_tag_id
+        self.created_at = created_at
+        self.assigned_at = assigned_at
+        self.closed_at = closed_at
+        self.closed_by_id = closed_by_id
+        self.last_msg_at = last_msg_at
+        self.last_msg_by = last_msg_by
+
+    @classmethod
+    def from_row(cls, row: dict) -> "OpenTicket":
+        """Makes an entry from a row selected with `OPEN_TICKET_COLUMNS`"""
+        return cls(
+            id=row["id"],
+            title=row["title"],
+            msg_ts=row["msg_ts"],
+            ticket_ts=row["ticket_ts"],
+            status=TicketStatus(row["status"]),
+            opened_by_id=row["opened_by"],
+            opened_by_slack_id=row["opened_by.slack_id"],
+            assigned_to_id=row["assigned_to"],
+            assigned_to_slack_id=row["assigned_to.slack_id"],
+            category_tag_id=row["category_tag"],
+            created_at=row["created_at"],
+            assigned_at=row["assigned_at"],
+            closed_at=row["closed_at"],
+            closed_by_id=row["closed_by"],
+            last_msg_at=row["last_msg_at"],
+            last_msg_by=UserType(row["last_msg_by"]),
+        )
+
+    @classmethod
+    def from_ticket(
+        cls,
+        ticket: Ticket,
+        opened_by_slack_id: str | None,
+        assigned_to_slack_id: str | None = None,
+    ) -> "OpenTicket":
+        return cls(
+            id=ticket.id,
+            title=ticket.title,
+            msg_ts=ticket.msg_ts,
+            ticket_ts=ticket.ticket_ts,
+            status=TicketStatus(ticket.status),
+            opened_by_id=foreign_key_id(ticket.opened_by),  # type: ignore (tickets always have an author)
+            opened_by_slack_id=opened_by_slack_id,
+            assigned_to_id=foreign_key_id(ticket.assigned_to),
+            assigned_to_slack_id=assigned_to_slack_id,
+            category_tag_id=foreign_key_id(ticket.category_tag),
+            created_at=ticket.created_at,
+            assigned_at=ticket.assigned_at,
+            closed_at=ticket.closed_at,
+            closed_by_id=foreign_key_id(ticket.closed_by),
+            last_msg_at=ticket.last_msg_at,
+            last_msg_by=UserType(ticket.last_msg_by),
+        )
+
+    def to_ticket(self) -> Ticket:
+        """Makes a Ticket (with `opened_by` prefetched) from the entry, without
+        going to the database. It doesn't have the ticket's description or
+        reopening details, which aren't kept in the index."""
+        return Ticket(
+            {
+                Ticket.id: self.id,
+                Ticket.title: self.title,
+                Ticket.msg_ts: self.msg_ts,
+                Ticket.ticket_ts: self.ticket_ts,
+                Ticket.status: self.status,
+                Ticket.opened_by: User(
+                    {
+                        User.id: self.opened_by_id,
+                        User.slack_id: self.opened_by_slack_id,
+                    },
+                    _exists_in_db=True,
+                ),
+                Ticket.assigned_to: self.assigned_to_id,
+                Ticket.category_tag: self.category_tag_id,
+                Ticket.created_at: self.created_at,
+                Ticket.assigned_at: self.assigned_at,
+                Ticket.closed_at: self.closed_at,
+                Ticket.closed_by: self.closed_by_id,
+                Ticket.last_msg_at: self.last_msg_at,
+                Ticket.last_msg_by: self.last_msg_by,
+            },
+            _exists_in_db=True,
+        )
+
+    def rollup_state(self) -> TicketRollupState:
+        return TicketRollupState(
+            created_at=self.created_at,
+            status=self.status,
+            category_tag_id=self.category_tag_id,
+            assigned_at=self.assigned_at,
+            closed_at=self.closed_at,
+            closed_by_id=self.closed_by_id,
+        )
+
+    def approximate_size(self) -> int:
+        return sys.getsizeof(self) + sum(
+            sys.getsizeof(getattr(self, slot)) for slot in self.__slots__
+        )
+
+
+class OpenTicketIndex:
+    """All non-closed tickets, kept in memory and keyed by `msg_ts` (the
+    question's ts) and `ticket_ts` (the backend message's ts).
+
+    Code that changes a ticket's status, assignment or category tag must keep
+    this up to date, either by updating the entry directly or with `refresh()`.
+    It's also fully reloaded every few minutes, to pick up any changes made
+    elsewhere (e.g. by another instance or a script).
+    """
+
+    def __init__(self):
+        self._by_msg_ts: dict[str, OpenTicket] = {}
+        self._by_ticket_ts: dict[str, OpenTicket] = {}
+        self.loaded = False
+        self._lock = asyncio.Lock()
+        # Changes made while a load is in progress (msg_ts -> entry, or None if
+        # removed), which are applied on top of the loaded tickets
+        self._changes_during_load: dict[str, OpenTicket | None] | None = None
+
+    async def load(self):
+        async with self._lock:
+            self._changes_during_load = {}
+            try:
+                rows = await Ticket.select(*OPEN_TICKET_COLUMNS).where(
+                    Ticket.status != TicketStatus.CLOSED
+                )
+                changes = self._changes_during_load
+            finally:
+                self._changes_during_load = None
+            by_msg_ts = {row["msg_ts"]: OpenTicket.from_row(row) for row in rows}
+            for msg_ts, changed_entry in changes.items():
+                if changed_entry:
+                    by_msg_ts[msg_ts] = changed_entry
+                else:
+                    by_msg_ts.pop(msg_ts, None)
+            entries = list(by_msg_ts.values())
+            self._by_msg_ts = by_msg_ts
+            self._by_ticket_ts = {entry.ticket_ts: entry for entry in entries}
+            self.loaded = True
+        OPEN_TICKET_INDEX_SIZE.set(len(entries))
+        OPEN_TICKET_INDEX_BYTES.set(
+            sys.getsizeof(self._by_msg_ts)
+            + sys.getsizeof(self._by_ticket_ts)
+            + sum(entry.approximate_size() for entry in entries)
+        )
+        logging.info(f"Loaded open ticket index tickets={len(entries)}")
+
+    def _lookup(self, index: dict[str, OpenTicket], ts: str) -> OpenTicket | None:
+        entry = index.get(ts) if self.loaded else None
+        OPEN_TICKET_INDEX_LOOKUPS.labels(result="hit" if entry else "miss").inc()
+        return entry
+
+    def get_by_msg_ts(self, msg_ts: str) -> OpenTicket | None:
+        """Gets a non-closed ticket by the ts of its question message. Returns
+        None for closed tickets, so callers should fall back to the database
+        if they need those too."""
+        return self._lookup(self._by_msg_ts, msg_ts)
+
+    def get_by_ticket_ts(self, ticket_ts: str) -> OpenTicket | None:
+        """Gets a non-closed ticket by the ts of its backend message"""
+        return self._lookup(self._by_ticket_ts, ticket_ts)
+
+    def put(self, entry: OpenTicket):
+        """Adds or replaces a ticket, or removes it if it's closed"""
+        self.remove(entry.msg_ts)
+        if entry.status == TicketStatus.CLOSED:
+            return
+        self._by_msg_ts[entry.msg_ts] = entry
+        self._by_ticket_ts[entry.ticket_ts] = entry
+        if self._changes_during_load is not None:
+            self._changes_during_load[entry.msg_ts] = entry
+        OPEN_TICKET_INDEX_SIZE.set(len(self._by_msg_ts))
+
+    def remove(self, msg_ts: str):
+        entry = self._by_msg_ts.pop(msg_ts, None)
+        if entry:
+            self._by_ticket_ts.pop(entry.ticket_ts, None)
+        if self._changes_during_load is not None:
+            self._changes_during_load[msg_ts] = None
+        OPEN_TICKET_INDEX_SIZE.set(len(self._by_msg_ts))
+
+    async def refresh(self, ticket_id: int):
+        """Re-reads a ticket from the database after it has been changed"""
+        row = (
+            await Ticket.select(*OPEN_TICKET_COLUMNS)
+            .where(Ticket.id == ticket_id)
+            .first()
+        )
+        if row:
+            self.put(OpenTicket.from_row(row))
+        else:
+            for entry in list(self._by_msg_ts.values()):
+                if entry.id == ticket_id:
+                    self.remove(entry.msg_ts)
+
+    def assigned_to(self, user_id: int) -> list[OpenTicket]:
+        """Non-closed tickets assigned to the user"""
+        return [
+            entry
+            for entry in self._by_msg_ts.values()
+            if entry.assigned_to_id == user_id
+        ]
+
+    def unanswered(self) -> list[OpenTicket]:
+        """Open tickets awaiting a response from a helper, most stale first
+        (the same as `get_unanswered_tickets()`)"""
+        return sorted(
+            (
+                entry
+                for entry in self._by_msg_ts.values()
+                if entry.status == TicketStatus.OPEN
+                and entry.last_msg_by != UserType.HELPER
+                and entry.last_msg_at
+            ),
+            key=lambda entry: entry.last_msg_at,  # type: ignore (filtered above)
+        )
+
+    async def stale_candidates(self, cutoff: datetime) -> list[OpenTicket]:
+        """Tickets whose last recorded message was before the cutoff"""
+        if not self.loaded:
+            await self.load()
+        return [
+            entry
+            for entry in self._by_msg_ts.values()
+            if entry.last_msg_at and entry.last_msg_at < cutoff
+        ]
+
+
+open_ticket_index = OpenTicketIndex()
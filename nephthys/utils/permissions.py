@@ -1,27 +0,0 @@
-from nephthys.database.tables import Ticket
-from nephthys.utils.env import env
-
-
-async def can_resolve(slack_id: str, user_id: int, ts: str) -> bool:
-    """
-    Check if the user has permission to resolve tickets.
-
-    Args:
-        user_id (str): The Slack ID of the user to check permissions for.
-        ts (str): The timestamp of the ticket message to check.
-
-    Returns:
-        bool: True if the user can resolve tickets, False otherwise.
-    """
-    res = await env.slack_client.conversations_members(channel=env.slack_bts_channel)
-    team = res.get("members", [])
-
-    if slack_id in team:
-        return True
-
-    tkt = await Ticket.objects().where(Ticket.msg_ts == ts).first()
-
-    if not tkt or tkt.opened_by != user_id:
-        return False
-
-    return True
@@ -11,6 +11,7 @@ from blockkit import Section
 from blockkit import StaticSelect
 from slack_bolt.async_app import AsyncApp
 from slack_bolt.context.ack.async_ack import AsyncAck
+from slack_bolt.request.async_request import AsyncBoltRequest
 from slack_sdk.web.async_client import AsyncWebClient
 
 from nephthys.actions.assign_category_tag import assign_category_tag_callback
@@ -25,39 +26,80 @@ from nephthys.actions.tag_subscribe import tag_subscribe_callback
 from nephthys.database.enums import FeedbackRating
 from nephthys.database.tables import Feedback
 from nephthys.database.tables import Ticket
-from nephthys.database.tables import User
 from nephthys.errors.errors import PermissionDenied
 from nephthys.errors.errors import TicketNotClosedError
 from nephthys.events.app_home_opened import on_app_home_opened
 from nephthys.events.app_home_opened import open_app_home
 from nephthys.events.channel_join import channel_join
 from nephthys.events.channel_left import channel_left
+from nephthys.events.message_creation import ALLOWED_SUBTYPES
 from nephthys.events.message_creation import on_message
 from nephthys.events.message_deletion import on_message_deletion
+from nephthys.events.user_change import on_user_change
 from nephthys.options.category_tags import get_category_tags
 from nephthys.options.team_tags import get_team_tags
 from nephthys.utils.env import env
+from nephthys.utils.event_dedupe import event_deduplicator
+from nephthys.utils.event_dispatcher import event_dispatcher
+from nephthys.utils.event_dispatcher import thread_key
 from nephthys.utils.performance import perf_timer
+from nephthys.utils.user_cache import user_cache
 from nephthys.views.home import AppHomeView
 
-app = AsyncApp(token=env.slack_bot_token, signing_secret=env.slack_signing_secret)
+app = AsyncApp(client=env.slack_client, signing_secret=env.slack_signing_secret)
+
+
+@app.middleware
+async def use_rate_limited_client(context, next):
+    # Bolt gives each request its own client, which would skip the shared rate
+    # limiter, so hand listeners the rate-limited one instead
+    context["client"] = env.slack_client
+    await next()
 
 
 @app.event("message")
-async def handle_message(event: Dict[str, Any], client: AsyncWebClient):
+async def handle_message(
+    event: Dict[str, Any],
+    body: Dict[str, Any],
+    request: AsyncBoltRequest,
+    client: AsyncWebClient,
+):
     logging.debug(f"Message event: {event}")
+    if event["channel"] != env.slack_help_channel:
+        return
+
+    # Slack retries events we're slow to respond to, so skip ones we've already seen
+    event_id = body.get("event_id")
+    retry_num = next(iter(request.headers.get("x-slack-retry-num", [])), None)
+    if not await event_deduplicator.claim(event_id, retry_num):
+        return
+
     is_message_deletion = (
         event.get("subtype") == "message_changed"
         and event["message"].get("subtype") == "tombstone"
     ) or event.get("subtype") == "message_deleted"
 
-    if event["channel"] == env.slack_help_channel:
+    async def handle():
         async with perf_timer("Processing message event (total time)"):
             if is_message_deletion:
                 await on_message_deletion(event, client)
             else:
                 await on_message(event, client)
 
+    # New questions are never shed when busy, as nothing else would create
+    # their tickets. Replies, edits and deletions are shed first.
+    is_new_question = (
+        not event.get("thread_ts")
+        and not is_message_deletion
+        and event.get("subtype") in (None, *ALLOWED_SUBTYPES)
+    )
+
+    # Handled in the background, in order with other events in the same thread.
+    # The event has already been acknowledged, so Slack won't retry it if this
+    # fails or it's shed.
+    key = thread_key(event) or event_id or ""
+    event_dispatcher.submit(key, handle, sheddable=not is_new_question)
+
 
 @app.action("mark_resolved")
 async def handle_mark_resolved_button(
@@ -126,6 +168,12 @@ async def handle_member_left_channel(event: Dict[str, Any], client: AsyncWebClie
     await channel_left(ack=AsyncAck(), event=event, client=client)
 
 
+@app.event("user_change")
+@app.event("team_join")
+async def handle_user_change(event: Dict[str, Any]):
+    await on_user_change(event)
+
+
 @app.action("create-team-tag")
 async def create_team_tag(ack: AsyncAck, body: Dict[str, Any], client: AsyncWebClient):
     await create_team_tag_btn_callback(ack, body, client)
@@ -178,7 +226,7 @@ async def reopen_ticket(ack: AsyncAck, body: Dict[str, Any], client: AsyncWebCli
     slack_id = body["user"]["id"]
     if not (ticket := await Ticket.objects().get(Ticket.id == ticket_id)):
         raise ValueError(f"Failed to find ticket ticket_id={ticket_id}")
-    if not (reopened_by := await User.objects().get(User.slack_id == slack_id)):
+    if not (reopened_by := await user_cache.get(slack_id)):
         logging.warning(
             f"User slack_id={slack_id} not in database tried to reopen ticket_id={ticket_id}"
         )
@@ -207,7 +255,7 @@ async def feedback_button(ack: AsyncAck, body: Dict[str, Any], client: AsyncWebC
     ticket_id = int(body["actions"][0]["value"])
     if not (ticket := await Ticket.objects().get(Ticket.id == ticket_id)):
         raise ValueError(f"Failed to find ticket ticket_id={ticket_id}")
-    user = await User.objects().get(User.slack_id == slack_id)
+    user = await user_cache.get(slack_id)
     if not user or ticket.opened_by != user.id:
         await client.chat_postEphemeral(
             channel=env.slack_help_channel,
@@ -273,7 +321,7 @@ async def submit_feedback(ack: AsyncAck, body: Dict[str, Any], client: AsyncWebC
 
     if not (ticket := await Ticket.objects().get(Ticket.id == ticket_id)):
         raise ValueError(f"Failed to find ticket ticket_id={ticket_id}")
-    if not (submitted_by := await User.objects().get(User.slack_id == slack_id)):
+    if not (submitted_by := await user_cache.get(slack_id)):
         raise ValueError(f"Failed to find user with slack_id={slack_id}")
     rating = FeedbackRating(rating_value)
 
@@ -0,0 +1,207 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from collections.abc import Callable
+from collections.abc import Coroutine
+from enum import Enum
+from typing import Any
+from typing import ParamSpec
+from typing import TypeVar
+
+from prometheus_client import Counter
+from prometheus_client import Histogram
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+from slack_sdk.web.async_slack_response import AsyncSlackResponse
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+SLACK_RATE_LIMIT_WAIT = Histogram(
+    "nephthys_slack_rate_limit_wait_seconds",
+    "How long Slack API calls waited for the rate limiter before being made",
+    ["priority"],
+    buckets=(0, 0.01, 0.1, 0.5, 1, 2, 5, 10, 30, 60),
+)
+SLACK_RATE_LIMITED = Counter(
+    "nephthys_slack_rate_limited_total",
+    "Slack API calls that Slack rejected for being rate limited",
+    ["method"],
+)
+
+
+class SlackPriority(Enum):
+    # Things a user is waiting for (e.g. creating or resolving a ticket)
+    INTERACTIVE = "interactive"
+    # Scheduled jobs and queues (e.g. stale ticket closing, message deletion)
+    BACKGROUND = "background"
+
+
+slack_priority: contextvars.ContextVar[SlackPriority] = contextvars.ContextVar(
+    "slack_priority", default=SlackPriority.INTERACTIVE
+)
+
+
+def background_priority(
+    function: Callable[P, Coroutine[Any, Any, R]],
+) -> Callable[P, Coroutine[Any, Any, R]]:
+    """Makes Slack API calls made by the decorated function (and anything it
+    calls) give way to interactive ones"""
+
+    @functools.wraps(function)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        token = slack_priority.set(SlackPriority.BACKGROUND)
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            slack_priority.reset(token)
+
+    return wrapper
+
+
+# Calls per minute allowed for each tier of Slack API method
+# https://docs.slack.dev/apis/web-api/rate-limits
+TIER_LIMITS = {1: 1, 2: 20, 3: 50, 4: 100}
+
+# Tiers of the methods we use (anything not listed is treated as tier 3)
+METHOD_TIERS = {
+    "auth.test": 4,
+    "chat.delete": 3,
+    # Officially "special", with a workspace-wide limit well above tier 4
+    "chat.postMessage": 4,
+    "chat.postEphemeral": 4,
+    "chat.update": 3,
+    "conversations.history": 3,
+    "conversations.info": 3,
+    "conversations.kick": 3,
+    "conversations.members": 4,
+    "conversations.replies": 3,
+    "reactions.add": 3,
+    "reactions.remove": 2,
+    "usergroups.list": 2,
+    "usergroups.users.list": 4,
+    "usergroups.users.update": 2,
+    "users.info": 4,
+    "users.list": 2,
+    "views.open": 4,
+    "views.publish": 4,
+    "views.update": 4,
+}
+
+# chat.postMessage is limited to about one message per second per channel,
+# with short bursts allowed
+POST_MESSAGE_RATE = 1
+POST_MESSAGE_BURST = 3
+
+# Fraction of each bucket that background calls leave for interactive ones
+BACKGROUND_RESERVE = 0.3
+
+MAX_RATE_LIMITED_RETRIES = 3
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        # Set when Slack tells us to back off
+        self.blocked_until = 0.0
+
+    def time_until_available(self, reserve: float) -> float:
+        """Seconds until a token can be taken while leaving `reserve` (a fraction
+        of the capacity) in the bucket"""
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second
+        )
+        self.updated_at = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        needed = 1 + reserve * self.capacity
+        if self.tokens >= needed:
+            return 0
+        return (needed - self.tokens) / self.rate_per_second
+
+
+class SlackRateLimiter:
+    """Paces Slack API calls to stay within Slack's rate limits.
+
+    Each method gets a token bucket sized to its tier, and chat.postMessage
+    also gets one per channel. Background calls leave part of each bucket
+    for interactive calls, so they can't starve them.
+    """
+
+    def __init__(self):
+        self._method_buckets: dict[str, TokenBucket] = {}
+        self._channel_buckets: dict[str, TokenBucket] = {}
+
+    def _buckets(self, method: str, channel: str | None) -> list[TokenBucket]:
+        bucket = self._method_buckets.get(method)
+        if not bucket:
+            per_minute = TIER_LIMITS[METHOD_TIERS.get(method, 3)]
+            bucket = self._method_buckets[method] = TokenBucket(
+                per_minute / 60, per_minute
+            )
+        buckets = [bucket]
+        if method == "chat.postMessage" and channel:
+            channel_bucket = self._channel_buckets.get(channel)
+            if not channel_bucket:
+                channel_bucket = self._channel_buckets[channel] = TokenBucket(
+                    POST_MESSAGE_RATE, POST_MESSAGE_BURST
+                )
+            buckets.append(channel_bucket)
+        return buckets
+
+    async def acquire(self, method: str, channel: str | None = None):
+        priority = slack_priority.get()
+        reserve = BACKGROUND_RESERVE if priority == SlackPriority.BACKGROUND else 0
+        buckets = self._buckets(method, channel)
+        start = time.monotonic()
+        while True:
+            wait = max(bucket.time_until_available(reserve) for bucket in buckets)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        for bucket in buckets:
+            bucket.tokens -= 1
+        SLACK_RATE_LIMIT_WAIT.labels(priority=priority.value).observe(
+            time.monotonic() - start
+        )
+
+    def on_rate_limited(self, method: str, retry_after: float):
+        """Stops calls to the method until Slack's Retry-After has passed"""
+        bucket = self._buckets(method, None)[0]
+        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + retry_after)
+        bucket.tokens = 0
+
+
+slack_rate_limiter = SlackRateLimiter()
+
+
+class RateLimitedWebClient(AsyncWebClient):
+    """An AsyncWebClient that goes through the shared Slack rate limiter, and
+    retries calls that Slack rate limits after waiting for Retry-After"""
+
+    async def api_call(self, api_method: str, **kwargs: Any) -> AsyncSlackResponse:
+        body = kwargs.get("json") or kwargs.get("data") or kwargs.get("params") or {}
+        channel = body.get("channel") if isinstance(body, dict) else None
+        for attempt in range(MAX_RATE_LIMITED_RETRIES + 1):
+            await slack_rate_limiter.acquire(api_method, channel)
+            try:
+                return await super().api_call(api_method, **kwargs)
+            except SlackApiError as e:
+                if (
+                    e.response.get("error") != "ratelimited"
+                    or attempt == MAX_RATE_LIMITED_RETRIES
+                ):
+                    raise
+                SLACK_RATE_LIMITED.labels(method=api_method).inc()
+                retry_after = int(e.response.headers.get("Retry-After", 1))
+                logging.warning(
+                    f"Slack rate limited method={api_method} retry_after={retry_after}"
+                )
+                slack_rate_limiter.on_rate_limited(api_method, retry_after)
+        raise AssertionError("unreachable")
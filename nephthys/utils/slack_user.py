@@ -1,10 +1,23 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any
+
+from prometheus_client import Counter
+from slack_sdk.errors import SlackApiError
 from slack_sdk.web.async_slack_response import AsyncSlackResponse
 
 from nephthys.utils.env import env
 
+PROFILE_CACHE_REQUESTS = Counter(
+    "nephthys_slack_profile_cache_requests_total",
+    "Slack user profile lookups, by whether they were served from the cache (hit), waited for an in-progress users.info call (coalesced), or called users.info (miss)",
+    ["result"],
+)
+
 
 class UserProfileWrapper:
-    def __init__(self, users_info_response: AsyncSlackResponse):
+    def __init__(self, users_info_response: AsyncSlackResponse | dict[str, Any]):
         user_data = users_info_response.get("user")
         if not user_data:
             raise ValueError(f"Slack user not found: {users_info_response}")
@@ -30,8 +43,96 @@ class UserProfileWrapper:
     def profile_pic_512x(self) -> str | None:
         return self.raw_data["profile"].get("image_512")
 
+    def timezone(self) -> str | None:
+        """The user's timezone name (e.g. Europe/London)"""
+        return self.raw_data.get("tz")
+
+
+class UserProfileCache:
+    """An LRU cache of Slack user profiles, keyed by Slack ID.
+
+    Profiles are kept for `ttl_seconds`, and kept up to date in the meantime by
+    `user_change` events. Users that Slack couldn't find are remembered for
+    `negative_ttl_seconds`, so that we don't keep asking about them.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, negative_ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        # Slack ID -> (expiry time, profile or None if the user wasn't found)
+        self._entries: OrderedDict[str, tuple[float, UserProfileWrapper | None]] = (
+            OrderedDict()
+        )
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    async def get(self, slack_id: str) -> UserProfileWrapper:
+        entry = self._entries.get(slack_id)
+        if entry and entry[0] > time.monotonic():
+            PROFILE_CACHE_REQUESTS.labels(result="hit").inc()
+            self._entries.move_to_end(slack_id)
+            profile = entry[1]
+        else:
+            task = self._in_flight.get(slack_id)
+            if task:
+                PROFILE_CACHE_REQUESTS.labels(result="coalesced").inc()
+            else:
+                PROFILE_CACHE_REQUESTS.labels(result="miss").inc()
+                task = asyncio.create_task(self._fetch(slack_id))
+                self._in_flight[slack_id] = task
+            profile = await asyncio.shield(task)
+
+        if not profile:
+            raise ValueError(f"Slack user not found: {slack_id}")
+        return profile
+
+    async def _fetch(self, slack_id: str) -> UserProfileWrapper | None:
+        try:
+            try:
+                response = await env.slack_client.users_info(user=slack_id)
+                profile = UserProfileWrapper(response)
+            except SlackApiError as e:
+                if e.response.get("error") != "user_not_found":
+                    raise
+                profile = None
+            # If a user_change event arrived while we were waiting, it has newer data
+            if self._in_flight.get(slack_id) is asyncio.current_task():
+                self._store(slack_id, profile)
+            return profile
+        finally:
+            if self._in_flight.get(slack_id) is asyncio.current_task():
+                del self._in_flight[slack_id]
+
+    def _store(self, slack_id: str, profile: UserProfileWrapper | None):
+        ttl = self.ttl_seconds if profile else self.negative_ttl_seconds
+        self._entries[slack_id] = (time.monotonic() + ttl, profile)
+        self._entries.move_to_end(slack_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def update(self, user_data: dict[str, Any]):
+        """Refreshes a cached profile with a user object from Slack, e.g. from a
+        `user_change` event. Users that aren't cached are ignored, as these
+        events are sent for everyone in the workspace."""
+        if (
+            user_data["id"] not in self._entries
+            and user_data["id"] not in self._in_flight
+        ):
+            return
+        profile = UserProfileWrapper({"user": user_data})
+        # Stops anything currently being fetched from overwriting this with older data
+        self._in_flight.pop(user_data["id"], None)
+        self._store(user_data["id"], profile)
+
+
+user_profile_cache = UserProfileCache(
+    max_size=20_000, ttl_seconds=60 * 60, negative_ttl_seconds=5 * 60
+)
+
 
 async def get_user_profile(slack_id: str) -> UserProfileWrapper:
-    """Retrieve the user's display name from Slack given their Slack ID."""
-    response = await env.slack_client.users_info(user=slack_id)
-    return UserProfileWrapper(response)
+    """Retrieve the user's profile from Slack given their Slack ID.
+
+    Profiles are cached, so this usually doesn't call the Slack API.
+    """
+    return await user_profile_cache.get(slack_id)
@@ -1,12 +1,20 @@
+from collections import Counter
 from dataclasses import dataclass
+from dataclasses import field
+from dataclasses import fields
 from datetime import datetime
-from statistics import fmean
+from datetime import timedelta
+from datetime import UTC
+from typing import Iterable
 from typing import TypedDict
 
 from nephthys.database.enums import TicketStatus
 from nephthys.database.tables import Ticket
+from nephthys.database.tables import TicketDailyRollup
 from nephthys.database.tables import User
 from nephthys.utils.old_tickets import get_unanswered_tickets
+from nephthys.utils.open_tickets import open_ticket_index
+from nephthys.utils.stats_cache import stats_cache
 from nephthys.utils.ticket_methods import get_question_message_link
 
 
@@ -57,52 +65,82 @@ class OverallStatsResult:
         }
 
 
-def calculate_hang_times(
-    tickets: list[Ticket], include_closed_tickets: bool
-) -> list[float]:
-    hang_times = []
-    for tkt in tickets:
-        if not include_closed_tickets and tkt.status == TicketStatus.CLOSED:
-            continue
-        if not tkt.assigned_at:
-            continue
-        hang_times.append((tkt.assigned_at - tkt.created_at).total_seconds() / 60)
-    return hang_times
+def leaderboard_from_rows(rows: list[dict]) -> list[LeaderboardEntry]:
+    """Builds leaderboard entries from rows that contain User columns and a count"""
+    return [
+        {
+            "user": User(
+                _exists_in_db=True,
+                id=row["id"],
+                slack_id=row["slack_id"],
+                username=row["username"],
+                admin=row["admin"],
+                helper=row["helper"],
+            ),
+            "count": row["count"],
+        }
+        for row in rows
+    ]
 
 
-def calculate_resolution_times(tickets: list[Ticket]) -> list[float]:
-    resolution_times = []
-    for tkt in tickets:
-        if not tkt.closed_at:
-            continue
-        resolution_times.append((tkt.closed_at - tkt.created_at).total_seconds() / 60)
-    return resolution_times
+async def fetch_helpers_leaderboard() -> list[LeaderboardEntry]:
+    """Counts the tickets closed by each helper"""
+    rows = await Ticket.raw(
+        """
+        SELECT
+            "User"."id",
+            "User"."slackId" AS slack_id,
+            "User"."username",
+            "User"."admin",
+            "User"."helper",
+            COUNT(*) AS count
+        FROM "Ticket"
+        JOIN "User" ON "User"."id" = "Ticket"."closedById"
+        WHERE "User"."helper"
+        GROUP BY "User"."id"
+        ORDER BY count DESC, "User"."id"
+        """
+    )
+    return leaderboard_from_rows(rows)
 
 
-async def calculate_overall_stats() -> OverallStatsResult:
-    tickets = await Ticket.objects() or []
-
-    helpers = await User.objects().where(User.helper.eq(True))
-    helpers_leaderboard: list[LeaderboardEntry] = []
-    for user in helpers:
-        # FIXME: This is an n+1 query that we should get rid of at some point
-        closed_count = await Ticket.count().where(Ticket.closed_by == user.id)
-        if closed_count > 0:
-            helpers_leaderboard.append({"user": user, "count": closed_count})
-    helpers_leaderboard.sort(key=lambda entry: entry["count"], reverse=True)
-
-    total_open = len([t for t in tickets if t.status == TicketStatus.OPEN])
-    total_in_progress = len(
-        [t for t in tickets if t.status == TicketStatus.IN_PROGRESS]
-    )
-    total_closed = len([t for t in tickets if t.status == TicketStatus.CLOSED])
-    total = len(tickets)
+async def compute_overall_stats() -> OverallStatsResult:
+    # All of the counting and averaging is done by Postgres, so that we don't
+    # have to load every ticket ever into memory
+    totals = (
+        await Ticket.raw(
+            """
+            SELECT
+                COUNT(*) AS total,
+                COUNT(*) FILTER (WHERE "status" = {}) AS open,
+                COUNT(*) FILTER (WHERE "status" = {}) AS in_progress,
+                COUNT(*) FILTER (WHERE "status" = {}) AS closed,
+                (
+                    AVG(EXTRACT(EPOCH FROM "assignedAt" - "createdAt"))
+                    FILTER (WHERE "status" != {}) / 60
+                )::float8 AS mean_hang_time_unresolved,
+                (
+                    AVG(EXTRACT(EPOCH FROM "assignedAt" - "createdAt")) / 60
+                )::float8 AS mean_hang_time_all,
+                (
+                    AVG(EXTRACT(EPOCH FROM "closedAt" - "createdAt")) / 60
+                )::float8 AS mean_resolution_time
+            FROM "Ticket"
+            """,
+            TicketStatus.OPEN,
+            TicketStatus.IN_PROGRESS,
+            TicketStatus.CLOSED,
+            TicketStatus.CLOSED,
+        )
+    )[0]
 
-    hang_times_unresolved = calculate_hang_times(tickets, include_closed_tickets=False)
-    hang_times_all = calculate_hang_times(tickets, include_closed_tickets=True)
-    resolution_times = calculate_resolution_times(tickets)
+    helpers_leaderboard = await fetch_helpers_leaderboard()
 
-    oldest_unanswered_tickets = await get_unanswered_tickets()
+    oldest_unanswered_tickets = (
+        open_ticket_index.unanswered()
+        if open_ticket_index.loaded
+        else await get_unanswered_tickets(limit=1)
+    )
     oldest_unanswered_ticket = (
         oldest_unanswered_tickets[0] if oldest_unanswered_tickets else None
     )
@@ -120,18 +158,14 @@ async def calculate_overall_stats() -> OverallStatsResult:
     )
 
     return OverallStatsResult(
-        tickets_total=total,
-        tickets_open=total_open,
-        tickets_closed=total_closed,
-        tickets_in_progress=total_in_progress,
+        tickets_total=totals["total"],
+        tickets_open=totals["open"],
+        tickets_closed=totals["closed"],
+        tickets_in_progress=totals["in_progress"],
         helpers_leaderboard=helpers_leaderboard,
-        mean_hang_time_minutes_unresolved=(
-            fmean(hang_times_unresolved) if hang_times_unresolved else None
-        ),
-        mean_hang_time_minutes_all=fmean(hang_times_all) if hang_times_all else None,
-        mean_resolution_time_minutes=(
-            fmean(resolution_times) if resolution_times else None
-        ),
+        mean_hang_time_minutes_unresolved=totals["mean_hang_time_unresolved"],
+        mean_hang_time_minutes_all=totals["mean_hang_time_all"],
+        mean_resolution_time_minutes=totals["mean_resolution_time"],
         oldest_unanswered_ticket=oldest_unanswered_ticket_info,
     )
 
@@ -181,84 +215,304 @@ class DailyStatsResult:
         }
 
 
-async def calculate_daily_stats(
-    start_time: datetime, end_time: datetime
-) -> DailyStatsResult:
-    tickets = await Ticket.objects() or []
-    tickets_created_today = [
-        t for t in tickets if start_time <= t.created_at < end_time
-    ]
+@dataclass
+class DailyStatsTotals:
+    """Counts and time sums for a time interval, before means are calculated.
+
+    Totals for adjacent intervals can be added together, which lets us combine
+    full days from TicketDailyRollup with the partial days either side of them.
+    """
 
-    helpers = await User.objects().where(User.helper.eq(True))
-    leaderboard_data = []
-    for user in helpers:
-        # FIXME: We should move this query outside of the loop for performance!
-        closed_tickets = await Ticket.objects().where(
-            (Ticket.closed_by == user.id)
-            & (Ticket.closed_at >= start_time)
-            & (Ticket.closed_at < end_time)
+    new_tickets_total: int = 0
+    new_tickets_now_closed: int = 0
+    new_tickets_still_open: int = 0
+    new_tickets_in_progress: int = 0
+    closed_today: int = 0
+    assigned_today_in_progress: int = 0
+    hang_seconds_unresolved: float = 0
+    hang_count_unresolved: int = 0
+    hang_seconds_all: float = 0
+    hang_count_all: int = 0
+    resolution_seconds: float = 0
+    resolution_count: int = 0
+    # Map of user ID -> number of tickets they closed
+    closed_by_counts: Counter[int] = field(default_factory=Counter)
+
+    def __add__(self, other: "DailyStatsTotals") -> "DailyStatsTotals":
+        return DailyStatsTotals(
+            **{
+                f.name: getattr(self, f.name) + getattr(other, f.name)
+                for f in fields(self)
+            }
         )
-        daily_closed_count = len(closed_tickets)
-        if daily_closed_count > 0:
-            leaderboard_data.append({"user": user, "count": daily_closed_count})
-    helpers_leaderboard = sorted(
-        leaderboard_data,
-        key=lambda data: data["count"],
-        reverse=True,
-    )
 
-    new_tickets_total = len(tickets_created_today)
-    new_tickets_now_closed = len(
-        [t for t in tickets_created_today if t.status == TicketStatus.CLOSED]
+
+def mean_minutes(total_seconds: float, count: int) -> float | None:
+    return total_seconds / count / 60 if count else None
+
+
+def rollup_interval(
+    start_time: datetime, end_time: datetime
+) -> tuple[datetime, datetime] | None:
+    """Finds the whole UTC days within the given interval, which can be read
+    from TicketDailyRollup instead of the Ticket table"""
+    first_midnight = start_time.astimezone(UTC).replace(
+        hour=0, minute=0, second=0, microsecond=0
     )
-    new_tickets_still_open = len(
-        [t for t in tickets_created_today if t.status == TicketStatus.OPEN]
+    if first_midnight < start_time:
+        first_midnight += timedelta(days=1)
+    last_midnight = end_time.astimezone(UTC).replace(
+        hour=0, minute=0, second=0, microsecond=0
     )
-    new_tickets_in_progress = len(
-        [t for t in tickets_created_today if t.status == TicketStatus.IN_PROGRESS]
+    if first_midnight >= last_midnight:
+        return None
+    return first_midnight, last_midnight
+
+
+async def fetch_ticket_totals(
+    start_time: datetime, end_time: datetime
+) -> DailyStatsTotals:
+    """Calculates totals for the interval by scanning the Ticket table"""
+    if start_time >= end_time:
+        return DailyStatsTotals()
+
+    # Only tickets that were created, closed or assigned within the interval
+    # are relevant, so Postgres can use range scans rather than reading the
+    # whole table. The is_* flags mark which of the three windows a ticket is in.
+    window_args = [start_time, end_time] * 3
+    totals = (
+        await Ticket.raw(
+            """
+            SELECT
+                COUNT(*) FILTER (WHERE is_new) AS new_tickets_total,
+                COUNT(*) FILTER (WHERE is_new AND "status" = {}) AS new_tickets_now_closed,
+                COUNT(*) FILTER (WHERE is_new AND "status" = {}) AS new_tickets_still_open,
+                COUNT(*) FILTER (WHERE is_new AND "status" = {}) AS new_tickets_in_progress,
+                COUNT(*) FILTER (WHERE is_closed AND "status" = {}) AS closed_today,
+                COUNT(*) FILTER (
+                    WHERE is_assigned AND "status" = {}
+                ) AS assigned_today_in_progress,
+                COALESCE(
+                    SUM(EXTRACT(EPOCH FROM "assignedAt" - "createdAt"))
+                    FILTER (WHERE is_new AND "status" != {}),
+                    0
+                )::float8 AS hang_seconds_unresolved,
+                COUNT("assignedAt") FILTER (
+                    WHERE is_new AND "status" != {}
+                ) AS hang_count_unresolved,
+                COALESCE(
+                    SUM(EXTRACT(EPOCH FROM "assignedAt" - "createdAt"))
+                    FILTER (WHERE is_new),
+                    0
+                )::float8 AS hang_seconds_all,
+                COUNT("assignedAt") FILTER (WHERE is_new) AS hang_count_all,
+                COALESCE(
+                    SUM(EXTRACT(EPOCH FROM "closedAt" - "createdAt"))
+                    FILTER (WHERE is_new),
+                    0
+                )::float8 AS resolution_seconds,
+                COUNT("closedAt") FILTER (WHERE is_new) AS resolution_count
+            FROM (
+                SELECT
+                    "status",
+                    "createdAt",
+                    "assignedAt",
+                    "closedAt",
+                    ("createdAt" >= {} AND "createdAt" < {}) AS is_new,
+                    COALESCE("closedAt" >= {} AND "closedAt" < {}, FALSE) AS is_closed,
+                    COALESCE("assignedAt" >= {} AND "assignedAt" < {}, FALSE) AS is_assigned
+                FROM "Ticket"
+                WHERE ("createdAt" >= {} AND "createdAt" < {})
+                    OR ("closedAt" >= {} AND "closedAt" < {})
+                    OR ("assignedAt" >= {} AND "assignedAt" < {})
+            ) AS windowed_tickets
+            """,
+            TicketStatus.CLOSED,
+            TicketStatus.OPEN,
+            TicketStatus.IN_PROGRESS,
+            TicketStatus.CLOSED,
+            TicketStatus.IN_PROGRESS,
+            TicketStatus.CLOSED,
+            TicketStatus.CLOSED,
+            *window_args,
+            *window_args,
+        )
+    )[0]
+
+    closed_by_rows = await Ticket.raw(
+        """
+        SELECT "closedById" AS user_id, COUNT(*) AS count
+        FROM "Ticket"
+        WHERE "closedAt" >= {} AND "closedAt" < {} AND "closedById" IS NOT NULL
+        GROUP BY "closedById"
+        """,
+        start_time,
+        end_time,
     )
-    tickets_closed_today = [
-        t
-        for t in tickets
-        if t.status == TicketStatus.CLOSED
-        and t.closed_at
-        and start_time <= t.closed_at < end_time
-    ]
-    closed_today = len(tickets_closed_today)
-    closed_today_from_today = len(
-        [t for t in tickets_closed_today if start_time <= t.created_at < end_time]
+
+    return DailyStatsTotals(
+        **totals,
+        closed_by_counts=Counter(
+            {row["user_id"]: row["count"] for row in closed_by_rows}
+        ),
     )
-    assigned_today_in_progress = len(
-        [
-            t
-            for t in tickets
-            if t.assigned_at
-            and start_time <= t.assigned_at < end_time
-            and t.status == TicketStatus.IN_PROGRESS
-        ]
+
+
+async def fetch_rollup_totals(
+    start_time: datetime, end_time: datetime
+) -> DailyStatsTotals:
+    """Calculates totals for the interval (which must start and end at UTC midnight)
+    by summing TicketDailyRollup rows"""
+    start_day = start_time.astimezone(UTC).date()
+    end_day = end_time.astimezone(UTC).date()
+    totals = (
+        await TicketDailyRollup.raw(
+            """
+            SELECT
+                COALESCE(SUM("openedCount"), 0) AS new_tickets_total,
+                COALESCE(SUM("openedClosedCount"), 0) AS new_tickets_now_closed,
+                COALESCE(SUM("openedOpenCount"), 0) AS new_tickets_still_open,
+                COALESCE(SUM("openedInProgressCount"), 0) AS new_tickets_in_progress,
+                COALESCE(SUM("closedCount"), 0) AS closed_today,
+                COALESCE(SUM("assignedInProgressCount"), 0) AS assigned_today_in_progress,
+                COALESCE(SUM("hangUnresolvedSecondsSum"), 0) AS hang_seconds_unresolved,
+                COALESCE(SUM("hangUnresolvedCount"), 0) AS hang_count_unresolved,
+                COALESCE(SUM("hangSecondsSum"), 0) AS hang_seconds_all,
+                COALESCE(SUM("hangCount"), 0) AS hang_count_all,
+                COALESCE(SUM("resolutionSecondsSum"), 0) AS resolution_seconds,
+                COALESCE(SUM("resolutionCount"), 0) AS resolution_count
+            FROM "TicketDailyRollup"
+            WHERE "day" >= {} AND "day" < {}
+            """,
+            start_day,
+            end_day,
+        )
+    )[0]
+
+    closed_by_rows = await TicketDailyRollup.raw(
+        """
+        SELECT "closedById" AS user_id, SUM("closedCount") AS count
+        FROM "TicketDailyRollup"
+        WHERE "day" >= {} AND "day" < {} AND "closedById" != 0
+        GROUP BY "closedById"
+        """,
+        start_day,
+        end_day,
     )
 
-    hang_times_current = calculate_hang_times(
-        tickets_created_today, include_closed_tickets=False
+    return DailyStatsTotals(
+        **totals,
+        closed_by_counts=Counter(
+            {row["user_id"]: row["count"] for row in closed_by_rows}
+        ),
     )
-    hang_times_all = calculate_hang_times(
-        tickets_created_today, include_closed_tickets=True
+
+
+async def fetch_helpers_by_id(user_ids: Iterable[int]) -> dict[int, User]:
+    """Fetches the users with the given IDs, leaving out any that aren't helpers"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    helpers = await User.objects().where(User.id.is_in(user_ids) & User.helper.eq(True))
+    return {helper.id: helper for helper in helpers}
+
+
+def leaderboard_from_counts(
+    closed_by_counts: Counter[int], helpers_by_id: dict[int, User]
+) -> list[LeaderboardEntry]:
+    """Turns a map of user ID -> closed ticket count into a leaderboard of helpers"""
+    leaderboard: list[LeaderboardEntry] = [
+        {"user": helpers_by_id[user_id], "count": count}
+        for user_id, count in closed_by_counts.items()
+        if count > 0 and user_id in helpers_by_id
+    ]
+    leaderboard.sort(key=lambda entry: (-entry["count"], entry["user"].id))
+    return leaderboard
+
+
+async def build_helpers_leaderboard(
+    closed_by_counts: Counter[int],
+) -> list[LeaderboardEntry]:
+    helpers_by_id = await fetch_helpers_by_id(
+        user_id for user_id, count in closed_by_counts.items() if count > 0
     )
-    resolution_times = calculate_resolution_times(tickets_created_today)
-    hang_time_current = fmean(hang_times_current) if hang_times_current else None
-    hang_time_all = fmean(hang_times_all) if hang_times_all else None
-    resolution_time = fmean(resolution_times) if resolution_times else None
+    return leaderboard_from_counts(closed_by_counts, helpers_by_id)
+
+
+async def compute_daily_stats(
+    start_time: datetime, end_time: datetime
+) -> DailyStatsResult:
+    # Whole days come from the rollup table, and only the partial days at
+    # either end of the interval need to be read from the Ticket table
+    rollup_days = rollup_interval(start_time, end_time)
+    if rollup_days:
+        rollup_start, rollup_end = rollup_days
+        totals = (
+            await fetch_ticket_totals(start_time, rollup_start)
+            + await fetch_rollup_totals(rollup_start, rollup_end)
+            + await fetch_ticket_totals(rollup_end, end_time)
+        )
+    else:
+        totals = await fetch_ticket_totals(start_time, end_time)
+
+    # Unlike the other numbers, tickets that were both created and closed within
+    # the interval can't be added up from smaller intervals. So we take the new
+    # tickets that are now closed, and subtract the ones closed after the interval
+    # (which is usually only a few, since most intervals end at around now).
+    new_tickets_closed_later = (
+        await Ticket.raw(
+            """
+            SELECT COUNT(*) AS count
+            FROM "Ticket"
+            WHERE "status" = {}
+                AND ("closedAt" >= {} OR "closedAt" IS NULL)
+                AND "createdAt" >= {} AND "createdAt" < {}
+            """,
+            TicketStatus.CLOSED,
+            end_time,
+            start_time,
+            end_time,
+        )
+    )[0]["count"]
 
     return DailyStatsResult(
-        closed_today=closed_today,
-        closed_today_from_today=closed_today_from_today,
-        assigned_today_in_progress=assigned_today_in_progress,
-        helpers_leaderboard=helpers_leaderboard,
-        new_tickets_total=new_tickets_total,
-        new_tickets_now_closed=new_tickets_now_closed,
-        new_tickets_in_progress=new_tickets_in_progress,
-        new_tickets_still_open=new_tickets_still_open,
-        mean_hang_time_minutes_unresolved=hang_time_current,
-        mean_hang_time_minutes_all=hang_time_all,
-        mean_resolution_time_minutes=resolution_time,
+        closed_today=totals.closed_today,
+        closed_today_from_today=totals.new_tickets_now_closed
+        - new_tickets_closed_later,
+        assigned_today_in_progress=totals.assigned_today_in_progress,
+        helpers_leaderboard=await build_helpers_leaderboard(totals.closed_by_counts),
+        new_tickets_total=totals.new_tickets_total,
+        new_tickets_now_closed=totals.new_tickets_now_closed,
+        new_tickets_in_progress=totals.new_tickets_in_progress,
+        new_tickets_still_open=totals.new_tickets_still_open,
+        mean_hang_time_minutes_unresolved=mean_minutes(
+            totals.hang_seconds_unresolved, totals.hang_count_unresolved
+        ),
+        mean_hang_time_minutes_all=mean_minutes(
+            totals.hang_seconds_all, totals.hang_count_all
+        ),
+        mean_resolution_time_minutes=mean_minutes(
+            totals.resolution_seconds, totals.resolution_count
+        ),
+    )
+
+
+def cache_bucket(dt: datetime) -> int:
+    """Rounds a time down so that intervals which only differ by a few seconds
+    (e.g. "the past 24 hours" requested a few seconds apart) share a cache entry"""
+    return int(dt.timestamp() // stats_cache.ttl_seconds)
+
+
+async def calculate_overall_stats() -> OverallStatsResult:
+    """All-time stats, cached for a short time (see `StatsCache`)"""
+    return await stats_cache.get_or_compute(("overall",), compute_overall_stats)
+
+
+async def calculate_daily_stats(
+    start_time: datetime, end_time: datetime
+) -> DailyStatsResult:
+    """Stats for a time interval, cached for a short time (see `StatsCache`)"""
+    return await stats_cache.get_or_compute(
+        ("daily", cache_bucket(start_time), cache_bucket(end_time)),
+        lambda: compute_daily_stats(start_time, end_time),
     )
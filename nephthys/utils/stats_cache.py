@@ -0,0 +1,83 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Hashable
+from typing import Any
+
+from prometheus_client import Counter
+
+STATS_CACHE_REQUESTS = Counter(
+    "nephthys_stats_cache_requests_total",
+    "Stats cache lookups, by whether they were served from the cache, waited for an in-progress calculation, or calculated the stats",
+    ["result"],
+)
+
+
+class StatsCache:
+    """Keeps calculated stats for a short time, so that dashboards polling the
+    stats API (and helpers opening App Home) don't all recalculate them.
+
+    If several requests miss the cache for the same key at once, only one of
+    them calculates the stats and the rest wait for its result. Up to
+    `max_size` results are kept, since the stats API accepts arbitrary ranges.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        # Incremented on invalidation, so that calculations which started
+        # before an invalidation don't get cached
+        self._generation = 0
+
+    async def get_or_compute(
+        self, key: Hashable, compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            STATS_CACHE_REQUESTS.labels(result="hit").inc()
+            self._entries.move_to_end(key)
+            return entry[1]
+        if entry:
+            del self._entries[key]
+
+        task = self._in_flight.get(key)
+        if task:
+            STATS_CACHE_REQUESTS.labels(result="coalesced").inc()
+        else:
+            STATS_CACHE_REQUESTS.labels(result="miss").inc()
+            task = asyncio.create_task(self._compute(key, compute))
+            self._in_flight[key] = task
+        # Shielded so that one caller being cancelled doesn't cancel the
+        # calculation for everyone else waiting on it
+        return await asyncio.shield(task)
+
+    async def _compute(
+        self, key: Hashable, compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        generation = self._generation
+        try:
+            result = await compute()
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            return result
+        finally:
+            # The key may already belong to a newer calculation if the cache
+            # was invalidated while this one was running
+            if self._in_flight.get(key) is asyncio.current_task():
+                del self._in_flight[key]
+
+    def invalidate(self):
+        """Forgets all cached stats (e.g. because a ticket has changed)"""
+        self._entries.clear()
+        self._in_flight.clear()
+        self._generation += 1
+
+
+stats_cache = StatsCache(max_size=256, ttl_seconds=30)
@@ -0,0 +1,269 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from datetime import datetime
+from datetime import UTC
+from typing import Any
+
+from piccolo.table import Table
+
+from nephthys.database.enums import TicketStatus
+from nephthys.database.tables import Ticket
+from nephthys.database.tables import TicketDailyRollup
+from nephthys.utils.stats_cache import stats_cache
+
+# Maps the counter names used below to TicketDailyRollup column names
+ROLLUP_COLUMNS = {
+    "opened_count": "openedCount",
+    "opened_open_count": "openedOpenCount",
+    "opened_in_progress_count": "openedInProgressCount",
+    "opened_closed_count": "openedClosedCount",
+    "closed_count": "closedCount",
+    "assigned_in_progress_count": "assignedInProgressCount",
+    "hang_seconds_sum": "hangSecondsSum",
+    "hang_count": "hangCount",
+    "hang_unresolved_seconds_sum": "hangUnresolvedSecondsSum",
+    "hang_unresolved_count": "hangUnresolvedCount",
+    "resolution_seconds_sum": "resolutionSecondsSum",
+    "resolution_count": "resolutionCount",
+}
+
+OPENED_STATUS_COUNTERS = {
+    TicketStatus.OPEN: "opened_open_count",
+    TicketStatus.IN_PROGRESS: "opened_in_progress_count",
+    TicketStatus.CLOSED: "opened_closed_count",
+}
+
+# (day, category tag ID, closer ID)
+RollupKey = tuple[date, int, int]
+# Counter name -> value. Values are floats because of the *_seconds_sum counters.
+RollupCounters = defaultdict[str, float]
+
+
+def foreign_key_id(value: Any) -> int | None:
+    """Gets the ID from a foreign key value, which may or may not have been prefetched"""
+    if isinstance(value, Table):
+        return value.id  # type: ignore (all of our tables have an id)
+    return value
+
+
+def utc_day(dt: datetime) -> date:
+    return dt.astimezone(UTC).date()
+
+
+@dataclass(frozen=True)
+class TicketRollupState:
+    """The parts of a ticket that affect its contribution to TicketDailyRollup"""
+
+    created_at: datetime
+    status: TicketStatus
+    category_tag_id: int | None
+    assigned_at: datetime | None
+    closed_at: datetime | None
+    closed_by_id: int | None
+
+    @classmethod
+    def from_ticket(cls, ticket: Ticket) -> "TicketRollupState":
+        return cls(
+            created_at=ticket.created_at,
+            status=TicketStatus(ticket.status),
+            category_tag_id=foreign_key_id(ticket.category_tag),
+            assigned_at=ticket.assigned_at,
+            closed_at=ticket.closed_at,
+            closed_by_id=foreign_key_id(ticket.closed_by),
+        )
+
+    def rollup_counters(self) -> dict[RollupKey, RollupCounters]:
+        """Calculates what this ticket adds to each TicketDailyRollup row.
+
+        This must be kept in sync with `REBUILD_ROLLUP_SQL`.
+        """
+        category = self.category_tag_id or 0
+        counters: defaultdict[RollupKey, RollupCounters] = defaultdict(
+            lambda: defaultdict(float)
+        )
+
+        created = counters[(utc_day(self.created_at), category, 0)]
+        created["opened_count"] = 1
+        created[OPENED_STATUS_COUNTERS[self.status]] = 1
+        if self.assigned_at:
+            hang_seconds = (self.assigned_at - self.created_at).total_seconds()
+            created["hang_seconds_sum"] = hang_seconds
+            created["hang_count"] = 1
+            if self.status != TicketStatus.CLOSED:
+                created["hang_unresolved_seconds_sum"] = hang_seconds
+                created["hang_unresolved_count"] = 1
+        if self.closed_at:
+            created["resolution_seconds_sum"] = (
+                self.closed_at - self.created_at
+            ).total_seconds()
+            created["resolution_count"] = 1
+
+        if self.status == TicketStatus.CLOSED and self.closed_at:
+            key = (utc_day(self.closed_at), category, self.closed_by_id or 0)
+            counters[key]["closed_count"] += 1
+
+        if self.status == TicketStatus.IN_PROGRESS and self.assigned_at:
+            key = (utc_day(self.assigned_at), category, 0)
+            counters[key]["assigned_in_progress_count"] += 1
+
+        return counters
+
+
+def rollup_deltas(
+    before: TicketRollupState | None, after: TicketRollupState | None
+) -> dict[RollupKey, dict[str, float]]:
+    """Calculates the changes to TicketDailyRollup rows needed when a ticket
+    goes from the `before` state to the `after` state.
+
+    `before` is None for newly created tickets, and `after` is None for deleted tickets.
+    """
+    deltas: defaultdict[RollupKey, RollupCounters] = defaultdict(
+        lambda: defaultdict(float)
+    )
+    for state, sign in ((after, 1), (before, -1)):
+        if not state:
+            continue
+        for key, counters in state.rollup_counters().items():
+            for name, value in counters.items():
+                deltas[key][name] += sign * value
+    # Drop anything that hasn't changed so that we don't write it
+    return {
+        key: {name: value for name, value in counters.items() if value}
+        for key, counters in deltas.items()
+        if any(counters.values())
+    }
+
+
+async def record_ticket_change(
+    before: TicketRollupState | None, after: TicketRollupState | None
+):
+    """Updates TicketDailyRollup to reflect a ticket changing state.
+
+    Call this in the same transaction that changed the ticket, with `before`
+    read from the row that was locked by the change (e.g. with RETURNING), so
+    that concurrent changes to the ticket can't be counted twice.
+    """
+    deltas = rollup_deltas(before, after)
+    if not deltas:
+        return
+    stats_cache.invalidate()
+
+    db_columns = list(ROLLUP_COLUMNS.values())
+    rows_sql = []
+    args = []
+    for (day, category, closed_by), counters in deltas.items():
+        rows_sql.append("(" + ", ".join(["{}"] * (3 + len(db_columns))) + ")")
+        args += [day, category, closed_by]
+        for name in ROLLUP_COLUMNS:
+            value = counters.get(name, 0)
+            # asyncpg won't accept floats for the integer columns
+            args.append(value if name.endswith("_seconds_sum") else round(value))
+
+    columns_sql = ", ".join(f'"{column}"' for column in db_columns)
+    updates_sql = ", ".join(
+        f'"{column}" = "TicketDailyRollup"."{column}" + EXCLUDED."{column}"'
+        for column in db_columns
+    )
+    async with TicketDailyRollup._meta.db.transaction() as transaction:
+        # A failed statement aborts the whole transaction, so this is done in a
+        # savepoint to keep the ticket change if the rollup can't be updated
+        savepoint = await transaction.savepoint()
+        try:
+            await TicketDailyRollup.raw(
+                f"""
+                INSERT INTO "TicketDailyRollup" ("day", "categoryTagId", "closedById", {columns_sql})
+                VALUES {", ".join(rows_sql)}
+                ON CONFLICT ("day", "categoryTagId", "closedById") DO UPDATE SET {updates_sql}
+                """,
+                *args,
+            )
+            await savepoint.release()
+        except Exception as e:
+            await savepoint.rollback_to()
+            # Stats being slightly off shouldn't stop the ticket from being handled,
+            # and can be fixed by rebuilding the rollup table
+            logging.error(f"Failed to update ticket daily rollup: {e}", exc_info=True)
+
+
+# Recalculates TicketDailyRollup from scratch. Each ticket contributes the same
+# values as TicketRollupState.rollup_counters() does.
+REBUILD_ROLLUP_SQL = """
+INSERT INTO "TicketDailyRollup" (
+    "day", "categoryTagId", "closedById",
+    "openedCount", "openedOpenCount", "openedInProgressCount", "openedClosedCount",
+    "closedCount", "assignedInProgressCount",
+    "hangSecondsSum", "hangCount", "hangUnresolvedSecondsSum", "hangUnresolvedCount",
+    "resolutionSecondsSum", "resolutionCount"
+)
+SELECT
+    day, category_tag_id, closed_by_id,
+    SUM(opened), SUM(opened_open), SUM(opened_in_progress), SUM(opened_closed),
+    SUM(closed), SUM(assigned_in_progress),
+    SUM(hang_seconds), SUM(hang), SUM(hang_unresolved_seconds), SUM(hang_unresolved),
+    SUM(resolution_seconds), SUM(resolution)
+FROM (
+    SELECT
+        ("createdAt" AT TIME ZONE 'UTC')::date AS day,
+        COALESCE("categoryTagId", 0) AS category_tag_id,
+        0 AS closed_by_id,
+        1 AS opened,
+        ("status" = 'OPEN')::int AS opened_open,
+        ("status" = 'IN_PROGRESS')::int AS opened_in_progress,
+        ("status" = 'CLOSED')::int AS opened_closed,
+        0 AS closed,
+        0 AS assigned_in_progress,
+        COALESCE(EXTRACT(EPOCH FROM "assignedAt" - "createdAt"), 0)::float8 AS hang_seconds,
+        ("assignedAt" IS NOT NULL)::int AS hang,
+        CASE WHEN "status" != 'CLOSED'
+            THEN COALESCE(EXTRACT(EPOCH FROM "assignedAt" - "createdAt"), 0)
+            ELSE 0
+        END::float8 AS hang_unresolved_seconds,
+        ("assignedAt" IS NOT NULL AND "status" != 'CLOSED')::int AS hang_unresolved,
+        COALESCE(EXTRACT(EPOCH FROM "closedAt" - "createdAt"), 0)::float8 AS resolution_seconds,
+        ("closedAt" IS NOT NULL)::int AS resolution
+    FROM "Ticket"
+
+    UNION ALL
+
+    SELECT
+        ("closedAt" AT TIME ZONE 'UTC')::date,
+        COALESCE("categoryTagId", 0),
+        COALESCE("closedById", 0),
+        0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0
+    FROM "Ticket"
+    WHERE "status" = 'CLOSED' AND "closedAt" IS NOT NULL
+
+    UNION ALL
+
+    SELECT
+        ("assignedAt" AT TIME ZONE 'UTC')::date,
+        COALESCE("categoryTagId", 0),
+        0,
+        0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0
+    FROM "Ticket"
+    WHERE "status" = 'IN_PROGRESS' AND "assignedAt" IS NOT NULL
+) AS contributions
+GROUP BY day, category_tag_id, closed_by_id;
+"""
+
+
+async def rebuild_ticket_daily_rollup():
+    """Repopulates TicketDailyRollup from the Ticket table.
+
+    Use this to fill the table for the first time, or to fix any drift (e.g. if
+    updating it failed after a ticket changed).
+    """
+    async with TicketDailyRollup._meta.db.transaction():
+        await TicketDailyRollup.delete(force=True)
+        await TicketDailyRollup.raw(REBUILD_ROLLUP_SQL)
+    stats_cache.invalidate()
+
+
+async def populate_ticket_daily_rollup():
+    """Fills TicketDailyRollup if it's empty (e.g. right after it was created)"""
+    if await TicketDailyRollup.count() or not await Ticket.count():
+        return
+    logging.info("Ticket daily rollup is empty, rebuilding it from the Ticket table")
+    await rebuild_ticket_daily_rollup()
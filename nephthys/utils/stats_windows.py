@@ -0,0 +1,148 @@
+from collections import Counter
+from datetime import datetime
+
+from nephthys.database.enums import TicketStatus
+from nephthys.database.tables import Ticket
+from nephthys.utils.stats import cache_bucket
+from nephthys.utils.stats import DailyStatsResult
+from nephthys.utils.stats import fetch_helpers_by_id
+from nephthys.utils.stats import leaderboard_from_counts
+from nephthys.utils.stats_cache import stats_cache
+
+Interval = tuple[datetime, datetime]
+
+
+def window_stats_columns(i: int) -> str:
+    """The aggregate columns for the i-th interval, using the flags from
+    `window_flag_columns()`"""
+    return f"""
+        COUNT(*) FILTER (WHERE new_{i}) AS new_tickets_total_{i},
+        COUNT(*) FILTER (WHERE new_{i} AND status_closed) AS new_tickets_now_closed_{i},
+        COUNT(*) FILTER (WHERE new_{i} AND status_open) AS new_tickets_still_open_{i},
+        COUNT(*) FILTER (
+            WHERE new_{i} AND status_in_progress
+        ) AS new_tickets_in_progress_{i},
+        COUNT(*) FILTER (WHERE closed_{i} AND status_closed) AS closed_today_{i},
+        COUNT(*) FILTER (
+            WHERE closed_{i} AND new_{i} AND status_closed
+        ) AS closed_today_from_today_{i},
+        COUNT(*) FILTER (
+            WHERE assigned_{i} AND status_in_progress
+        ) AS assigned_today_in_progress_{i},
+        (
+            AVG(hang_seconds) FILTER (WHERE new_{i} AND NOT status_closed) / 60
+        )::float8 AS mean_hang_time_unresolved_{i},
+        (AVG(hang_seconds) FILTER (WHERE new_{i}) / 60)::float8 AS mean_hang_time_all_{i},
+        (
+            AVG(resolution_seconds) FILTER (WHERE new_{i}) / 60
+        )::float8 AS mean_resolution_time_{i}
+    """
+
+
+def window_flag_columns(i: int) -> str:
+    """Flags for whether a ticket was created, closed or assigned within the
+    i-th interval. Each flag takes the interval start and end as arguments."""
+    return f"""
+        ("createdAt" >= {{}} AND "createdAt" < {{}}) AS new_{i},
+        ("closedAt" >= {{}} AND "closedAt" < {{}}) AS closed_{i},
+        ("assignedAt" >= {{}} AND "assignedAt" < {{}}) AS assigned_{i}
+    """
+
+
+async def compute_multi_window_stats(
+    intervals: list[Interval],
+) -> list[DailyStatsResult]:
+    """Calculates stats for several time intervals at once.
+
+    Rather than running the queries in `calculate_daily_stats()` for each interval,
+    this reads the tickets covering all of the intervals once, and works out which
+    interval(s) each ticket counts towards with conditional aggregation.
+    """
+    if not intervals:
+        return []
+    range_start = min(start for start, _ in intervals)
+    range_end = max(end for _, end in intervals)
+    interval_args = [arg for start, end in intervals for arg in (start, end) * 3]
+
+    stats_columns = ",".join(window_stats_columns(i) for i in range(len(intervals)))
+    flag_columns = ",".join(window_flag_columns(i) for i in range(len(intervals)))
+    totals = (
+        await Ticket.raw(
+            f"""
+            SELECT {stats_columns}
+            FROM (
+                SELECT
+                    ("status" = {{}}) AS status_open,
+                    ("status" = {{}}) AS status_in_progress,
+                    ("status" = {{}}) AS status_closed,
+                    EXTRACT(EPOCH FROM "assignedAt" - "createdAt") AS hang_seconds,
+                    EXTRACT(EPOCH FROM "closedAt" - "createdAt") AS resolution_seconds,
+                    {flag_columns}
+                FROM "Ticket"
+                WHERE ("createdAt" >= {{}} AND "createdAt" < {{}})
+                    OR ("closedAt" >= {{}} AND "closedAt" < {{}})
+                    OR ("assignedAt" >= {{}} AND "assignedAt" < {{}})
+            ) AS windowed_tickets
+            """,
+            TicketStatus.OPEN,
+            TicketStatus.IN_PROGRESS,
+            TicketStatus.CLOSED,
+            *interval_args,
+            *[range_start, range_end] * 3,
+        )
+    )[0]
+
+    count_columns = ",".join(
+        f'COUNT(*) FILTER (WHERE "closedAt" >= {{}} AND "closedAt" < {{}}) AS count_{i}'
+        for i in range(len(intervals))
+    )
+    closed_by_rows = await Ticket.raw(
+        f"""
+        SELECT "closedById" AS user_id, {count_columns}
+        FROM "Ticket"
+        WHERE "closedAt" >= {{}} AND "closedAt" < {{}} AND "closedById" IS NOT NULL
+        GROUP BY "closedById"
+        """,
+        *[arg for interval in intervals for arg in interval],
+        range_start,
+        range_end,
+    )
+    helpers_by_id = await fetch_helpers_by_id(row["user_id"] for row in closed_by_rows)
+
+    results = []
+    for i in range(len(intervals)):
+        closed_by_counts = Counter(
+            {row["user_id"]: row[f"count_{i}"] for row in closed_by_rows}
+        )
+        results.append(
+            DailyStatsResult(
+                new_tickets_total=totals[f"new_tickets_total_{i}"],
+                new_tickets_now_closed=totals[f"new_tickets_now_closed_{i}"],
+                new_tickets_still_open=totals[f"new_tickets_still_open_{i}"],
+                new_tickets_in_progress=totals[f"new_tickets_in_progress_{i}"],
+                closed_today=totals[f"closed_today_{i}"],
+                closed_today_from_today=totals[f"closed_today_from_today_{i}"],
+                assigned_today_in_progress=totals[f"assigned_today_in_progress_{i}"],
+                helpers_leaderboard=leaderboard_from_counts(
+                    closed_by_counts, helpers_by_id
+                ),
+                mean_hang_time_minutes_unresolved=totals[
+                    f"mean_hang_time_unresolved_{i}"
+                ],
+                mean_hang_time_minutes_all=totals[f"mean_hang_time_all_{i}"],
+                mean_resolution_time_minutes=totals[f"mean_resolution_time_{i}"],
+            )
+        )
+    return results
+
+
+async def calculate_multi_window_stats(
+    intervals: list[Interval],
+) -> list[DailyStatsResult]:
+    """Stats for several time intervals, cached for a short time (see `StatsCache`)"""
+    key = ("multi_window",) + tuple(
+        (cache_bucket(start), cache_bucket(end)) for start, end in intervals
+    )
+    return await stats_cache.get_or_compute(
+        key, lambda: compute_multi_window_stats(intervals)
+    )
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from typing import Generic
+from typing import TypeVar
+
+from nephthys.database.tables import CategoryTag
+from nephthys.database.tables import TeamTag
+from nephthys.utils.tag_search import TagSearchIndex
+
+TagTable = TypeVar("TagTable", CategoryTag, TeamTag)
+
+
+class TagCatalog(Generic[TagTable]):
+    """An in-memory copy of all the tags in a tag table.
+
+    Tags are only ever created through the bot, so the catalog is loaded once
+    and then reloaded (lazily) after `invalidate()` is called when a tag is created.
+    """
+
+    def __init__(self, table: type[TagTable]):
+        self.table = table
+        self._tags: list[TagTable] | None = None
+        self._by_id: dict[int, TagTable] = {}
+        self._by_name: dict[str, TagTable] = {}
+        self._search_index = TagSearchIndex([])
+        self._lock = asyncio.Lock()
+        # Bumped on every invalidation, so that a load that was already in
+        # progress doesn't keep what it read before the change
+        self._generation = 0
+
+    async def _load(self) -> list[TagTable]:
+        async with self._lock:
+            while self._tags is None:
+                generation = self._generation
+                tags = await self.table.objects().order_by(self.table.id)
+                if generation != self._generation:
+                    continue
+                self._by_id = {tag.id: tag for tag in tags}
+                self._by_name = {}
+                for tag in tags:
+                    self._by_name.setdefault(tag.name.lower(), tag)
+                self._search_index = TagSearchIndex(tags)
+                self._tags = tags
+                logging.debug(f"Loaded {self.table.__name__} catalog tags={len(tags)}")
+            return self._tags
+
+    async def all(self) -> list[TagTable]:
+        """All tags, in the order they were created"""
+        if self._tags is None:
+            return await self._load()
+        return self._tags
+
+    async def get(self, tag_id: int) -> TagTable | None:
+        await self.all()
+        return self._by_id.get(tag_id)
+
+    async def get_by_name(self, name: str) -> TagTable | None:
+        """Finds a tag by name, preferring an exact match over a case-insensitive one"""
+        tags = await self.all()
+        exact = next((tag for tag in tags if tag.name == name), None)
+        return exact or self._by_name.get(name.lower())
+
+    async def search(self, query: str | None, limit: int = 100) -> list[TagTable]:
+        """Fuzzy-searches tags by name, best match first"""
+        tags = await self.all()
+        return [tags[i] for i in self._search_index.search(query, limit)]
+
+    async def search_options(self, query: str | None, limit: int = 100) -> list[dict]:
+        """Fuzzy-searches tags by name, returning them as Slack select menu options"""
+        await self.all()
+        return self._search_index.search_options(query, limit)
+
+    def invalidate(self):
+        """Makes the catalog reload from the database next time it's used"""
+        self._generation += 1
+        self._tags = None
+
+
+category_tag_catalog = TagCatalog(CategoryTag)
+team_tag_catalog = TagCatalog(TeamTag)
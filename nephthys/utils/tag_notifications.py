@@ -0,0 +1,122 @@
+import asyncio
+import logging
+
+from prometheus_client import Counter
+from slack_sdk.errors import SlackApiError
+
+from nephthys.database.tables import TagsOnTickets
+from nephthys.database.tables import Ticket
+from nephthys.database.tables import UserTagSubscription
+from nephthys.utils.env import env
+from nephthys.utils.slack_rate_limit import background_priority
+from nephthys.utils.ticket_methods import get_backend_message_link
+from nephthys.utils.ticket_methods import get_question_message_link
+
+TAG_NOTIFICATIONS = Counter(
+    "nephthys_tag_notifications_total",
+    "DMs sent to team tag subscribers about newly tagged tickets",
+    ["result"],
+)
+
+# DMs in flight at once (the Slack rate limiter still paces them)
+NOTIFICATION_CONCURRENCY = 10
+
+# Keeps references to notification tasks so they don't get garbage collected
+notification_tasks: set[asyncio.Task] = set()
+
+
+async def set_ticket_team_tags(ticket_id: int, tag_ids: list[int]) -> list[int]:
+    """Makes the ticket's team tags exactly `tag_ids`, with at most one insert
+    and one delete. Returns the IDs of the tags that were added."""
+    rows = await TagsOnTickets.select(TagsOnTickets.tag).where(
+        TagsOnTickets.ticket == ticket_id
+    )
+    existing_tag_ids = {row["tag"] for row in rows}
+    added = [tag_id for tag_id in tag_ids if tag_id not in existing_tag_ids]
+    removed = existing_tag_ids - set(tag_ids)
+
+    if added:
+        await add_ticket_team_tags(ticket_id, added)
+    if removed:
+        await TagsOnTickets.delete().where(
+            (TagsOnTickets.ticket == ticket_id) & TagsOnTickets.tag.is_in(list(removed))
+        )
+    return added
+
+
+async def add_ticket_team_tags(ticket_id: int, tag_ids: list[int]):
+    await TagsOnTickets.insert(
+        *[TagsOnTickets(ticket=ticket_id, tag=tag_id) for tag_id in tag_ids]
+    ).on_conflict(action="DO NOTHING")
+
+
+async def send_tag_notification(
+    slack_id: str, tag_names: list[str], ticket: Ticket, semaphore: asyncio.Semaphore
+):
+    url = get_question_message_link(ticket)
+    ticket_url = get_backend_message_link(ticket)
+    formatted_tags = ", ".join(f"*{name}*" for name in tag_names)
+    async with semaphore:
+        try:
+            await env.slack_client.chat_postMessage(
+                channel=slack_id,
+                text=(
+                    f"New ticket for {formatted_tags}: *{ticket.title}*\n"
+                    f"<{url}|ticket> <{ticket_url}|bts ticket>"
+                ),
+            )
+            TAG_NOTIFICATIONS.labels(result="sent").inc()
+        except SlackApiError as e:
+            TAG_NOTIFICATIONS.labels(result="failed").inc()
+            logging.warning(
+                f"Failed to notify tag subscriber user={slack_id} ticket={ticket.id} error={e.response.get('error')}"
+            )
+
+
+@background_priority
+async def notify_tag_subscribers(
+    ticket: Ticket, tag_names: dict[int, str], exclude_user_id: int | None = None
+):
+    """DMs everyone subscribed to any of the tags (other than the user who added
+    them), with one message per user listing the tags they follow"""
+    if not tag_names:
+        return
+    query = UserTagSubscription.select(
+        UserTagSubscription.tag, UserTagSubscription.user.slack_id
+    ).where(UserTagSubscription.tag.is_in(list(tag_names)))
+    if exclude_user_id is not None:
+        query = query.where(UserTagSubscription.user != exclude_user_id)
+    subscriptions = await query
+
+    tags_by_subscriber: dict[str, list[str]] = {}
+    for subscription in subscriptions:
+        tags_by_subscriber.setdefault(subscription["user.slack_id"], []).append(
+            tag_names[subscription["tag"]]
+        )
+
+    semaphore = asyncio.Semaphore(NOTIFICATION_CONCURRENCY)
+    await asyncio.gather(
+        *[
+            send_tag_notification(slack_id, names, ticket, semaphore)
+            for slack_id, names in tags_by_subscriber.items()
+        ]
+    )
+
+
+def start_tag_notifications(
+    ticket: Ticket, tag_names: dict[int, str], exclude_user_id: int | None = None
+):
+    """Notifies tag subscribers in the background, so that the interaction
+    that added the tags doesn't have to wait for the DMs to be sent"""
+    if not tag_names:
+        return
+
+    async def run():
+        try:
+            await notify_tag_subscribers(ticket, tag_names, exclude_user_id)
+        except Exception as e:
+            logging.error(f"Failed to notify tag subscribers ticket={ticket.id}: {e}")
+
+    task = asyncio.create_task(run())
+    notification_tasks.add(task)
+    task.add_done_callback(notification_tasks.discard)
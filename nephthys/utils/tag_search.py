@@ -0,0 +1,75 @@
+from collections import defaultdict
+from collections.abc import Sequence
+from typing import Any
+from typing import Protocol
+
+from thefuzz import fuzz
+from thefuzz import process
+from thefuzz import utils
+
+
+class Tag(Protocol):
+    id: Any
+    name: Any
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TagSearchIndex:
+    """A fuzzy search index over tag names, built once when the tags are loaded.
+
+    Names are normalised up front (in the same way `thefuzz` would normalise them
+    on every search), and Slack option payloads are built ahead of time. For
+    large catalogs, only tags sharing a prefix or trigram with the search are
+    scored.
+    """
+
+    def __init__(self, tags: Sequence[Tag]):
+        self.tags = tags
+        self.names = [utils.full_process(tag.name) for tag in tags]
+        self.options = [
+            {
+                "text": {"type": "plain_text", "text": f"{tag.name}"},
+                "value": str(tag.id),
+            }
+            for tag in tags
+        ]
+        self._by_trigram: defaultdict[str, set[int]] = defaultdict(set)
+        self._by_first_letter: defaultdict[str, set[int]] = defaultdict(set)
+        for i, name in enumerate(self.names):
+            for trigram in trigrams(name):
+                self._by_trigram[trigram].add(i)
+            if name:
+                self._by_first_letter[name[0]].add(i)
+
+    def _candidates(self, query: str, limit: int) -> list[int]:
+        """Indexes of the tags worth scoring for the query"""
+        candidates = set(self._by_first_letter.get(query[0], ()))
+        for trigram in trigrams(query):
+            candidates |= self._by_trigram.get(trigram, set())
+        if len(candidates) < limit:
+            # Not enough for a full page of results, so score everything (which
+            # is what happens for small catalogs anyway)
+            return list(range(len(self.tags)))
+        return sorted(candidates)
+
+    def search(self, query: str | None, limit: int = 100) -> list[int]:
+        """Returns the indexes of the best matching tags, best match first.
+
+        With no query, all tags are returned (up to `limit`) in their original order.
+        """
+        normalised_query = utils.full_process(query) if query else ""
+        if not normalised_query:
+            return list(range(min(limit, len(self.tags))))
+        choices = {i: self.names[i] for i in self._candidates(normalised_query, limit)}
+        results = process.extract(
+            normalised_query, choices, scorer=fuzz.ratio, processor=None, limit=limit
+        )
+        return [i for _, _, i in results]
+
+    def search_options(self, query: str | None, limit: int = 100) -> list[dict]:
+        """Like `search()`, but returns Slack option payloads"""
+        return [self.options[i] for i in self.search(query, limit)]
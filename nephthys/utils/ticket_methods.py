@@ -7,6 +7,8 @@ from slack_sdk.web.async_client import AsyncWebClient
 from nephthys.database.tables import BotMessage
 from nephthys.database.tables import Ticket
 from nephthys.utils.env import env
+from nephthys.utils.open_tickets import OpenTicket
+from nephthys.utils.ticket_transitions import delete_ticket
 
 
 class ThreadGoneError(Exception):
@@ -78,10 +80,10 @@ async def delete_and_clean_up_ticket(ticket: Ticket):
     # Delete the backend message in the "tickets" channel
     await delete_message(env.slack_ticket_channel, ticket.ticket_ts)
     # TODO deal with DMs to tag subscribers?
-    await Ticket.delete().where(Ticket.id == ticket.id)
+    await delete_ticket(ticket.id)
 
 
-def get_question_message_link(ticket: Ticket) -> str:
+def get_question_message_link(ticket: Ticket | OpenTicket) -> str:
     """Get the Slack message link to the original help message for the provided ticket"""
     return f"https://hackclub.slack.com/archives/{env.slack_help_channel}/p{ticket.msg_ts.replace('.', '')}"
 
@@ -0,0 +1,265 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from nephthys.database.enums import CategoryTagSource
+from nephthys.database.enums import TicketStatus
+from nephthys.database.enums import UserType
+from nephthys.database.tables import Ticket
+from nephthys.database.tables import User
+from nephthys.utils.open_tickets import open_ticket_index
+from nephthys.utils.open_tickets import OpenTicket
+from nephthys.utils.stats_rollup import record_ticket_change
+from nephthys.utils.stats_rollup import TicketRollupState
+
+
+@dataclass
+class TicketTransition:
+    """A ticket after a state transition, and what it looked like before"""
+
+    ticket: Ticket
+    previous_state: TicketRollupState
+    opened_by_slack_id: str | None
+    assigned_to_slack_id: str | None
+    closed_by_slack_id: str | None
+
+
+def transition_sql(assignments: str, condition: str) -> str:
+    """Builds an UPDATE that changes a ticket in one round trip.
+
+    The subquery locks the matching ticket (re-checking `condition` if another
+    transaction changed it first), so two concurrent transitions can't both
+    apply. It also gives `assignments` and RETURNING access to the ticket's
+    previous values, as `previous."column"`.
+    """
+    return f"""
+    UPDATE "Ticket" AS ticket SET {assignments}
+    FROM (SELECT * FROM "Ticket" WHERE {condition} FOR UPDATE) AS previous
+    WHERE ticket."id" = previous."id"
+    RETURNING
+        ticket.*,
+        previous."status" AS "previousStatus",
+        previous."categoryTagId" AS "previousCategoryTagId",
+        previous."assignedAt" AS "previousAssignedAt",
+        previous."closedAt" AS "previousClosedAt",
+        previous."closedById" AS "previousClosedById",
+        (SELECT "slackId" FROM "User" WHERE "id" = ticket."openedById") AS "openedBySlackId",
+        (SELECT "slackId" FROM "User" WHERE "id" = ticket."assignedToId") AS "assignedToSlackId",
+        (SELECT "slackId" FROM "User" WHERE "id" = ticket."closedById") AS "closedBySlackId"
+    """
+
+
+def ticket_from_row(row: dict) -> Ticket:
+    """Builds a Ticket from a raw query's row, which is keyed by DB column names"""
+    ticket = Ticket(
+        {column: row[column._meta.db_column_name] for column in Ticket._meta.columns},
+        _exists_in_db=True,
+    )
+    # Raw queries don't convert enum columns
+    ticket.status = TicketStatus(ticket.status)
+    ticket.last_msg_by = UserType(ticket.last_msg_by)
+    if ticket.category_tag_source:
+        ticket.category_tag_source = CategoryTagSource(ticket.category_tag_source)
+    return ticket
+
+
+async def apply_transition(
+    assignments: str, condition: str, *args
+) -> TicketTransition | None:
+    """Runs a transition built by `transition_sql()`, then records the change in
+    TicketDailyRollup and the open ticket index.
+
+    Returns None if no ticket matched the condition.
+    """
+    async with Ticket._meta.db.transaction():
+        rows = await Ticket.raw(transition_sql(assignments, condition), *args)
+        if not rows:
+            return None
+        row = rows[0]
+        ticket = ticket_from_row(row)
+        transition = TicketTransition(
+            ticket=ticket,
+            previous_state=TicketRollupState(
+                created_at=row["createdAt"],
+                status=TicketStatus(row["previousStatus"]),
+                category_tag_id=row["previousCategoryTagId"],
+                assigned_at=row["previousAssignedAt"],
+                closed_at=row["previousClosedAt"],
+                closed_by_id=row["previousClosedById"],
+            ),
+            opened_by_slack_id=row["openedBySlackId"],
+            assigned_to_slack_id=row["assignedToSlackId"],
+            closed_by_slack_id=row["closedBySlackId"],
+        )
+        await record_ticket_change(
+            transition.previous_state, TicketRollupState.from_ticket(ticket)
+        )
+    open_ticket_index.put(
+        OpenTicket.from_ticket(
+            ticket,
+            opened_by_slack_id=transition.opened_by_slack_id,
+            assigned_to_slack_id=transition.assigned_to_slack_id,
+        )
+    )
+    return transition
+
+
+async def delete_ticket(ticket_id: int) -> Ticket | None:
+    """Deletes a ticket from the DB, and removes it from TicketDailyRollup and
+    the open ticket index.
+
+    Returns the ticket as it was when it was deleted, or None if it didn't exist.
+    """
+    async with Ticket._meta.db.transaction():
+        rows = await Ticket.raw(
+            'DELETE FROM "Ticket" WHERE "id" = {} RETURNING *', ticket_id
+        )
+        if not rows:
+            return None
+        ticket = ticket_from_row(rows[0])
+        await record_ticket_change(TicketRollupState.from_ticket(ticket), None)
+    open_ticket_index.remove(ticket.msg_ts)
+    return ticket
+
+
+async def record_reply(
+    msg_ts: str, sender: User | None, is_helper: bool
+) -> TicketTransition | None:
+    """Records a message sent in a ticket's thread. If the sender is a helper
+    (and the ticket isn't closed), the ticket is also assigned to them.
+
+    Returns None if the thread isn't a ticket.
+    """
+    assignments = [
+        '"lastMsgAt" = {}',
+        # The ticket's author may be a helper, so this is decided in the query
+        """"lastMsgBy" = CASE WHEN previous."openedById" = {}
+            THEN 'AUTHOR'::user_type ELSE {}::user_type END""",
+    ]
+    now = datetime.now().astimezone()
+    args = [
+        now,
+        sender.id if sender else None,
+        UserType.HELPER if is_helper else UserType.OTHER,
+    ]
+    if sender and is_helper:
+        assignments += [
+            """"assignedToId" = CASE WHEN previous."status" = 'CLOSED'
+                THEN previous."assignedToId" ELSE {} END""",
+            """"status" = CASE WHEN previous."status" = 'CLOSED'
+                THEN previous."status" ELSE 'IN_PROGRESS'::ticket_status END""",
+            """"assignedAt" = CASE WHEN previous."status" = 'CLOSED'
+                THEN previous."assignedAt" ELSE COALESCE(previous."assignedAt", {}) END""",
+        ]
+        args += [sender.id, now]
+    return await apply_transition(", ".join(assignments), '"msgTs" = {}', *args, msg_ts)
+
+
+async def resolve_ticket(
+    msg_ts: str,
+    resolver: User,
+    can_resolve_any: bool,
+    credit_cutoff: datetime,
+) -> TicketTransition | None:
+    """Closes a ticket, as long as it isn't already closed and the resolver is
+    allowed to close it (they're a helper, or they opened it).
+
+    If the last message in the thread was sent after `credit_cutoff`, credit
+    goes to the last helper who replied (the assignee) rather than the
+    resolver. This prevents rewarding "stealing" active threads, while still
+    rewarding closing stale, already-answered threads. Credit also goes to the
+    assignee if the resolver isn't a helper.
+
+    Returns None if the ticket couldn't be closed.
+    """
+    return await apply_transition(
+        """
+        "status" = 'CLOSED',
+        "closedAt" = {},
+        "closedById" = CASE
+            WHEN previous."assignedToId" IS NOT NULL
+                AND (previous."lastMsgAt" >= {} OR NOT {})
+            THEN previous."assignedToId" ELSE {} END
+        """,
+        """"msgTs" = {} AND "status" != 'CLOSED' AND ({} OR "openedById" = {})""",
+        datetime.now().astimezone(),
+        credit_cutoff,
+        resolver.helper,
+        resolver.id,
+        msg_ts,
+        can_resolve_any,
+        resolver.id,
+    )
+
+
+async def reopen_ticket(
+    ticket_id: int, reopened_by: User, ticket_ts: str
+) -> TicketTransition | None:
+    """Opens a closed ticket again, with `ticket_ts` as its new backend message.
+
+    Returns None if the ticket isn't closed.
+    """
+    return await apply_transition(
+        """
+        "status" = 'OPEN',
+        "closedById" = NULL,
+        "closedAt" = NULL,
+        "reopenedById" = {},
+        "reopenedAt" = {},
+        "ticketTs" = {}
+        """,
+        """"id" = {} AND "status" = 'CLOSED'""",
+        reopened_by.id,
+        datetime.now().astimezone(),
+        ticket_ts,
+        ticket_id,
+    )
+
+
+async def close_ticket(
+    msg_ts: str, closed_by_id: int | None
+) -> TicketTransition | None:
+    """Closes a ticket without any of `resolve_ticket()`'s permission checks or
+    credit rules, e.g. because its thread has been deleted.
+
+    Returns None if the ticket is already closed.
+    """
+    return await apply_transition(
+        """"status" = 'CLOSED', "closedAt" = {}, "closedById" = {}""",
+        """"msgTs" = {} AND "status" != 'CLOSED'""",
+        datetime.now().astimezone(),
+        closed_by_id,
+        msg_ts,
+    )
+
+
+async def assign_category_tag(
+    ticket_ts: str, category_tag_id: int | None
+) -> TicketTransition | None:
+    """Sets the category tag a helper picked for a ticket (or clears it).
+
+    Returns None if there's no ticket with that backend message.
+    """
+    return await apply_transition(
+        """"categoryTagId" = {}, "categoryTagSource" = {}::category_tag_source""",
+        '"ticketTs" = {}',
+        category_tag_id,
+        CategoryTagSource.HELPER,
+        ticket_ts,
+    )
+
+
+async def suggest_category_tag(
+    ticket_id: int, category_tag_id: int, source: CategoryTagSource
+) -> TicketTransition | None:
+    """Sets a generated category tag on a ticket, unless it already has one
+    (e.g. because a helper picked one while it was being generated).
+
+    Returns None if the ticket wasn't changed.
+    """
+    return await apply_transition(
+        """"categoryTagId" = {}, "categoryTagSource" = {}::category_tag_source""",
+        """"id" = {} AND "categoryTagId" IS NULL""",
+        category_tag_id,
+        source,
+        ticket_id,
+    )
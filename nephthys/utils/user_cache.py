@@ -0,0 +1,63 @@
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter
+
+from nephthys.database.tables import User
+
+USER_CACHE_REQUESTS = Counter(
+    "nephthys_user_cache_requests_total",
+    "Lookups of database users by Slack ID, by whether they were served from the cache",
+    ["result"],
+)
+
+
+class UserCache:
+    """An LRU cache of database users, keyed by Slack ID.
+
+    Users are kept for `ttl_seconds`, and Slack IDs with no user in the database
+    for `negative_ttl_seconds`. Code that creates users or changes their admin or
+    helper status must call `invalidate()` (or `clear()` for bulk changes).
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, negative_ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        # Slack ID -> (expiry time, user or None if they're not in the database)
+        self._entries: OrderedDict[str, tuple[float, User | None]] = OrderedDict()
+        # Bumped on every invalidation, so that a lookup that was already in
+        # progress doesn't store what it read before the change
+        self._generation = 0
+
+    async def get(self, slack_id: str) -> User | None:
+        entry = self._entries.get(slack_id)
+        if entry and entry[0] > time.monotonic():
+            USER_CACHE_REQUESTS.labels(result="hit").inc()
+            self._entries.move_to_end(slack_id)
+            return entry[1]
+
+        USER_CACHE_REQUESTS.labels(result="miss").inc()
+        generation = self._generation
+        user = await User.objects().where(User.slack_id == slack_id).first()
+        if generation == self._generation:
+            self._store(slack_id, user)
+        return user
+
+    def _store(self, slack_id: str, user: User | None):
+        ttl = self.ttl_seconds if user else self.negative_ttl_seconds
+        self._entries[slack_id] = (time.monotonic() + ttl, user)
+        self._entries.move_to_end(slack_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, slack_id: str):
+        self._generation += 1
+        self._entries.pop(slack_id, None)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+
+user_cache = UserCache(max_size=5_000, ttl_seconds=10 * 60, negative_ttl_seconds=60)
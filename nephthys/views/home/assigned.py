@@ -9,6 +9,7 @@ from blockkit import Section
 from nephthys.database.enums import TicketStatus
 from nephthys.database.tables import Ticket
 from nephthys.database.tables import User
+from nephthys.utils.open_tickets import open_ticket_index
 from nephthys.utils.ticket_methods import get_question_message_link
 from nephthys.views.home import AppHomeView
 from nephthys.views.home.components.error_screen import error_screen
@@ -42,8 +43,12 @@ async def get_assigned_tickets_view(user: User | None, page: int = 1):
             ":rac_believes_in_theory_about_green_lizards_and_space_lasers: only helpers can be assigned to tickets, so you have none - zero responsibility!",
         )
 
-    total = await Ticket.count().where(
-        (Ticket.assigned_to == user) & (Ticket.status != TicketStatus.CLOSED)
+    total = (
+        len(open_ticket_index.assigned_to(user.id))
+        if open_ticket_index.loaded
+        else await Ticket.count().where(
+            (Ticket.assigned_to == user) & (Ticket.status != TicketStatus.CLOSED)
+        )
     )
 
     if total == 0:
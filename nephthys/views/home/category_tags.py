@@ -5,8 +5,8 @@ from blockkit import Header
 from blockkit import Home
 from blockkit import Section
 
-from nephthys.database.tables import CategoryTag
 from nephthys.database.tables import User
+from nephthys.utils.tag_catalog import category_tag_catalog
 from nephthys.views.home import AppHomeView
 from nephthys.views.home.components.header import get_header_components
 
@@ -25,7 +25,7 @@ async def get_category_tags_view(user: User | None) -> dict:
             ]
         ).build()
 
-    category_tags = await CategoryTag.objects().order_by(CategoryTag.id)
+    category_tags = await category_tag_catalog.all()
 
     tag_blocks = []
     if not category_tags:
@@ -5,8 +5,8 @@ from blockkit import Header
 from blockkit import Home
 
 from nephthys.database.tables import User
-from nephthys.utils.env import env
 from nephthys.utils.performance import perf_timer
+from nephthys.utils.slack_user import get_user_profile
 from nephthys.views.home import AppHomeView
 from nephthys.views.home.components.header import get_header_components
 from nephthys.views.home.components.leaderboards import get_leaderboard_components
@@ -18,14 +18,14 @@ from nephthys.views.home.error import get_error_view
 
 async def get_dashboard_view(slack_user: str, db_user: User | None):
     async with perf_timer("Fetching user info"):
-        user_info_response = await env.slack_client.users_info(user=slack_user)
-    user_info = user_info_response.get("user")
-    if not user_info:
-        logging.error(f"Failed to fetch user={slack_user}: {user_info_response}")
-        return get_error_view(
-            ":rac_freaking: oops, i couldn't find your info! try again in a bit?"
-        )
-    tz_string = user_info.get("tz")
+        try:
+            user_profile = await get_user_profile(slack_user)
+        except ValueError as e:
+            logging.error(f"Failed to fetch user={slack_user}: {e}")
+            return get_error_view(
+                ":rac_freaking: oops, i couldn't find your info! try again in a bit?"
+            )
+    tz_string = user_profile.timezone()
     if not tz_string:
         logging.warning(f"No timezone found user={slack_user}")
         tz_string = "Europe/London"
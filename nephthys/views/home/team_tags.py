@@ -1,8 +1,8 @@
 import logging
 
-from nephthys.database.tables import TeamTag
 from nephthys.database.tables import User
 from nephthys.database.tables import UserTagSubscription
+from nephthys.utils.tag_catalog import team_tag_catalog
 from nephthys.views.home import AppHomeView
 from nephthys.views.home.components.header import get_header
 
@@ -11,7 +11,7 @@ async def get_team_tags_view(user: User | None) -> dict:
     header = get_header(user, AppHomeView.TEAM_TAGS)
     is_admin = bool(user and user.admin)
     is_helper = bool(user and user.helper)
-    tags = await TeamTag.objects()
+    tags = await team_tag_catalog.all()
     blocks = []
 
     if not tags:
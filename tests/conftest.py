@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+# piccolo_conf.py needs a database URL before any tables can be imported. Only
+# the tests using the `database` fixture connect to it.
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+os.environ["DATABASE_URL"] = (
+    TEST_DATABASE_URL or "postgresql://localhost/nephthys_test_unused"
+)
+
+# Placeholders for the settings nephthys.utils.env requires. Nothing in the
+# tests talks to Slack.
+for name in [
+    "SLACK_BOT_TOKEN",
+    "SLACK_USER_TOKEN",
+    "SLACK_SIGNING_SECRET",
+    "SLACK_HELP_CHANNEL",
+    "SLACK_TICKET_CHANNEL",
+    "SLACK_BTS_CHANNEL",
+    "SLACK_MAINTAINER_ID",
+]:
+    os.environ.setdefault(name, "test")
+
+from nephthys.database.tables import Ticket  # noqa: E402
+from piccolo_conf import DB  # noqa: E402
+
+
+@pytest.fixture
+async def database():
+    """An empty database, for tests that need one. Set TEST_DATABASE_URL to a
+    database with the migrations applied to run these tests.
+
+    Every table is emptied, so don't point this at a database you care about!
+    """
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL isn't set")
+    if DB.config["dsn"] != TEST_DATABASE_URL:
+        pytest.fail(
+            "The tables are connected to DATABASE_URL rather than TEST_DATABASE_URL (is it set in .env?)"
+        )
+    tables = await Ticket.raw(
+        "SELECT tablename FROM pg_tables WHERE schemaname = 'public' AND tablename != 'migration'"
+    )
+    names = ", ".join(f'"{table["tablename"]}"' for table in tables)
+    await Ticket.raw(f"TRUNCATE {names} RESTART IDENTITY CASCADE")
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from nephthys.errors.errors import AIUnavailableError
+from nephthys.utils.ai_governor import AIGovernor
+from nephthys.utils.ai_governor import CircuitState
+
+
+def make_governor(**kwargs) -> AIGovernor:
+    options = {
+        "max_concurrency": 2,
+        "timeout_seconds": 1,
+        "failure_threshold": 2,
+        "reset_seconds": 60,
+    }
+    return AIGovernor(**(options | kwargs))
+
+
+async def succeed(value: str = "ok") -> str:
+    return value
+
+
+async def fail():
+    raise ValueError("bad response")
+
+
+async def hang():
+    await asyncio.sleep(60)
+
+
+async def open_circuit(governor: AIGovernor):
+    for _ in range(governor.failure_threshold):
+        with pytest.raises(ValueError):
+            await governor.call("test", fail())
+    assert governor._state == CircuitState.OPEN
+
+
+async def test_returns_result():
+    governor = make_governor()
+    assert await governor.call("test", succeed("title")) == "title"
+    assert governor._state == CircuitState.CLOSED
+
+
+async def test_opens_after_consecutive_failures():
+    governor = make_governor()
+    with pytest.raises(ValueError):
+        await governor.call("test", fail())
+    # A success resets the count
+    await governor.call("test", succeed())
+    with pytest.raises(ValueError):
+        await governor.call("test", fail())
+    assert governor._state == CircuitState.CLOSED
+
+    with pytest.raises(ValueError):
+        await governor.call("test", fail())
+    assert governor._state == CircuitState.OPEN
+
+
+async def test_rejects_calls_while_open():
+    governor = make_governor()
+    await open_circuit(governor)
+    request = succeed()
+    with pytest.raises(AIUnavailableError):
+        await governor.call("test", request)
+    # The request is closed rather than left un-awaited
+    assert request.cr_frame is None
+
+
+async def test_successful_trial_closes_circuit():
+    governor = make_governor()
+    await open_circuit(governor)
+    governor.reset_seconds = 0
+    assert await governor.call("test", succeed()) == "ok"
+    assert governor._state == CircuitState.CLOSED
+
+
+async def test_failed_trial_reopens_circuit():
+    governor = make_governor()
+    await open_circuit(governor)
+    governor.reset_seconds = 0
+    with pytest.raises(ValueError):
+        await governor.call("test", fail())
+    assert governor._state == CircuitState.OPEN
+
+
+async def test_timeout_counts_as_failure():
+    governor = make_governor(timeout_seconds=0.01, failure_threshold=1)
+    with pytest.raises(TimeoutError):
+        await governor.call("test", hang())
+    assert governor._state == CircuitState.OPEN
+
+
+async def test_waiting_for_a_slot_isnt_a_failure():
+    governor = make_governor(max_concurrency=1, timeout_seconds=0.01)
+    # Another call is using the only slot
+    await governor._semaphore.acquire()
+    request = succeed()
+    with pytest.raises(TimeoutError):
+        await governor.call("test", request)
+    assert request.cr_frame is None
+    assert governor._consecutive_failures == 0
+
+
+async def test_trial_that_never_gets_a_slot_is_abandoned():
+    governor = make_governor(max_concurrency=1, timeout_seconds=0.01)
+    await open_circuit(governor)
+    # Something still holds the only slot (e.g. a call started before the
+    # circuit opened)
+    await governor._semaphore.acquire()
+    governor.reset_seconds = 0
+    with pytest.raises(TimeoutError):
+        await governor.call("test", succeed())
+    # Not stuck half-open, so the next call can be the trial
+    assert governor._state == CircuitState.OPEN
+
+    governor._semaphore.release()
+    assert await governor.call("test", succeed()) == "ok"
+    assert governor._state == CircuitState.CLOSED
+
+
+async def test_limits_concurrency():
+    governor = make_governor(max_concurrency=2)
+    running = 0
+    most_running = 0
+
+    async def request():
+        nonlocal running, most_running
+        running += 1
+        most_running = max(most_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await asyncio.gather(*[governor.call("test", request()) for _ in range(5)])
+    assert most_running == 2
@@ -0,0 +1,66 @@
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+
+from nephthys.database.enums import TicketStatus
+from nephthys.database.tables import Ticket
+from nephthys.database.tables import User
+from nephthys.tasks import backfill_enrichment
+from nephthys.tasks.backfill_enrichment import backfill_ticket_enrichment
+from nephthys.utils.load_mode import load_monitor
+
+pytestmark = pytest.mark.usefixtures("database")
+
+
+@pytest.fixture
+def enriched(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """The msg_ts of each ticket that the backfill enriches"""
+    enriched = []
+
+    async def enrich_ticket(ticket: Ticket, *args):
+        enriched.append(ticket.msg_ts)
+
+    monkeypatch.setattr(backfill_enrichment, "enrich_ticket", enrich_ticket)
+    monkeypatch.setattr(load_monitor, "update", lambda: False)
+    return enriched
+
+
+async def make_ticket(msg_ts: str, opened_by: User, **values) -> Ticket:
+    ticket = Ticket(
+        title="Help",
+        description="Please help",
+        msg_ts=msg_ts,
+        ticket_ts=f"backend-{msg_ts}",
+        opened_by=opened_by.id,
+        **values,
+    )
+    await ticket.save()
+    return ticket
+
+
+async def test_only_deferred_tickets_are_enriched_once(enriched: list[str]):
+    author = User(slack_id="U_AUTHOR", username="author")
+    await author.save()
+    await make_ticket("1.0", author, enrichment_deferred=True)
+    # e.g. the AI was unavailable when it was created
+    await make_ticket("2.0", author)
+    await make_ticket(
+        "3.0",
+        author,
+        enrichment_deferred=True,
+        status=TicketStatus.CLOSED,
+        closed_at=datetime.now().astimezone(),
+    )
+    await make_ticket(
+        "4.0",
+        author,
+        enrichment_deferred=True,
+        created_at=datetime.now().astimezone() - timedelta(days=2),
+    )
+
+    await backfill_ticket_enrichment()
+    assert enriched == ["1.0"]
+
+    await backfill_ticket_enrichment()
+    assert enriched == ["1.0"]
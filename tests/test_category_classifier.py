@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from nephthys.utils.category_classifier import CategoryClassifier
+from nephthys.utils.category_classifier import tokenize
+
+SHOP = 1
+HACKATIME = 2
+
+TRAINING_DATA = [
+    ("my shop order hasn't arrived yet", SHOP),
+    ("where is my shop order", SHOP),
+    ("shop order shipping is taking ages", SHOP),
+    ("can I cancel my shop order", SHOP),
+    ("the shop says my order was fulfilled but it hasn't arrived", SHOP),
+    ("hackatime isn't tracking my coding time", HACKATIME),
+    ("my hackatime hours are missing", HACKATIME),
+    ("hackatime plugin isn't tracking vscode", HACKATIME),
+    ("how do I set up hackatime tracking", HACKATIME),
+    ("hackatime shows zero hours for my project", HACKATIME),
+]
+
+
+@pytest.fixture(scope="module")
+def classifier() -> CategoryClassifier:
+    texts, labels = zip(*TRAINING_DATA)
+    return CategoryClassifier.train(list(texts), list(labels))
+
+
+def test_tokenize():
+    assert tokenize("My Shop-Order isn't here!") == [
+        "my",
+        "shop-order",
+        "isn't",
+        "here",
+        "my shop-order",
+        "shop-order isn't",
+        "isn't here",
+    ]
+
+
+def test_vocabulary_needs_two_documents(classifier: CategoryClassifier):
+    assert "hackatime" in classifier.vocabulary
+    assert "vscode" not in classifier.vocabulary
+
+
+def test_vectors_are_normalised(classifier: CategoryClassifier):
+    vectors = classifier.vectorize(
+        [classifier.term_counts("where is my shop order"), {}]
+    )
+    assert np.linalg.norm(vectors[0]) == pytest.approx(1)
+    assert not vectors[1].any()
+
+
+def test_predicts_trained_categories(classifier: CategoryClassifier):
+    prediction = classifier.predict("my shop order still hasn't arrived")
+    assert prediction is not None
+    assert prediction[0] == SHOP
+
+    prediction = classifier.predict("hackatime stopped tracking my hours")
+    assert prediction is not None
+    assert prediction[0] == HACKATIME
+    assert 0.5 < prediction[1] <= 1
+
+
+def test_no_prediction_for_unknown_text(classifier: CategoryClassifier):
+    assert classifier.predict("") is None
+    assert classifier.predict("completely unrelated words") is None
+    # One known feature isn't enough either
+    assert classifier.predict("hackatime") is None
@@ -0,0 +1,118 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+
+import pytest
+
+from nephthys.utils.event_dispatcher import EventDispatcher
+from nephthys.utils.event_dispatcher import thread_key
+
+
+@pytest.fixture
+async def dispatcher() -> AsyncIterator[EventDispatcher]:
+    dispatcher = EventDispatcher(workers=4, max_queued=100)
+    task = asyncio.create_task(dispatcher.run())
+    yield dispatcher
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+def test_thread_key():
+    assert thread_key({"ts": "1.0"}) == "1.0"
+    assert thread_key({"ts": "2.0", "thread_ts": "1.0"}) == "1.0"
+    # Edits and deletions belong to the original message's thread
+    assert (
+        thread_key({"ts": "3.0", "message": {"ts": "2.0", "thread_ts": "1.0"}}) == "1.0"
+    )
+    assert thread_key({"ts": "3.0", "previous_message": {"ts": "1.0"}}) == "1.0"
+    assert thread_key({"ts": "3.0", "deleted_ts": "1.0"}) == "1.0"
+
+
+async def test_same_key_runs_in_order(dispatcher: EventDispatcher):
+    handled = []
+
+    def handler(name: str, delay: float):
+        async def handle():
+            await asyncio.sleep(delay)
+            handled.append(name)
+
+        return handle
+
+    # The later events would finish first if they ran in parallel
+    dispatcher.submit("thread", handler("first", 0.03))
+    dispatcher.submit("thread", handler("second", 0.01))
+    dispatcher.submit("thread", handler("third", 0))
+    await dispatcher.drain()
+    assert handled == ["first", "second", "third"]
+
+
+async def test_different_keys_run_in_parallel(dispatcher: EventDispatcher):
+    running = 0
+    most_running = 0
+
+    async def handle():
+        nonlocal running, most_running
+        running += 1
+        most_running = max(most_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    for i in range(3):
+        dispatcher.submit(f"thread {i}", handle)
+    await dispatcher.drain()
+    assert most_running == 3
+
+
+async def test_errors_dont_stop_later_events(dispatcher: EventDispatcher):
+    handled = []
+
+    async def fail():
+        raise ValueError("oops")
+
+    async def succeed():
+        handled.append("ok")
+
+    dispatcher.submit("thread", fail)
+    dispatcher.submit("thread", succeed)
+    await dispatcher.drain()
+    assert handled == ["ok"]
+
+
+async def test_sheds_when_full():
+    # No workers are running, so everything stays queued
+    dispatcher = EventDispatcher(workers=1, max_queued=2)
+
+    async def handle():
+        pass
+
+    assert dispatcher.submit("a", handle)
+    assert dispatcher.submit("a", handle)
+    assert not dispatcher.submit("b", handle)
+    # New questions are queued anyway
+    assert dispatcher.submit("c", handle, sheddable=False)
+    assert dispatcher.queued == 3
+
+
+async def test_drain_waits_for_queued_events(dispatcher: EventDispatcher):
+    handled = []
+
+    async def handle():
+        await asyncio.sleep(0.01)
+        handled.append("ok")
+
+    dispatcher.submit("a", handle)
+    dispatcher.submit("b", handle)
+    await dispatcher.drain()
+    assert handled == ["ok", "ok"]
+    assert dispatcher.queued == 0
+    # Nothing is accepted once draining has started
+    assert not dispatcher.submit("c", handle, sheddable=False)
+
+
+async def test_drain_gives_up_after_timeout(dispatcher: EventDispatcher):
+    async def hang():
+        await asyncio.sleep(60)
+
+    dispatcher.submit("a", hang)
+    await asyncio.wait_for(dispatcher.drain(timeout_seconds=0.01), timeout=1)
@@ -0,0 +1,80 @@
+import pytest
+
+from nephthys.utils.env import env
+from nephthys.utils.logging import HeartbeatBuffer
+
+
+class FakeSlackClient:
+    def __init__(self):
+        self.messages: list[dict] = []
+
+    async def chat_postMessage(self, **kwargs):
+        self.messages.append(kwargs)
+        return {"ts": f"{len(self.messages)}.0"}
+
+
+@pytest.fixture
+def slack(monkeypatch: pytest.MonkeyPatch) -> FakeSlackClient:
+    client = FakeSlackClient()
+    monkeypatch.setattr(env, "slack_client", client)
+    monkeypatch.setattr(env, "slack_heartbeat_channel", "C_HEARTBEAT")
+    return client
+
+
+async def test_coalesces_identical_heartbeats(slack: FakeSlackClient):
+    buffer = HeartbeatBuffer(max_pending=10, flush_interval_seconds=10)
+    buffer.add("AI call failed", ["Error: timeout"])
+    buffer.add("AI call failed", ["Error: timeout", "Error: 500"])
+    buffer.add("AI call failed", [])
+    await buffer.flush()
+
+    assert [message["text"] for message in slack.messages] == [
+        "AI call failed (x3)",
+        "Error: timeout\n\nError: 500",
+    ]
+    assert slack.messages[1]["thread_ts"] == "1.0"
+
+
+async def test_posts_everything_pending_in_one_message(slack: FakeSlackClient):
+    buffer = HeartbeatBuffer(max_pending=10, flush_interval_seconds=10)
+    buffer.add("Started", [])
+    buffer.add("Ticket deleted", ["Ticket ID: 1"])
+    buffer.add("Started", [])
+    await buffer.flush()
+
+    assert [message["text"] for message in slack.messages] == [
+        "Started (x2)\nTicket deleted",
+        "*Ticket deleted*\nTicket ID: 1",
+    ]
+
+
+async def test_drops_new_heartbeats_when_full(slack: FakeSlackClient):
+    buffer = HeartbeatBuffer(max_pending=1, flush_interval_seconds=10)
+    buffer.add("First", [])
+    buffer.add("Second", [])
+    buffer.add("Third", [])
+    # Repeats of a pending heartbeat still count
+    buffer.add("First", [])
+    await buffer.flush()
+
+    assert [message["text"] for message in slack.messages] == [
+        "First (x2)\n(2 more heartbeats were dropped)"
+    ]
+
+
+async def test_flush_empties_buffer(slack: FakeSlackClient):
+    buffer = HeartbeatBuffer(max_pending=10, flush_interval_seconds=10)
+    buffer.add("Started", [])
+    await buffer.flush()
+    await buffer.flush()
+    assert len(slack.messages) == 1
+
+
+async def test_nothing_posted_without_a_channel(
+    slack: FakeSlackClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(env, "slack_heartbeat_channel", None)
+    buffer = HeartbeatBuffer(max_pending=10, flush_interval_seconds=10)
+    buffer.add("Started", [])
+    await buffer.flush()
+    assert slack.messages == []
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from nephthys.utils.env import env
+from nephthys.utils.slack_user import UserProfileCache
+
+
+def user_data(slack_id: str, display_name: str) -> dict:
+    return {"id": slack_id, "name": slack_id, "profile": {"display_name": display_name}}
+
+
+class FakeSlackClient:
+    def __init__(self):
+        self.users_info_calls: list[str] = []
+
+    async def users_info(self, user: str):
+        self.users_info_calls.append(user)
+        await asyncio.sleep(0.01)
+        return {"user": user_data(user, "From users.info")}
+
+
+@pytest.fixture
+def slack(monkeypatch: pytest.MonkeyPatch) -> FakeSlackClient:
+    client = FakeSlackClient()
+    monkeypatch.setattr(env, "slack_client", client)
+    return client
+
+
+def make_cache() -> UserProfileCache:
+    return UserProfileCache(max_size=2, ttl_seconds=60, negative_ttl_seconds=60)
+
+
+async def test_caches_and_coalesces_lookups(slack: FakeSlackClient):
+    cache = make_cache()
+    profiles = await asyncio.gather(cache.get("U1"), cache.get("U1"))
+    assert [profile.display_name() for profile in profiles] == ["From users.info"] * 2
+    await cache.get("U1")
+    assert slack.users_info_calls == ["U1"]
+
+
+async def test_evicts_least_recently_used(slack: FakeSlackClient):
+    cache = make_cache()
+    await cache.get("U1")
+    await cache.get("U2")
+    await cache.get("U1")
+    await cache.get("U3")
+    await cache.get("U1")
+    await cache.get("U2")
+    assert slack.users_info_calls == ["U1", "U2", "U3", "U2"]
+
+
+async def test_user_change_only_refreshes_cached_users(slack: FakeSlackClient):
+    cache = make_cache()
+    await cache.get("U1")
+    cache.update(user_data("U1", "Changed"))
+    # Someone who has never been looked up
+    cache.update(user_data("U2", "Changed"))
+
+    assert (await cache.get("U1")).display_name() == "Changed"
+    assert (await cache.get("U2")).display_name() == "From users.info"
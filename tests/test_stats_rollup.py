@@ -0,0 +1,144 @@
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+
+from nephthys.database.enums import CategoryTagSource
+from nephthys.database.enums import TicketStatus
+from nephthys.database.tables import CategoryTag
+from nephthys.database.tables import Ticket
+from nephthys.database.tables import TicketDailyRollup
+from nephthys.database.tables import User
+from nephthys.utils.stats_rollup import rebuild_ticket_daily_rollup
+from nephthys.utils.stats_rollup import record_ticket_change
+from nephthys.utils.stats_rollup import TicketRollupState
+from nephthys.utils.ticket_transitions import assign_category_tag
+from nephthys.utils.ticket_transitions import close_ticket
+from nephthys.utils.ticket_transitions import delete_ticket
+from nephthys.utils.ticket_transitions import record_reply
+from nephthys.utils.ticket_transitions import reopen_ticket
+from nephthys.utils.ticket_transitions import resolve_ticket
+from nephthys.utils.ticket_transitions import suggest_category_tag
+
+pytestmark = pytest.mark.usefixtures("database")
+
+ROLLUP_KEY = ("day", "categoryTagId", "closedById")
+
+
+def now() -> datetime:
+    return datetime.now().astimezone()
+
+
+async def make_user(slack_id: str, helper: bool = False) -> User:
+    user = User(slack_id=slack_id, username=slack_id, helper=helper)
+    await user.save()
+    return user
+
+
+async def make_ticket(msg_ts: str, opened_by: User) -> Ticket:
+    ticket = Ticket(
+        title="Help",
+        description="Please help",
+        msg_ts=msg_ts,
+        ticket_ts=f"backend-{msg_ts}",
+        opened_by=opened_by.id,
+    )
+    await ticket.save()
+    await record_ticket_change(None, TicketRollupState.from_ticket(ticket))
+    return ticket
+
+
+async def get_ticket_id(msg_ts: str) -> int:
+    ticket = await Ticket.objects().get(Ticket.msg_ts == msg_ts)
+    assert ticket
+    return ticket.id
+
+
+async def resolve(msg_ts: str, resolver: User):
+    return await resolve_ticket(
+        msg_ts,
+        resolver,
+        can_resolve_any=resolver.helper,
+        credit_cutoff=now() - timedelta(hours=1),
+    )
+
+
+async def get_rollup() -> dict[tuple, dict]:
+    """TicketDailyRollup's rows, leaving out ones that are all zeros"""
+    rollup = {}
+    for row in await TicketDailyRollup.select(
+        *TicketDailyRollup._meta.non_default_columns
+    ):
+        counters = {
+            name: pytest.approx(value)
+            for name, value in row.items()
+            if name not in ROLLUP_KEY
+        }
+        if any(row[name] for name in counters):
+            rollup[tuple(row[name] for name in ROLLUP_KEY)] = counters
+    return rollup
+
+
+async def assert_rollup_matches_rebuild():
+    incremental = await get_rollup()
+    await rebuild_ticket_daily_rollup()
+    assert incremental == await get_rollup()
+
+
+async def test_rollup_matches_rebuild():
+    author = await make_user("U_AUTHOR")
+    helpers = [await make_user(f"U_HELPER_{i}", helper=True) for i in range(3)]
+    for i in range(4):
+        await make_ticket(f"{i}.0", author)
+
+    await asyncio.gather(
+        *[record_reply("0.0", helper, is_helper=True) for helper in helpers]
+    )
+    await record_reply("1.0", helpers[0], is_helper=True)
+    await asyncio.gather(*[resolve("1.0", helper) for helper in helpers])
+    await resolve("2.0", author)
+    await reopen_ticket(await get_ticket_id("2.0"), author, "backend-2.1")
+    await record_reply("3.0", helpers[1], is_helper=True)
+    await delete_ticket(await get_ticket_id("3.0"))
+
+    await assert_rollup_matches_rebuild()
+
+
+async def test_rollup_follows_category_changes():
+    author = await make_user("U_AUTHOR")
+    helper = await make_user("U_HELPER", helper=True)
+    shop = CategoryTag(name="Shop")
+    await shop.save()
+    hosting = CategoryTag(name="Hosting")
+    await hosting.save()
+    ticket = await make_ticket("1.0", author)
+    await make_ticket("2.0", author)
+    await resolve("2.0", helper)
+
+    assert await suggest_category_tag(ticket.id, shop.id, CategoryTagSource.AI)
+    # A generated tag doesn't replace one that's already set
+    assert not await suggest_category_tag(
+        ticket.id, hosting.id, CategoryTagSource.CLASSIFIER
+    )
+    await assert_rollup_matches_rebuild()
+
+    transition = await assign_category_tag("backend-2.0", hosting.id)
+    assert transition
+    assert transition.ticket.category_tag_source == CategoryTagSource.HELPER
+    await assert_rollup_matches_rebuild()
+
+    # Nothing is left under "no category"
+    categories = [category for _, category, _ in await get_rollup()]
+    assert sorted(categories) == sorted([shop.id, hosting.id, hosting.id])
+
+
+async def test_rollup_counts_closing_ticket_with_deleted_thread():
+    author = await make_user("U_AUTHOR")
+    await make_ticket("1.0", author)
+
+    transition = await close_ticket("1.0", None)
+    assert transition
+    assert transition.ticket.status == TicketStatus.CLOSED
+    assert await close_ticket("1.0", None) is None
+    await assert_rollup_matches_rebuild()
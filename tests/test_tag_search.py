@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+
+from nephthys.utils.tag_search import TagSearchIndex
+
+
+@dataclass
+class FakeTag:
+    id: int
+    name: str
+
+
+def make_index(names: list[str]) -> TagSearchIndex:
+    return TagSearchIndex(
+        [FakeTag(id=i + 1, name=name) for i, name in enumerate(names)]
+    )
+
+
+def test_no_query_returns_tags_in_order():
+    index = make_index(["Shop", "Hackatime", "Payouts"])
+    assert index.search(None) == [0, 1, 2]
+    assert index.search("", limit=2) == [0, 1]
+    assert index.search("  ?! ") == [0, 1, 2]
+
+
+def test_best_match_first():
+    index = make_index(["Shop orders", "Hackatime", "Hackatime plugin", "Payouts"])
+    assert index.search("hackatime")[0] == 1
+    assert index.search("HACKATIME!")[0] == 1
+    assert index.search("shop order")[0] == 0
+
+
+def test_limit():
+    index = make_index(["Shop", "Hackatime", "Payouts"])
+    assert len(index.search("shop", limit=2)) == 2
+
+
+def test_large_catalog_only_scores_candidates():
+    names = [f"tag {i}" for i in range(500)] + ["zebra crossing", "zebra"]
+    index = make_index(names)
+    assert index._candidates("zebra", limit=2) == [500, 501]
+    assert index.search("zebra", limit=2) == [501, 500]
+
+
+def test_small_candidate_set_scores_everything():
+    # Nothing shares a trigram with the query, but there's still a full page
+    index = make_index(["abc", "def"])
+    assert sorted(index.search("xyz")) == [0, 1]
+
+
+def test_search_options():
+    index = make_index(["Shop", "Hackatime"])
+    assert index.search_options("hackatime", limit=1) == [
+        {"text": {"type": "plain_text", "text": "Hackatime"}, "value": "2"}
+    ]
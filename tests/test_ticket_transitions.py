@@ -0,0 +1,226 @@
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+
+from nephthys.database.enums import TicketStatus
+from nephthys.database.enums import UserType
+from nephthys.database.tables import Ticket
+from nephthys.database.tables import User
+from nephthys.utils.stats_rollup import record_ticket_change
+from nephthys.utils.stats_rollup import TicketRollupState
+from nephthys.utils.ticket_transitions import delete_ticket
+from nephthys.utils.ticket_transitions import record_reply
+from nephthys.utils.ticket_transitions import reopen_ticket
+from nephthys.utils.ticket_transitions import resolve_ticket
+
+pytestmark = pytest.mark.usefixtures("database")
+
+
+def now() -> datetime:
+    return datetime.now().astimezone()
+
+
+async def make_user(slack_id: str, helper: bool = False) -> User:
+    user = User(slack_id=slack_id, username=slack_id, helper=helper)
+    await user.save()
+    return user
+
+
+async def make_ticket(msg_ts: str, opened_by: User, **values) -> Ticket:
+    ticket = Ticket(
+        title="Help",
+        description="Please help",
+        msg_ts=msg_ts,
+        ticket_ts=f"backend-{msg_ts}",
+        opened_by=opened_by.id,
+        **values,
+    )
+    await ticket.save()
+    await record_ticket_change(None, TicketRollupState.from_ticket(ticket))
+    return ticket
+
+
+async def get_ticket(msg_ts: str) -> Ticket:
+    ticket = await Ticket.objects().get(Ticket.msg_ts == msg_ts)
+    assert ticket
+    return ticket
+
+
+async def resolve(msg_ts: str, resolver: User):
+    return await resolve_ticket(
+        msg_ts,
+        resolver,
+        can_resolve_any=resolver.helper,
+        credit_cutoff=now() - timedelta(hours=1),
+    )
+
+
+async def test_helper_reply_assigns_ticket():
+    author = await make_user("U_AUTHOR")
+    helper = await make_user("U_HELPER", helper=True)
+    other_helper = await make_user("U_OTHER", helper=True)
+    await make_ticket("1.0", author)
+
+    transition = await record_reply("1.0", author, is_helper=False)
+    assert transition
+    assert transition.ticket.status == TicketStatus.OPEN
+    assert transition.ticket.last_msg_by == UserType.AUTHOR
+
+    transition = await record_reply("1.0", helper, is_helper=True)
+    assert transition
+    assert transition.previous_state.status == TicketStatus.OPEN
+    assert transition.ticket.status == TicketStatus.IN_PROGRESS
+    assert transition.ticket.assigned_to == helper.id
+    assert transition.assigned_to_slack_id == "U_HELPER"
+    assert transition.ticket.last_msg_by == UserType.HELPER
+    assigned_at = transition.ticket.assigned_at
+    assert assigned_at
+
+    # The last helper to reply is assigned, but it was first assigned earlier
+    transition = await record_reply("1.0", other_helper, is_helper=True)
+    assert transition
+    assert transition.ticket.assigned_to == other_helper.id
+    assert transition.ticket.assigned_at == assigned_at
+
+
+async def test_reply_from_author_who_is_a_helper():
+    author = await make_user("U_AUTHOR", helper=True)
+    await make_ticket("1.0", author)
+    transition = await record_reply("1.0", author, is_helper=True)
+    assert transition
+    assert transition.ticket.last_msg_by == UserType.AUTHOR
+
+
+async def test_reply_to_closed_ticket_doesnt_reassign_it():
+    author = await make_user("U_AUTHOR")
+    helper = await make_user("U_HELPER", helper=True)
+    await make_ticket("1.0", author, status=TicketStatus.CLOSED, closed_at=now())
+    transition = await record_reply("1.0", helper, is_helper=True)
+    assert transition
+    assert transition.ticket.status == TicketStatus.CLOSED
+    assert transition.ticket.assigned_to is None
+
+
+async def test_reply_outside_a_ticket():
+    helper = await make_user("U_HELPER", helper=True)
+    assert await record_reply("1.0", helper, is_helper=True) is None
+
+
+async def test_resolving_unassigned_ticket_credits_resolver():
+    author = await make_user("U_AUTHOR")
+    helper = await make_user("U_HELPER", helper=True)
+    await make_ticket("1.0", author)
+    await make_ticket("2.0", author)
+
+    transition = await resolve("1.0", helper)
+    assert transition
+    assert transition.ticket.status == TicketStatus.CLOSED
+    assert transition.ticket.closed_by == helper.id
+    assert transition.closed_by_slack_id == "U_HELPER"
+
+    transition = await resolve("2.0", author)
+    assert transition
+    assert transition.ticket.closed_by == author.id
+
+
+async def test_resolving_active_thread_credits_assignee():
+    author = await make_user("U_AUTHOR")
+    assignee = await make_user("U_ASSIGNEE", helper=True)
+    resolver = await make_user("U_RESOLVER", helper=True)
+    await make_ticket("1.0", author)
+    await record_reply("1.0", assignee, is_helper=True)
+
+    transition = await resolve("1.0", resolver)
+    assert transition
+    assert transition.ticket.closed_by == assignee.id
+
+
+async def test_resolving_stale_thread_credits_resolver():
+    author = await make_user("U_AUTHOR")
+    assignee = await make_user("U_ASSIGNEE", helper=True)
+    resolver = await make_user("U_RESOLVER", helper=True)
+    two_hours_ago = now() - timedelta(hours=2)
+    await make_ticket(
+        "1.0",
+        author,
+        status=TicketStatus.IN_PROGRESS,
+        assigned_to=assignee.id,
+        assigned_at=two_hours_ago,
+        last_msg_at=two_hours_ago,
+    )
+
+    transition = await resolve("1.0", resolver)
+    assert transition
+    assert transition.ticket.closed_by == resolver.id
+
+
+async def test_author_resolving_credits_assignee():
+    author = await make_user("U_AUTHOR")
+    assignee = await make_user("U_ASSIGNEE", helper=True)
+    two_hours_ago = now() - timedelta(hours=2)
+    await make_ticket(
+        "1.0",
+        author,
+        status=TicketStatus.IN_PROGRESS,
+        assigned_to=assignee.id,
+        assigned_at=two_hours_ago,
+        last_msg_at=two_hours_ago,
+    )
+
+    # Even for a stale thread, as the author isn't a helper
+    transition = await resolve("1.0", author)
+    assert transition
+    assert transition.ticket.closed_by == assignee.id
+
+
+async def test_who_can_resolve():
+    author = await make_user("U_AUTHOR")
+    stranger = await make_user("U_STRANGER")
+    helper = await make_user("U_HELPER", helper=True)
+    await make_ticket("1.0", author)
+
+    assert await resolve("1.0", stranger) is None
+    assert (await get_ticket("1.0")).status == TicketStatus.OPEN
+    assert await resolve("1.0", helper)
+    # Already closed
+    assert await resolve("1.0", helper) is None
+
+
+async def test_concurrent_resolves_only_close_once():
+    author = await make_user("U_AUTHOR")
+    helpers = [await make_user(f"U_HELPER_{i}", helper=True) for i in range(5)]
+    await make_ticket("1.0", author)
+
+    transitions = await asyncio.gather(*[resolve("1.0", helper) for helper in helpers])
+    assert len([transition for transition in transitions if transition]) == 1
+
+
+async def test_reopen():
+    author = await make_user("U_AUTHOR")
+    helper = await make_user("U_HELPER", helper=True)
+    ticket = await make_ticket("1.0", author)
+
+    assert await reopen_ticket(ticket.id, helper, "backend-2.0") is None
+    await resolve("1.0", helper)
+
+    transition = await reopen_ticket(ticket.id, helper, "backend-2.0")
+    assert transition
+    assert transition.previous_state.status == TicketStatus.CLOSED
+    assert transition.ticket.status == TicketStatus.OPEN
+    assert transition.ticket.closed_by is None
+    assert transition.ticket.closed_at is None
+    assert transition.ticket.reopened_by == helper.id
+    assert transition.ticket.ticket_ts == "backend-2.0"
+
+
+async def test_delete_ticket():
+    author = await make_user("U_AUTHOR")
+    ticket = await make_ticket("1.0", author)
+
+    deleted = await delete_ticket(ticket.id)
+    assert deleted
+    assert deleted.msg_ts == "1.0"
+    assert await Ticket.count() == 0
+    assert await delete_ticket(ticket.id) is None